@@ -0,0 +1,291 @@
+import asyncio
+import contextlib
+import datetime
+import functools
+import os
+
+import aiomysql
+
+import availability
+import codes
+import derived
+import name_index
+import revenue
+import room_stats
+import sql
+from db import connect_db, current_property, get_backend, property_settings, POOL_IDLE_TIMEOUT, POOL_MAX_SIZE, POOL_MIN_SIZE
+from queries import free_rooms_from_index, rank_alternatives, SEARCH_CANDIDATE_CHUNK, SEARCH_PAGE_SIZE, stay_dates
+
+
+# asyncio counterparts of the queries.py operations for concurrent frontends. The SQL comes from sql.py and
+# the result shaping from the same helpers queries.py uses, so the two versions return the same rows.
+
+QUERY_TIMEOUT = float(os.environ.get("ASYNC_QUERY_TIMEOUT", "30"))  # seconds per operation, overridable per call
+
+_pools = {}  # property -> async pool on that property's primary
+_pool_locks = {}
+_prepared = set()  # properties whose derived tables have been prepared
+
+
+# Returns the current property's async pool (see db.use_property), creating it on first use
+async def get_pool():
+    key = current_property()
+    pool = _pools.get(key)
+    if pool is None:
+        if get_backend().name != "mysql":
+            raise RuntimeError("aqueries needs DB_BACKEND=mysql; use queries.py with the embedded backend")
+        async with _pool_locks.setdefault(key, asyncio.Lock()):
+            pool = _pools.get(key)
+            if pool is None:
+                # Same endpoint and database as the property's blocking primary pool in db.py
+                settings = property_settings(key)
+                host, _, port = (settings.get("endpoint") or os.environ["DB_HOST"]).partition(":")
+                pool = _pools[key] = await aiomysql.create_pool(
+                    host=host,
+                    port=int(port) if port else 3306,
+                    user=os.environ["DB_USER"],
+                    password=os.environ["DB_PASS"],
+                    db=settings.get("database") or os.environ["DB_NAME"],
+                    minsize=POOL_MIN_SIZE,
+                    maxsize=POOL_MAX_SIZE,
+                    pool_recycle=POOL_IDLE_TIMEOUT,
+                    autocommit=False,
+                )
+    return pool
+
+
+# Closes every property's pool
+async def close_pool():
+    pools = list(_pools.values())
+    _pools.clear()
+    for pool in pools:
+        pool.close()
+        await pool.wait_closed()
+
+
+@contextlib.asynccontextmanager
+async def _connection():
+    pool = await get_pool()
+    conn = await pool.acquire()
+    try:
+        yield conn
+        # End the implicit transaction so the next borrower doesn't read from a stale snapshot
+        await conn.rollback()
+    except BaseException:
+        # Cancelled or failed mid-query: the connection's state is unknown, so it is dropped rather than reused
+        conn.close()
+        raise
+    finally:
+        pool.release(conn)
+
+
+# Bounds an operation by `timeout` seconds (QUERY_TIMEOUT by default); on expiry the operation is cancelled
+def _with_timeout(func):
+    @functools.wraps(func)
+    async def wrapper(*args, timeout=None, **kwargs):
+        return await asyncio.wait_for(func(*args, **kwargs), QUERY_TIMEOUT if timeout is None else timeout)
+    return wrapper
+
+
+def _prepare_derived_sync():
+    conn = connect_db()
+    if conn:
+        try:
+            derived.prepare(conn)
+        finally:
+            conn.close()
+
+
+# The derived tables' one-off DDL and backfill run once per property on the blocking driver. asyncio.to_thread
+# copies the context, so the worker thread acts for the same property as the caller
+async def _prepare_derived():
+    key = current_property()
+    if key not in _prepared:
+        await asyncio.to_thread(_prepare_derived_sync)
+        _prepared.add(key)
+
+
+async def _next_code():
+    return await asyncio.to_thread(codes.get_allocator().next_code)
+
+
+async def _update_derived(cursor, stays, sign=1):
+    for query, params, many in derived.statements(stays, sign):
+        if many:
+            await cursor.executemany(query, params)
+        else:
+            await cursor.execute(query, params)
+
+
+# FR1: Get all rooms with their stats, sharing the room_stats TTL cache with the blocking version
+@_with_timeout
+async def get_all_rooms():
+    rows = room_stats.cached_listing()
+    if rows is not None:
+        return rows
+
+    await _prepare_derived()
+    async with _connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(sql.ROOM_LISTING)
+            rows = list(await cursor.fetchall())
+            if room_stats.needs_refresh(rows):
+                await cursor.execute(sql.room_stats_refresh())
+                await conn.commit()
+                await cursor.execute(sql.ROOM_LISTING)
+                rows = list(await cursor.fetchall())
+    return room_stats.store_listing(rows)
+
+
+# FR2: Check room availability for given dates
+@_with_timeout
+async def check_room_availability(room_code, check_in, check_out):
+    # First use loads the whole index on the blocking driver, so that happens off the event loop
+    index = await asyncio.to_thread(availability.get_index)
+    if index is not None:
+        return index.is_free(room_code, check_in, check_out)
+
+    async with _connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql.CHECK_AVAILABILITY, (room_code, check_out, check_in))
+            return await cursor.fetchone() is None
+
+
+# FR2: Find alternative rooms if requested room is unavailable; same contract as queries.find_alternative_rooms()
+@_with_timeout
+async def find_alternative_rooms(check_in, check_out, total_guests, bed_type, room_code=None):
+    # The index, catalog and rate calendar behind these may load themselves on the blocking driver
+    available_rooms = await asyncio.to_thread(free_rooms_from_index, check_in, check_out, total_guests)
+    if available_rooms is None:
+        async with _connection() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(sql.AVAILABLE_ROOMS, (check_out, check_in, total_guests, total_guests))
+                available_rooms = list(await cursor.fetchall())
+
+    alternatives = await asyncio.to_thread(rank_alternatives, available_rooms, check_in, check_out, total_guests,
+                                           bed_type, room_code)
+    if alternatives is not None:
+        return alternatives
+
+    async with _connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(sql.NEXT_AVAILABLE_ROOMS, (bed_type, check_out))
+            return list(await cursor.fetchall())
+
+
+# FR2: Make a reservation
+@_with_timeout
+async def make_reservation(room_code, check_in, check_out, first_name, last_name, adults, kids, rate):
+    new_code = await _next_code()
+    await _prepare_derived()
+    async with _connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql.INSERT_RESERVATION, (new_code, room_code, check_in, check_out, rate, last_name, first_name, adults, kids))
+            stays = [(new_code, room_code, check_in, check_out, rate, first_name, last_name)]
+            await _update_derived(cursor, stays)
+            await conn.commit()
+    derived.after_commit(stays)
+    return new_code
+
+
+# FR2: Check availability and book in one transaction; same contract as queries.book_reservation()
+@_with_timeout
+async def book_reservation(room_code, check_in, check_out, first_name, last_name, adults, kids, rate):
+    if stay_dates(check_in, check_out) is None:
+        return {"status": "invalid", "code": None, "conflicts": []}
+    new_code = await _next_code()
+    await _prepare_derived()
+    async with _connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute("SET TRANSACTION ISOLATION LEVEL READ COMMITTED")
+            await conn.begin()
+
+            await cursor.execute(sql.LOCK_ROOM, (room_code,))
+            room = await cursor.fetchone()
+            if room is None:
+                return {"status": "unknown_room", "code": None, "conflicts": []}
+            if adults + kids > room["maxOcc"]:
+                return {"status": "over_capacity", "code": None, "conflicts": []}
+
+            await cursor.execute(sql.ROOM_CONFLICTS, (room_code, check_out, check_in))
+            conflicts = list(await cursor.fetchall())
+            if conflicts:
+                return {"status": "conflict", "code": None, "conflicts": conflicts}
+
+            await cursor.execute(sql.INSERT_RESERVATION, (new_code, room_code, check_in, check_out, rate, last_name, first_name, adults, kids))
+            stays = [(new_code, room_code, check_in, check_out, rate, first_name, last_name)]
+            await _update_derived(cursor, stays)
+            await conn.commit()
+    derived.after_commit(stays)
+    return {"status": "booked", "code": new_code, "conflicts": []}
+
+
+# FR3: Cancel a reservation by removing it from the database
+@_with_timeout
+async def cancel_reservation(reservation_code):
+    await _prepare_derived()
+    async with _connection() as conn:
+        async with conn.cursor() as cursor:
+            await cursor.execute(sql.LOCK_RESERVATION, (reservation_code,))
+            stays = list(await cursor.fetchall())
+            await cursor.execute(sql.DELETE_RESERVATION, (reservation_code,))
+            deleted = cursor.rowcount > 0
+            if deleted:
+                await _update_derived(cursor, stays, sign=-1)
+            await conn.commit()
+    if deleted:
+        derived.after_commit(stays, sign=-1)
+    return deleted
+
+
+# FR4: One keyset page of search results; same contract as queries.search_reservations_page()
+@_with_timeout
+async def search_reservations_page(reservation_code="", first_name="", last_name="", start_date=None, end_date=None, room_code="",
+                                   after_code=None, page_size=SEARCH_PAGE_SIZE):
+    candidates = await asyncio.to_thread(name_index.candidates, first_name, last_name, after_code)  # may load the index
+    if candidates is not None and not candidates:
+        return [], None
+    conditions, params = sql.search_conditions(reservation_code, first_name, last_name, start_date, end_date, room_code,
+                                               match_names=candidates is None)
+
+    async with _connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            if candidates is None:
+                await cursor.execute(*sql.search_page(conditions, params, page_size, after_code=after_code))
+                rows = list(await cursor.fetchall())
+            else:
+                rows = []
+                for i in range(0, len(candidates), SEARCH_CANDIDATE_CHUNK):
+                    await cursor.execute(*sql.search_page(conditions, params, page_size - len(rows),
+                                                          codes=candidates[i:i + SEARCH_CANDIDATE_CHUNK]))
+                    rows.extend(await cursor.fetchall())
+                    if len(rows) >= page_size:
+                        break
+
+    next_after_code = rows[-1]["CODE"] if len(rows) == page_size else None
+    return rows, next_after_code
+
+
+# FR4: Every match, page by page
+async def search_reservations(reservation_code="", first_name="", last_name="", start_date=None, end_date=None, room_code="",
+                              timeout=None):
+    results = []
+    after_code = None
+    while True:
+        rows, after_code = await search_reservations_page(reservation_code, first_name, last_name, start_date, end_date,
+                                                          room_code, after_code=after_code, timeout=timeout)
+        results.extend(rows)
+        if after_code is None:
+            return results
+
+
+# FR5: Revenue report for a year, read from lab7_revenue_monthly
+@_with_timeout
+async def generate_revenue_report(year=None):
+    year = year or datetime.date.today().year
+    await _prepare_derived()
+    async with _connection() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(sql.MONTHLY_REVENUE, (year,))
+            rows = await cursor.fetchall()
+    return revenue.build_report(rows)
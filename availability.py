@@ -0,0 +1,206 @@
+import bisect
+import os
+import threading
+
+from db import PropertyState, connect_db
+from dates import to_date
+
+
+class RoomIntervals:
+    """Reservations of one room as parallel arrays sorted by check-in."""
+
+    __slots__ = ("starts", "ends", "codes", "max_ends")
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+        self.codes = []
+        self.max_ends = []  # max_ends[i] = latest checkout among the first i+1 stays
+
+    def add(self, code, check_in, check_out):
+        pos = bisect.bisect_right(self.starts, check_in)
+        self.starts.insert(pos, check_in)
+        self.ends.insert(pos, check_out)
+        self.codes.insert(pos, code)
+        self.max_ends.insert(pos, check_out)
+        self._refresh_max_ends(pos)
+
+    def remove(self, code, check_in):
+        # Several stays can share a check-in date; scan just that run for the code
+        pos = bisect.bisect_left(self.starts, check_in)
+        while pos < len(self.starts) and self.starts[pos] == check_in:
+            if self.codes[pos] == code:
+                del self.starts[pos], self.ends[pos], self.codes[pos], self.max_ends[pos]
+                self._refresh_max_ends(pos)
+                return True
+            pos += 1
+        return False
+
+    def _refresh_max_ends(self, pos):
+        running = self.max_ends[pos - 1] if pos > 0 else None
+        for i in range(pos, len(self.ends)):
+            running = self.ends[i] if running is None or self.ends[i] > running else running
+            self.max_ends[i] = running
+
+    # A stay [check_in, check_out) collides with anything that starts before check_out and ends after check_in
+    def is_free(self, check_in, check_out):
+        pos = bisect.bisect_left(self.starts, check_out)
+        return pos == 0 or self.max_ends[pos - 1] <= check_in
+
+    # Free stretches [start, end) inside [window_start, window_end), in date order
+    def free_gaps(self, window_start, window_end):
+        pos = bisect.bisect_left(self.starts, window_start)
+        # Stays that began before the window may still run into it
+        free_from = window_start if pos == 0 else max(window_start, self.max_ends[pos - 1])
+        gaps = []
+        while pos < len(self.starts) and self.starts[pos] < window_end:
+            if self.starts[pos] > free_from:
+                gaps.append((free_from, self.starts[pos]))
+            free_from = max(free_from, self.ends[pos])
+            pos += 1
+        if free_from < window_end:
+            gaps.append((free_from, window_end))
+        return gaps
+
+
+class AvailabilityIndex:
+    """In-process availability index over lab7_reservations, one RoomIntervals per room."""
+
+    def __init__(self):
+        self._rooms = {}
+        self._by_code = {}  # code -> (room, check_in, check_out), so cancellations only need the code
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    # (Re)loads every room and reservation from the database
+    def load(self):
+        conn = connect_db()
+        if not conn:
+            return False
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT RoomCode FROM lab7_rooms")
+            room_codes = [row[0] for row in cursor.fetchall()]
+            cursor.execute("SELECT CODE, Room, CheckIn, Checkout FROM lab7_reservations ORDER BY Room, CheckIn")
+            reservations = cursor.fetchall()
+        finally:
+            conn.close()
+
+        rooms = {room: RoomIntervals() for room in room_codes}
+        by_code = {}
+        for code, room, check_in, check_out in reservations:
+            check_in, check_out = to_date(check_in), to_date(check_out)
+            intervals = rooms.setdefault(room, RoomIntervals())
+            # Rows arrive sorted by check-in, so appending keeps the arrays ordered
+            intervals.starts.append(check_in)
+            intervals.ends.append(check_out)
+            intervals.codes.append(str(code))
+            intervals.max_ends.append(check_out if not intervals.max_ends else max(intervals.max_ends[-1], check_out))
+            by_code[str(code)] = (room, check_in, check_out)
+
+        with self._lock:
+            self._rooms = rooms
+            self._by_code = by_code
+            self.loaded = True
+        return True
+
+    # True if the room has no reservation overlapping [check_in, check_out)
+    def is_free(self, room_code, check_in, check_out):
+        check_in, check_out = to_date(check_in), to_date(check_out)
+        with self._lock:
+            intervals = self._rooms.get(room_code)
+            return intervals is None or intervals.is_free(check_in, check_out)
+
+    # Room codes with no reservation overlapping [check_in, check_out)
+    def free_rooms(self, check_in, check_out):
+        check_in, check_out = to_date(check_in), to_date(check_out)
+        with self._lock:
+            return [room for room, intervals in self._rooms.items() if intervals.is_free(check_in, check_out)]
+
+    # {room code: free gaps inside [window_start, window_end)} for the given rooms
+    def free_gaps(self, room_codes, window_start, window_end):
+        window_start, window_end = to_date(window_start), to_date(window_end)
+        with self._lock:
+            return {room: self._rooms[room].free_gaps(window_start, window_end) if room in self._rooms
+                    else [(window_start, window_end)]
+                    for room in room_codes}
+
+    def has_code(self, code):
+        return str(code) in self._by_code
+
+    def add(self, code, room_code, check_in, check_out):
+        code, check_in, check_out = str(code), to_date(check_in), to_date(check_out)
+        with self._lock:
+            if code in self._by_code:
+                return
+            self._rooms.setdefault(room_code, RoomIntervals()).add(code, check_in, check_out)
+            self._by_code[code] = (room_code, check_in, check_out)
+
+    def remove(self, code):
+        code = str(code)
+        with self._lock:
+            entry = self._by_code.pop(code, None)
+            if entry is None:
+                return False
+            room_code, check_in, _ = entry
+            return self._rooms[room_code].remove(code, check_in)
+
+
+_state = PropertyState(index=AvailabilityIndex)  # one index per property
+_enabled = os.environ.get("AVAILABILITY_INDEX", "").lower() in ("1", "true", "yes")
+
+
+# Turns the index on for this process and loads it
+def enable_index():
+    global _enabled
+    _enabled = True
+    return _state.index.load()
+
+
+# Drops back to querying MySQL for every availability probe
+def disable_index():
+    global _enabled
+    _enabled = False
+
+
+# Reloads the index from the database, e.g. after bookings made by another process
+def reload_index():
+    return _state.index.load()
+
+
+# Returns the loaded index when enabled, otherwise None so callers fall back to SQL
+def get_index():
+    if not _enabled:
+        return None
+    index = _state.index
+    if not index.loaded and not index.load():
+        return None
+    return index
+
+
+# The loaded index even when AVAILABILITY_INDEX is off, for callers such as recommendations that can live with
+# it missing other processes' bookings (recommend.recommend() re-checks its picks in the database); once loaded
+# it follows this process's bookings like the enabled index
+def shared_index():
+    index = _state.index
+    if not index.loaded and not index.load():
+        return None
+    return index
+
+
+def is_loaded():
+    return _state.index.loaded
+
+
+# Keeps a loaded index in step with a new reservation
+def record_booking(code, room_code, check_in, check_out):
+    index = _state.index
+    if index.loaded:
+        index.add(code, room_code, check_in, check_out)
+
+
+# Keeps a loaded index in step with a cancellation
+def record_cancellation(code):
+    index = _state.index
+    if index.loaded:
+        index.remove(code)
@@ -0,0 +1,2 @@
+# Benchmarks for the FR1-FR5 operations: datagen.py builds a seeded synthetic hotel, harness.py loads it into a
+# scratch database, times each operation at several sizes and writes the results as JSON.
@@ -0,0 +1,177 @@
+import argparse
+import csv
+import datetime
+import math
+import sys
+
+import numpy as np
+
+
+# Seeded synthetic hotel: rooms plus reservations with seasonal demand, a tail of long stays and a few rooms
+# far more popular than the rest. Stays never overlap within a room, like real bookings.
+
+BED_TYPES = ["King", "Queen", "Double"]
+DECORS = ["modern", "traditional", "rustic", "bohemian", "shabby"]
+FIRST_NAMES = ["JAMES", "MARY", "ROBERT", "PATRICIA", "JOHN", "JENNIFER", "MICHAEL", "LINDA", "DAVID", "ELIZABETH",
+               "WILLIAM", "BARBARA", "RICHARD", "SUSAN", "JOSEPH", "JESSICA", "THOMAS", "SARAH", "CHARLES", "KAREN",
+               "NELSON", "DOLLIE", "CONRAD", "ANN", "EMERY", "ROY", "TRENT", "KIP", "ELISE", "GRACE"]
+LAST_NAMES = ["SMITH", "JOHNSON", "WILLIAMS", "BROWN", "JONES", "GARCIA", "MILLER", "DAVIS", "RODRIGUEZ", "MARTINEZ",
+              "HERNANDEZ", "LOPEZ", "GONZALEZ", "WILSON", "ANDERSON", "THOMAS", "TAYLOR", "MOORE", "JACKSON", "MARTIN",
+              "KLESS", "GABLER", "SELBIG", "VANDERSCHEL", "KNERIEN", "FRANC", "BAIRD", "MCNEESE", "BEAUBIEN", "SULEY"]
+
+START = datetime.date(2020, 1, 1)
+HORIZON_DAYS = 6 * 365  # check-ins are spread over six years
+OCCUPANCY = 0.65  # target share of room-nights booked, which decides how many rooms a given size needs
+LONG_STAY_SHARE = 0.04
+MEAN_STAY = 4.2  # nights, given the short-stay distribution and LONG_STAY_SHARE below
+POPULARITY_CAP = 1.4
+CODE_START = 10000
+
+
+def _room_code(i):
+    digits = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    code = ""
+    for _ in range(4):
+        i, digit = divmod(i, 36)
+        code = digits[digit] + code
+    return "R" + code
+
+
+# Rooms needed so `reservation_count` stays fill about OCCUPANCY of the horizon
+def room_count_for(reservation_count):
+    return max(10, math.ceil(reservation_count * MEAN_STAY / (HORIZON_DAYS * OCCUPANCY)))
+
+
+def generate_rooms(count, seed=0):
+    rng = np.random.default_rng(seed)
+    beds = rng.choice([1, 2], count, p=[0.4, 0.6])
+    max_occ = beds * 2
+    base_prices = np.round(rng.uniform(75, 300, count) + 25 * beds, -1)
+    bed_types = rng.choice(BED_TYPES, count)
+    decors = rng.choice(DECORS, count)
+    return [(_room_code(i), f"Room {_room_code(i)}", int(beds[i]), str(bed_types[i]), int(max_occ[i]),
+             float(base_prices[i]), str(decors[i]))
+            for i in range(count)]
+
+
+# Demand per day of the horizon: summer and the December holidays peak, Fridays and Saturdays run hot
+def _seasonal_weights():
+    days = np.arange(HORIZON_DAYS)
+    dates = np.datetime64(START) + days
+    day_of_year = (dates - dates.astype("datetime64[Y]")).astype(int)
+    weekday = (dates.astype(int) + 3) % 7  # 1970-01-01 was a Thursday; Monday is 0
+    weights = (1.0 + 0.45 * np.cos(2 * np.pi * (day_of_year - 200) / 365.0)
+               + 0.35 * np.exp(-((day_of_year - 355) / 8.0) ** 2)
+               + 0.25 * np.isin(weekday, (4, 5)))
+    return weights / weights.sum()
+
+
+def _season_multiplier(days):
+    day_of_year = (np.datetime64(START) + days - (np.datetime64(START) + days).astype("datetime64[Y]")).astype(int)
+    return 1.0 + 0.2 * np.cos(2 * np.pi * (day_of_year - 200) / 365.0)
+
+
+def generate_reservations(rooms, count, seed=0):
+    """Returns a dict of equal-length numpy columns (CODE, Room index, CheckIn/Checkout day offsets, Rate, ...)."""
+    rng = np.random.default_rng(seed + 1)
+    room_total = len(rooms)
+
+    # Skewed popularity: the favourite rooms get several times the bookings of the least wanted, capped at
+    # POPULARITY_CAP times the average so even they fit in the horizon
+    popularity = rng.lognormal(0.0, 0.8, room_total)
+    popularity = np.minimum(popularity / popularity.mean(), POPULARITY_CAP)
+    room = rng.choice(room_total, count, p=popularity / popularity.sum())
+
+    nights = np.minimum(rng.geometric(0.35, count), 14)
+    long_stay = rng.random(count) < LONG_STAY_SHARE
+    nights[long_stay] = rng.integers(14, 61, long_stay.sum())
+    check_in = rng.choice(HORIZON_DAYS, count, p=_seasonal_weights())
+
+    # Push overlapping stays later within each room: after sorting by (room, check-in), each stay starts at
+    # max(its own check-in, previous checkout). With nights_before = nights of earlier stays in the room that is
+    # a running maximum of check_in - nights_before, offset per room so rooms never bleed into each other
+    order = np.lexsort((check_in, room))
+    room, nights, check_in = room[order], nights[order], check_in[order]
+    nights_before = np.cumsum(nights) - nights
+    room_start = np.r_[0, np.flatnonzero(np.diff(room)) + 1]
+    first_in_room = np.zeros(count, dtype=np.int64)
+    first_in_room[room_start] = nights_before[room_start]
+    nights_before = nights_before - np.maximum.accumulate(first_in_room)
+    offset = room.astype(np.int64) * (HORIZON_DAYS + int(nights.sum()) + 1)
+    check_in = np.maximum.accumulate(check_in - nights_before + offset) - offset + nights_before
+    check_out = check_in + nights
+
+    base_price = np.array([r[5] for r in rooms])[room]
+    rate = np.round(base_price * _season_multiplier(check_in) * rng.uniform(0.9, 1.1, count), 2)
+    max_occ = np.array([r[4] for r in rooms])[room]
+    adults = rng.integers(1, max_occ + 1)
+    kids = rng.integers(0, max_occ - adults + 1)
+
+    # Codes follow booking order loosely, like a live system, rather than room order
+    codes = CODE_START + rng.permutation(count)
+    return {
+        "CODE": codes,
+        "Room": room,
+        "CheckIn": check_in,
+        "Checkout": check_out,
+        "Rate": rate,
+        "LastName": rng.choice(LAST_NAMES, count, p=_name_weights(len(LAST_NAMES))),
+        "FirstName": rng.choice(FIRST_NAMES, count, p=_name_weights(len(FIRST_NAMES))),
+        "Adults": adults,
+        "Kids": kids,
+    }
+
+
+def _name_weights(n):
+    weights = 1.0 / np.arange(1, n + 1)
+    return weights / weights.sum()
+
+
+# Reservation rows as INSERT_RESERVATION-ordered tuples
+# (CODE, Room, CheckIn, Checkout, Rate, LastName, FirstName, Adults, Kids), chunk_size at a time
+def reservation_rows(rooms, columns, chunk_size=50000):
+    room_codes = np.array([r[0] for r in rooms])
+    start = np.datetime64(START)
+    total = len(columns["CODE"])
+    for i in range(0, total, chunk_size):
+        part = slice(i, i + chunk_size)
+        yield list(zip(
+            columns["CODE"][part].tolist(),
+            room_codes[columns["Room"][part]].tolist(),
+            (start + columns["CheckIn"][part]).astype(str).tolist(),
+            (start + columns["Checkout"][part]).astype(str).tolist(),
+            columns["Rate"][part].tolist(),
+            columns["LastName"][part].tolist(),
+            columns["FirstName"][part].tolist(),
+            columns["Adults"][part].tolist(),
+            columns["Kids"][part].tolist(),
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic hotel as CSV: rooms to one file, reservations to another")
+    parser.add_argument("size", type=int, help="number of reservations")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rooms-file", default="rooms.csv")
+    parser.add_argument("--reservations-file", default="-", help="'-' for stdout")
+    args = parser.parse_args()
+
+    rooms = generate_rooms(room_count_for(args.size), args.seed)
+    with open(args.rooms_file, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["RoomCode", "RoomName", "Beds", "bedType", "maxOcc", "basePrice", "decor"])
+        writer.writerows(rooms)
+
+    out = sys.stdout if args.reservations_file == "-" else open(args.reservations_file, "w", newline="")
+    try:
+        writer = csv.writer(out)
+        writer.writerow(["CODE", "Room", "CheckIn", "Checkout", "Rate", "LastName", "FirstName", "Adults", "Kids"])
+        for rows in reservation_rows(rooms, generate_reservations(rooms, args.size, args.seed)):
+            writer.writerows(rows)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench import datagen
+
+
+# Times every FR1-FR5 operation against generated data. `run` measures each size in a fresh child process
+# with its own scratch database, so caches, indexes and pools never carry over between sizes; `compare`
+# diffs two result files.
+
+DEFAULT_SIZES = [10000, 100000, 1000000]
+DEFAULT_REPEAT = 20
+RESULTS_SCHEMA = 1
+DERIVED_TABLES = ["lab7_revenue_monthly", "lab7_room_stats", "lab7_code_sequence", "lab7_reservation_changes"]
+
+
+def _random_stay(rng, max_nights=7):
+    check_in = datagen.START + datetime.timedelta(days=rng.randrange(datagen.HORIZON_DAYS - max_nights))
+    return check_in, check_in + datetime.timedelta(days=rng.randint(1, max_nights))
+
+
+# Operation name -> one call with arguments drawn from rng. Imports happen here, inside the child process,
+# once DB_BACKEND and DB_PATH point at the scratch database
+def _operations(rooms, codes):
+    import main
+    import queries
+    import rates
+    import room_stats
+
+    room_codes = [room[0] for room in rooms]
+    base_prices = {room[0]: room[5] for room in rooms}
+    years = range(datagen.START.year, datagen.START.year + datagen.HORIZON_DAYS // 365)
+
+    def get_all_rooms(rng):
+        room_stats.invalidate_cache()
+        queries.get_all_rooms()
+
+    def check_room_availability(rng):
+        queries.check_room_availability(rng.choice(room_codes), *_random_stay(rng))
+
+    def find_alternative_rooms(rng):
+        queries.find_alternative_rooms(*_random_stay(rng), rng.randint(1, 4), rng.choice(datagen.BED_TYPES))
+
+    def calculate_total_cost(rng):
+        room_code = rng.choice(room_codes)
+        main.calculate_total_cost(*_random_stay(rng, 14), base_prices[room_code])
+
+    def quote_rooms(rng):
+        rates.quote_rooms(rng.sample(room_codes, min(10, len(room_codes))), *_random_stay(rng, 14))
+
+    # Past the generated horizon, so the booking goes through and the cancel has something to remove
+    def book_and_cancel(rng):
+        check_in, check_out = (day + datetime.timedelta(days=2 * datagen.HORIZON_DAYS) for day in _random_stay(rng))
+        room_code = rng.choice(room_codes)
+        result = queries.book_reservation(room_code, check_in, check_out, "BENCH", "BENCH", 1, 0, base_prices[room_code])
+        if result["status"] != "booked":
+            raise RuntimeError(f"Benchmark booking failed: {result}")
+        queries.cancel_reservation(result["code"])
+
+    def search_by_code(rng):
+        queries.search_reservations(reservation_code=rng.choice(codes))
+
+    def search_by_name(rng):
+        name = rng.choice(datagen.LAST_NAMES)
+        start = rng.randrange(len(name) - 2)
+        queries.search_reservations_page(last_name=name[start:start + 3])
+
+    def search_by_dates(rng):
+        queries.search_reservations_page(*[""] * 3, *_random_stay(rng))
+
+    def generate_revenue_report(rng):
+        queries.generate_revenue_report(rng.choice(years))
+
+    return {
+        "fr1_get_all_rooms": get_all_rooms,
+        "fr1_get_all_rooms_cached": lambda rng: queries.get_all_rooms(),
+        "fr2_check_room_availability": check_room_availability,
+        "fr2_find_alternative_rooms": find_alternative_rooms,
+        "fr2_calculate_total_cost": calculate_total_cost,
+        "fr2_quote_rooms": quote_rooms,
+        "fr2_book_and_cancel": book_and_cancel,
+        "fr4_search_by_code": search_by_code,
+        "fr4_search_by_name": search_by_name,
+        "fr4_search_by_dates": search_by_dates,
+        "fr5_generate_revenue_report": generate_revenue_report,
+    }
+
+
+def _summarize(timings):
+    timings = sorted(timings)
+    ms = [t * 1000 for t in timings]
+    return {
+        "runs": len(ms),
+        "min_ms": ms[0],
+        "median_ms": statistics.median(ms),
+        "mean_ms": statistics.fmean(ms),
+        "p95_ms": ms[min(len(ms) - 1, int(round(0.95 * (len(ms) - 1))))],
+        "max_ms": ms[-1],
+    }
+
+
+# Clears a MySQL scratch schema; the SQLite scratch file starts out empty
+def _wipe(cursor):
+    for table in DERIVED_TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    cursor.execute("DELETE FROM lab7_reservations")
+    cursor.execute("DELETE FROM lab7_rooms")
+
+
+def _load(rooms, columns, wipe):
+    import db
+    import sql
+
+    conn = db.connect_db()
+    if not conn:
+        raise RuntimeError("No database connection")
+    try:
+        cursor = conn.cursor()
+        if wipe:
+            _wipe(cursor)
+        cursor.executemany(f"INSERT INTO lab7_rooms VALUES ({sql.placeholders(7)})", rooms)
+        conn.commit()
+        for rows in datagen.reservation_rows(rooms, columns):
+            cursor.executemany(sql.INSERT_RESERVATION, rows)
+            conn.commit()
+    finally:
+        conn.close()
+
+
+# Child process: generate, load and time one size, printing the result as JSON
+def measure(size, seed, repeat, wipe):
+    import db
+    import derived
+
+    started = time.perf_counter()
+    rooms = datagen.generate_rooms(datagen.room_count_for(size), seed)
+    columns = datagen.generate_reservations(rooms, size, seed)
+    generate_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    _load(rooms, columns, wipe)
+    load_seconds = time.perf_counter() - started
+
+    # The derived tables' one-off backfill, which the first booking or report would otherwise pay for
+    started = time.perf_counter()
+    conn = db.connect_db()
+    try:
+        derived.prepare(conn)
+    finally:
+        conn.close()
+    prepare_seconds = time.perf_counter() - started
+
+    codes = columns["CODE"][:1000].tolist()
+    results = {}
+    for name, operation in _operations(rooms, codes).items():
+        rng = random.Random(f"{seed}:{name}")
+        operation(rng)  # warm-up: first-call imports, index and calendar loads
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            operation(rng)
+            timings.append(time.perf_counter() - started)
+        results[name] = _summarize(timings)
+
+    return {
+        "size": size,
+        "rooms": len(rooms),
+        "generate_seconds": generate_seconds,
+        "load_seconds": load_seconds,
+        "prepare_derived_seconds": prepare_seconds,
+        "operations": results,
+    }
+
+
+def _git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def run(args):
+    if args.backend == "mysql" and not args.wipe_mysql:
+        sys.exit("The mysql backend loads into DB_NAME after deleting every reservation and room in it; "
+                 "pass --wipe-mysql if that schema is a scratch copy")
+
+    commit, dirty = _git_commit()
+    report = {
+        "schema": RESULTS_SCHEMA,
+        "commit": commit,
+        "dirty": dirty,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "sizes": [],
+    }
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as scratch:
+            env = dict(os.environ, DB_BACKEND=args.backend)
+            if args.backend == "sqlite":
+                env["DB_PATH"] = os.path.join(scratch, "bench.db")
+            print(f"Measuring {size:,} reservations...", file=sys.stderr)
+            child = subprocess.run(
+                [sys.executable, "-m", "bench.harness", "measure", str(size), "--seed", str(args.seed),
+                 "--repeat", str(args.repeat)] + (["--wipe"] if args.backend == "mysql" else []),
+                env=env, stdout=subprocess.PIPE, text=True, check=True,
+            )
+        report["sizes"].append(json.loads(child.stdout.splitlines()[-1]))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+    _print_table(report)
+
+
+def _print_table(report):
+    names = list(report["sizes"][0]["operations"]) if report["sizes"] else []
+    print(f"{'operation':<30}" + "".join(f"{entry['size']:>14,}" for entry in report["sizes"]))
+    for name in names:
+        print(f"{name:<30}" + "".join(f"{entry['operations'][name]['median_ms']:>12.2f}ms" for entry in report["sizes"]))
+
+
+# Median-to-median ratio per (size, operation); exits 1 if anything slowed down by more than the threshold
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    base_sizes = {entry["size"]: entry for entry in baseline["sizes"]}
+    regressions = 0
+    print(f"{'size':>10}  {'operation':<30}{'baseline':>12}{'candidate':>12}{'change':>9}")
+    for entry in candidate["sizes"]:
+        base = base_sizes.get(entry["size"])
+        if base is None:
+            continue
+        for name, stats in entry["operations"].items():
+            if name not in base["operations"]:
+                continue
+            before, after = base["operations"][name]["median_ms"], stats["median_ms"]
+            change = (after - before) / before if before else 0.0
+            flag = ""
+            if change > args.threshold:
+                regressions += 1
+                flag = "  REGRESSION"
+            print(f"{entry['size']:>10,}  {name:<30}{before:>10.2f}ms{after:>10.2f}ms{change:>+9.1%}{flag}")
+    print(f"{regressions} regression(s) over {args.threshold:.0%} "
+          f"({baseline.get('commit') or '?'} -> {candidate.get('commit') or '?'})")
+    sys.exit(1 if regressions else 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the FR1-FR5 operations on synthetic data")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="measure every size and write a results file")
+    run_parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="reservation counts, 10k to 10M")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed calls per operation")
+    run_parser.add_argument("--backend", choices=["sqlite", "mysql"], default="sqlite")
+    run_parser.add_argument("--wipe-mysql", action="store_true", help="allow loading into the configured MySQL schema")
+    run_parser.add_argument("--output", default="bench-results.json")
+
+    measure_parser = commands.add_parser("measure", help=argparse.SUPPRESS)
+    measure_parser.add_argument("size", type=int)
+    measure_parser.add_argument("--seed", type=int, default=0)
+    measure_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    measure_parser.add_argument("--wipe", action="store_true")
+
+    compare_parser = commands.add_parser("compare", help="compare two results files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=0.2, help="slowdown that counts as a regression")
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    elif args.command == "measure":
+        print(json.dumps(measure(args.size, args.seed, args.repeat, args.wipe)))
+    else:
+        compare(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from bench import datagen
+
+
+# Concurrent load test: many clerks driving the queries.py API at once, from threads in one process (shared
+# pool and caches) or from separate processes (one clerk each, like several app instances). Workloads mix
+# availability checks, bookings that pile onto a few hot rooms, cancellations, searches and reports. Reports
+# throughput, latency percentiles per operation and the booking conflict rate, then checks that no two stays
+# in any room overlap.
+#
+#   python -m bench.loadtest --workload rush --workers 16 --duration 30
+#   python -m bench.loadtest --mode process --workers 8 --mix book=70,check=20,cancel=10
+
+# Operation weights per named workload
+WORKLOADS = {
+    "mixed": {"check": 35, "book": 20, "cancel": 5, "search": 20, "alternatives": 15, "report": 5},
+    "rush": {"check": 30, "book": 60, "cancel": 10},
+    "browse": {"check": 40, "search": 30, "alternatives": 20, "report": 10},
+}
+OPERATIONS = ["check", "book", "cancel", "search", "alternatives", "report"]
+PERCENTILES = [50, 90, 99]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}; expected one of {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Clerk:
+    """One simulated user: picks operations by weight and times each call."""
+
+    def __init__(self, config, worker_id):
+        import queries
+
+        self.queries = queries
+        self.config = config
+        self.rng = random.Random(f"{config['seed']}:{worker_id}")
+        self.first_name = f"LOAD{worker_id}"
+        self.operations = list(config["mix"])
+        self.weights = [config["mix"][name] for name in self.operations]
+        self.booked = []  # codes this clerk booked and hasn't cancelled
+        self.latencies = defaultdict(list)  # operation -> seconds
+        self.outcomes = Counter()  # "operation:outcome" -> count
+
+    def _room(self):
+        if self.rng.random() < self.config["hot_share"]:
+            return self.rng.choice(self.config["hot_rooms"])
+        return self.rng.choice(self.config["rooms"])
+
+    def _stay(self):
+        start = datetime.date.fromisoformat(self.config["start"])
+        check_in = start + datetime.timedelta(days=self.rng.randrange(self.config["window_days"]))
+        return check_in, check_in + datetime.timedelta(days=self.rng.randint(1, self.config["max_nights"]))
+
+    def check(self):
+        free = self.queries.check_room_availability(self._room(), *self._stay())
+        return "free" if free else "taken"
+
+    def book(self):
+        room = self._room()
+        result = self.queries.book_reservation(room, *self._stay(), self.first_name, "LOADTEST", 1, 0,
+                                               self.config["prices"][room])
+        if result["status"] == "booked":
+            self.booked.append(result["code"])
+        return result["status"]
+
+    def cancel(self):
+        if not self.booked:
+            return "nothing_booked"
+        code = self.booked.pop(self.rng.randrange(len(self.booked)))
+        return "cancelled" if self.queries.cancel_reservation(code) else "missing"
+
+    def search(self):
+        name = self.rng.choice(datagen.LAST_NAMES)
+        start = self.rng.randrange(len(name) - 2)
+        self.queries.search_reservations_page(last_name=name[start:start + 3])
+        return "ok"
+
+    def alternatives(self):
+        rooms = self.queries.find_alternative_rooms(*self._stay(), self.rng.randint(1, 4),
+                                                    self.rng.choice(datagen.BED_TYPES))
+        return "found" if rooms else "none"
+
+    def report(self):
+        self.queries.generate_revenue_report(datetime.date.fromisoformat(self.config["start"]).year)
+        return "ok"
+
+    # Runs operations from start_at until end_at (time.time()), or for `operations` calls when that is set
+    def run(self, start_at, end_at, operations=None):
+        self.check()  # warm-up outside the measured window: imports, pool, catalog
+        time.sleep(max(0.0, start_at - time.time()))
+        done = 0
+        while (done < operations) if operations else time.time() < end_at:
+            name = self.rng.choices(self.operations, self.weights)[0]
+            started = time.perf_counter()
+            try:
+                outcome = getattr(self, name)()
+            except Exception as e:
+                outcome = f"error {type(e).__name__}: {e}"
+            self.latencies[name].append(time.perf_counter() - started)
+            self.outcomes[f"{name}:{outcome}"] += 1
+            done += 1
+            if self.config["think_ms"]:
+                time.sleep(self.config["think_ms"] / 1000)
+        return {"latencies": dict(self.latencies), "outcomes": dict(self.outcomes), "elapsed": time.time() - start_at}
+
+
+def _run_clerk(config, worker_id, start_at, end_at, operations):
+    return Clerk(config, worker_id).run(start_at, end_at, operations)
+
+
+# Runs every clerk and merges their results
+def run_clerks(config, workers, mode, duration, operations=None):
+    lead = 0.5 if mode == "thread" else 5.0  # time for clerks to start (and, as processes, import) before the clock
+    start_at = time.time() + lead
+    end_at = start_at + duration
+    per_clerk = -(-operations // workers) if operations else None
+    if mode == "thread":
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="clerk")
+    else:
+        # spawn, not fork: each clerk opens its own connections and builds its own caches from scratch
+        executor = multiprocessing.get_context("spawn").Pool(workers)
+    with executor:
+        if mode == "thread":
+            futures = [executor.submit(_run_clerk, config, i, start_at, end_at, per_clerk) for i in range(workers)]
+            results = [future.result() for future in futures]
+        else:
+            results = executor.starmap(_run_clerk, [(config, i, start_at, end_at, per_clerk) for i in range(workers)])
+
+    latencies, outcomes = defaultdict(list), Counter()
+    for result in results:
+        for name, values in result["latencies"].items():
+            latencies[name].extend(values)
+        outcomes.update(result["outcomes"])
+    elapsed = max(result["elapsed"] for result in results)
+    return latencies, outcomes, elapsed
+
+
+def _percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(round(p / 100 * (len(sorted_values) - 1))))]
+
+
+def summarize(latencies, outcomes, elapsed):
+    operations = {}
+    for name, values in latencies.items():
+        ms = sorted(value * 1000 for value in values)
+        errors = sum(count for key, count in outcomes.items() if key.startswith(f"{name}:error"))
+        operations[name] = {
+            "count": len(ms),
+            "errors": errors,
+            "per_second": len(ms) / elapsed if elapsed else 0.0,
+            **{f"p{p}_ms": _percentile(ms, p) for p in PERCENTILES},
+            "max_ms": ms[-1],
+        }
+    attempts = operations.get("book", {}).get("count", 0)
+    booked, conflicts = outcomes.get("book:booked", 0), outcomes.get("book:conflict", 0)
+    total = sum(stats["count"] for stats in operations.values())
+    return {
+        "seconds": elapsed,
+        "operations_total": total,
+        "throughput": total / elapsed if elapsed else 0.0,
+        "operations": operations,
+        "bookings": {
+            "attempted": attempts,
+            "booked": booked,
+            "conflicts": conflicts,
+            "conflict_rate": conflicts / attempts if attempts else 0.0,
+            "booked_per_second": booked / elapsed if elapsed else 0.0,
+        },
+        "outcomes": dict(sorted(outcomes.items())),
+    }
+
+
+# (room, code, other code) for every pair of stays in the same room that overlap; walks each room's stays in
+# CheckIn order keeping the latest Checkout so far, so it is one ordered scan rather than a self-join
+def find_overlaps():
+    import db
+
+    conn = db.connect_db(primary=True)
+    if not conn:
+        raise RuntimeError("No database connection")
+    overlaps = []
+    try:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute("SELECT Room, CODE, CheckIn, Checkout FROM lab7_reservations ORDER BY Room, CheckIn, Checkout")
+        room = latest = latest_code = None
+        for stay_room, code, check_in, check_out in cursor:
+            if stay_room != room:
+                room, latest, latest_code = stay_room, None, None
+            elif check_in < latest:
+                overlaps.append((room, latest_code, code))
+            if latest is None or check_out > latest:
+                latest, latest_code = check_out, code
+    finally:
+        conn.close()
+    return overlaps
+
+
+# Seeds a scratch database with `size` generated reservations
+def load_scratch(size, seed):
+    import db
+    import derived
+    from bench.harness import _load
+
+    rooms = datagen.generate_rooms(datagen.room_count_for(size), seed)
+    _load(rooms, datagen.generate_reservations(rooms, size, seed), wipe=False)
+    conn = db.connect_db()
+    try:
+        derived.prepare(conn)
+    finally:
+        conn.close()
+
+
+# Rooms, prices and the first date after every existing stay, from the database under test
+def _describe_hotel():
+    import catalog
+    import db
+
+    rooms = catalog.get_catalog()
+    conn = db.connect_db()
+    if rooms is None or not conn:
+        raise RuntimeError("No database connection")
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(Checkout) FROM lab7_reservations")
+        last = cursor.fetchone()[0]
+    finally:
+        conn.close()
+    last = datetime.date.fromisoformat(str(last)) if last else datetime.date.today()
+    return ({room.RoomCode: float(room.basePrice) for room in rooms.rooms},
+            max(last, datetime.date.today()) + datetime.timedelta(days=1))
+
+
+def _print_report(report):
+    config = report["config"]
+    print(f"Workload {config['workload']}: {config['workers']} {config['mode']} clerks, {report['seconds']:.1f}s, "
+          f"{report['operations_total']:,} operations ({report['throughput']:,.1f}/s)")
+    print(f"{'operation':<14}{'count':>9}{'errors':>8}{'per s':>9}" + "".join(f"{f'p{p} ms':>10}" for p in PERCENTILES)
+          + f"{'max ms':>10}")
+    for name, stats in report["operations"].items():
+        print(f"{name:<14}{stats['count']:>9,}{stats['errors']:>8,}{stats['per_second']:>9.1f}"
+              + "".join(f"{stats[f'p{p}_ms']:>10.2f}" for p in PERCENTILES) + f"{stats['max_ms']:>10.2f}")
+    bookings = report["bookings"]
+    print(f"Bookings: {bookings['attempted']:,} attempted, {bookings['booked']:,} booked "
+          f"({bookings['booked_per_second']:.1f}/s), {bookings['conflicts']:,} conflicts "
+          f"({bookings['conflict_rate']:.1%})")
+    for key, count in report["outcomes"].items():
+        if ":error" in key:
+            print(f"  {count:,} x {key}")
+    overlaps = report["overlaps"]
+    if overlaps:
+        print(f"Integrity: {len(overlaps)} overlapping stay(s), e.g. room {overlaps[0][0]} codes {overlaps[0][1]} and {overlaps[0][2]}")
+    else:
+        print("Integrity: no overlapping stays in any room")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent booking load test with an overlap integrity check")
+    parser.add_argument("--workload", choices=sorted(WORKLOADS), default="mixed")
+    parser.add_argument("--mix", help="operation weights instead of a workload, e.g. book=60,check=30,cancel=10")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent clerks")
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    parser.add_argument("--operations", type=int, help="stop after this many operations instead")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="pause after each operation")
+    parser.add_argument("--hot-rooms", type=int, default=5, help="rooms most bookings and checks go for")
+    parser.add_argument("--hot-share", type=float, default=0.5, help="share of bookings and checks on the hot rooms")
+    parser.add_argument("--window-days", type=int, default=30, help="stays start within this many days")
+    parser.add_argument("--max-nights", type=int, default=5)
+    parser.add_argument("--size", type=int, default=10000, help="reservations to seed the scratch database with")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--existing", action="store_true",
+                        help="run against the configured DB_* database instead of a scratch SQLite file; "
+                             "bookings made during the run are left in it")
+    parser.add_argument("--output", help="also write the report as JSON")
+    args = parser.parse_args()
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    scratch = None
+    if not args.existing:
+        scratch = tempfile.TemporaryDirectory()
+        os.environ.update(DB_BACKEND="sqlite", DB_PATH=os.path.join(scratch.name, "loadtest.db"))
+        os.environ.pop("SHARD_MAP", None)
+    os.environ.setdefault("DB_POOL_MAX", str(max(10, args.workers)))  # read when db is first imported
+    try:
+        if scratch:
+            print(f"Seeding {args.size:,} reservations...", file=sys.stderr)
+            load_scratch(args.size, args.seed)
+        prices, start = _describe_hotel()
+        rng = random.Random(args.seed)
+        rooms = sorted(prices)
+        config = {
+            "workload": "custom" if args.mix else args.workload,
+            "mix": parse_mix(args.mix) if args.mix else WORKLOADS[args.workload],
+            "workers": args.workers,
+            "mode": args.mode,
+            "seed": args.seed,
+            "rooms": rooms,
+            "hot_rooms": rng.sample(rooms, min(args.hot_rooms, len(rooms))),
+            "hot_share": args.hot_share,
+            "prices": prices,
+            "start": start.isoformat(),
+            "window_days": args.window_days,
+            "max_nights": args.max_nights,
+            "think_ms": args.think_ms,
+        }
+        latencies, outcomes, elapsed = run_clerks(config, args.workers, args.mode, args.duration, args.operations)
+        report = summarize(latencies, outcomes, elapsed)
+        report["config"] = {key: value for key, value in config.items() if key not in ("rooms", "prices")}
+        report["overlaps"] = find_overlaps()
+    finally:
+        if scratch:
+            scratch.cleanup()
+
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+    sys.exit(1 if report["overlaps"] else 0)
+
+
+if __name__ == "__main__":
+    main()
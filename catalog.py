@@ -0,0 +1,143 @@
+import bisect
+import os
+import threading
+import time
+from collections import defaultdict
+from types import MappingProxyType
+
+import sql
+from db import PropertyState, connect_db
+
+
+# lab7_rooms held in memory. It is small and rarely changes, so every room-metadata lookup is answered from
+# an immutable snapshot; a checksum over every row (its "version", see sql.CATALOG_VERSION) is re-checked every
+# CATALOG_CHECK_INTERVAL seconds and a changed table is reloaded into a fresh snapshot.
+
+CATALOG_CHECK_INTERVAL = float(os.environ.get("CATALOG_CHECK_INTERVAL", "30"))
+
+FIELDS = ("RoomCode", "RoomName", "Beds", "bedType", "maxOcc", "basePrice", "decor")
+DETAIL_FIELDS = ("RoomCode", "RoomName", "Beds", "bedType", "maxOcc", "basePrice")  # ROOM_DETAILS' columns
+
+
+class RoomRecord:
+    """One lab7_rooms row. Read-only once built."""
+
+    __slots__ = FIELDS
+
+    def __init__(self, *values):
+        for field, value in zip(FIELDS, values):
+            object.__setattr__(self, field, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RoomRecord is read-only; reload the catalog instead")
+
+    def as_dict(self, fields=DETAIL_FIELDS):
+        return {field: getattr(self, field) for field in fields}
+
+    def __repr__(self):
+        return f"RoomRecord({self.RoomCode!r}, {self.RoomName!r})"
+
+
+class RoomCatalog:
+    """Snapshot of every room, indexed by RoomCode, bedType and maxOcc."""
+
+    def __init__(self, records, version):
+        self.version = version
+        self.rooms = tuple(sorted(records, key=lambda room: room.RoomCode))
+        self.by_code = MappingProxyType({room.RoomCode: room for room in self.rooms})
+
+        by_bed_type = defaultdict(list)
+        by_max_occ = defaultdict(list)
+        for room in self.rooms:
+            by_bed_type[room.bedType.lower()].append(room)
+            by_max_occ[room.maxOcc].append(room)
+        # bedType compares case-insensitively, like MySQL's default collation
+        self.by_bed_type = MappingProxyType({bed_type: tuple(rooms) for bed_type, rooms in by_bed_type.items()})
+        self.by_max_occ = MappingProxyType({max_occ: tuple(rooms) for max_occ, rooms in by_max_occ.items()})
+        self._occupancies = sorted(self.by_max_occ)
+
+    def get(self, room_code):
+        return self.by_code.get(room_code)
+
+    def with_bed_type(self, bed_type):
+        return self.by_bed_type.get(bed_type.lower(), ())
+
+    # Rooms that sleep at least `guests`, closest fit first, then cheapest (ROOMS_FOR_OCCUPANCY's order)
+    def for_occupancy(self, guests, bed_type=None):
+        start = bisect.bisect_left(self._occupancies, guests)
+        rooms = [room for max_occ in self._occupancies[start:] for room in self.by_max_occ[max_occ]]
+        if bed_type is not None and bed_type.lower() != "any":
+            bed_type = bed_type.lower()
+            rooms = [room for room in rooms if room.bedType.lower() == bed_type]
+        rooms.sort(key=lambda room: (room.maxOcc - guests, room.basePrice, room.RoomCode))
+        return rooms
+
+    def base_prices(self):
+        return {room.RoomCode: room.basePrice for room in self.rooms}
+
+
+def _version(cursor):
+    cursor.execute(sql.CATALOG_VERSION)
+    return tuple(cursor.fetchone())
+
+
+def load_catalog():
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
+        version = _version(cursor)
+        cursor.execute(sql.CATALOG_ROOMS)
+        records = [RoomRecord(*row) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+    return RoomCatalog(records, version)
+
+
+def _current_version():
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        return _version(conn.cursor())
+    finally:
+        conn.close()
+
+
+_state = PropertyState(catalog=None, checked_at=0.0)  # one snapshot per property
+_lock = threading.Lock()
+
+
+# Returns the current snapshot, loading it on first use and reloading it if lab7_rooms has changed since
+def get_catalog():
+    state = _state
+    catalog = state.catalog
+    if catalog is not None and time.monotonic() - state.checked_at < CATALOG_CHECK_INTERVAL:
+        return catalog
+
+    with _lock:
+        if state.catalog is not None and time.monotonic() - state.checked_at < CATALOG_CHECK_INTERVAL:
+            return state.catalog
+        if state.catalog is not None:
+            version = _current_version()
+            if version is None or version == state.catalog.version:  # unchanged, or can't tell: keep serving
+                state.checked_at = time.monotonic()
+                return state.catalog
+        catalog = load_catalog()
+        if catalog is not None:
+            state.catalog = catalog
+            state.checked_at = time.monotonic()
+        return state.catalog
+
+
+# Drops the snapshot, e.g. right after editing lab7_rooms; the next lookup reloads it. Without this an edit is
+# picked up by the next version check, up to CATALOG_CHECK_INTERVAL seconds later
+def invalidate():
+    with _lock:
+        _state.catalog = None
+
+
+def get_room(room_code):
+    catalog = get_catalog()
+    return catalog.get(room_code) if catalog is not None else None
@@ -0,0 +1,178 @@
+import argparse
+import datetime
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+import queries
+from dates import to_date
+
+
+# Chain-wide operations across the properties in the shard map (see db.py). Each one runs a per-property
+# operation from queries.py for every property in parallel, on a shared thread pool and with that property
+# current, and merges the results. A property that fails or can't be reached is listed under "unavailable"
+# instead of failing the whole call.
+
+FAN_OUT_WORKERS = int(os.environ.get("FAN_OUT_WORKERS", "8"))
+FAN_OUT_TIMEOUT = float(os.environ.get("FAN_OUT_TIMEOUT", "30"))  # seconds to wait for every property
+NEARBY_RADIUS_KM = 50.0
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=FAN_OUT_WORKERS, thread_name_prefix="fan-out")
+    return _executor
+
+
+# Runs func(*args, **kwargs) once per property (every property by default) in parallel.
+# Returns ({property: result}, {property: error}), both in shard map order
+def fan_out(func, *args, properties=None, **kwargs):
+    keys = db.properties() if properties is None else list(properties)
+
+    def run(key):
+        with db.use_property(key):
+            return func(*args, **kwargs)
+
+    futures = {key: _get_executor().submit(run, key) for key in keys}
+    deadline = time.monotonic() + FAN_OUT_TIMEOUT
+    results, errors = {}, {}
+    for key, future in futures.items():
+        try:
+            results[key] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except Exception as e:
+            errors[key] = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+    return results, errors
+
+
+# Great-circle distance in km between two (latitude, longitude) pairs
+def distance_km(a, b):
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(h))
+
+
+# {property: km} for the properties within radius_km of `origin`, itself included; properties without a
+# location in the shard map are left out
+def nearby(origin, radius_km=NEARBY_RADIUS_KM):
+    if origin not in db.properties():
+        raise ValueError(f"Unknown property {origin!r}")
+    location = db.property_settings(origin).get("location")
+    if not location:
+        raise ValueError(f"Property {origin!r} has no location in the shard map")
+    distances = {}
+    for key in db.properties():
+        other = db.property_settings(key).get("location")
+        if key == origin:
+            distances[key] = 0.0
+        elif other:
+            km = distance_km(location, other)
+            if km <= radius_km:
+                distances[key] = round(km, 1)
+    return distances
+
+
+# Revenue per property and month for one year, with chain-wide monthly totals
+def chain_revenue(year=None):
+    year = year or datetime.date.today().year
+    reports, unavailable = fan_out(queries.generate_revenue_report, year)
+    properties = {}
+    for key, report in reports.items():
+        months = {month: round(sum(row[month] for row in report), 2) for month in range(1, 13)}
+        properties[key] = {**months, "Total": round(sum(months.values()), 2), "rooms": report}
+    chain = {month: round(sum(totals[month] for totals in properties.values()), 2) for month in range(1, 13)}
+    chain["Total"] = round(sum(chain.values()), 2)
+    return {"year": year, "properties": properties, "chain": chain, "unavailable": unavailable}
+
+
+def search_availability(check_in, check_out, total_guests, bed_type="Any", near=None, radius_km=NEARBY_RADIUS_KM):
+    """Rooms free for the whole stay at every property, or at those within radius_km of the property `near`.
+
+    Rows are queries.find_available_rooms() rows plus Property (and DistanceKm with `near`), nearest and then
+    cheapest first.
+    """
+    if to_date(check_in) >= to_date(check_out):
+        raise ValueError("Check-out must be after check-in")
+    distances = nearby(near, radius_km) if near else {}
+    results, unavailable = fan_out(queries.find_available_rooms, check_in, check_out, total_guests, bed_type,
+                                   properties=list(distances) if near else None)
+    rooms = []
+    for key, rows in results.items():
+        if rows is None:
+            unavailable[key] = "no database connection"
+            continue
+        extra = {"Property": key, "DistanceKm": distances[key]} if near else {"Property": key}
+        rooms.extend({**extra, **row} for row in rows)
+    rooms.sort(key=lambda room: (room.get("DistanceKm", 0), float(room["basePrice"]), room["Property"], room["RoomCode"]))
+    return {"rooms": rooms, "unavailable": unavailable}
+
+
+# Reservations matching the guest name filters (substrings, as in FR4) at every property, by check-in date
+def search_guests(first_name="", last_name="", start_date=None, end_date=None):
+    results, unavailable = fan_out(queries.search_reservations, "", first_name, last_name, start_date, end_date)
+    reservations = [{"Property": key, **row} for key, rows in results.items() for row in rows]
+    reservations.sort(key=lambda row: (str(row["CheckIn"]), row["Property"], row["CODE"]))
+    return {"reservations": reservations, "unavailable": unavailable}
+
+
+def _print_unavailable(result):
+    for key, error in result["unavailable"].items():
+        print(f"  {key}: unavailable ({error})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chain-wide reports and searches across every property")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("properties", help="list the properties in the shard map")
+    revenue_parser = commands.add_parser("revenue", help="revenue per property for a year")
+    revenue_parser.add_argument("--year", type=int)
+    availability_parser = commands.add_parser("availability", help="rooms free for a stay across properties")
+    availability_parser.add_argument("check_in")
+    availability_parser.add_argument("check_out")
+    availability_parser.add_argument("--guests", type=int, default=1)
+    availability_parser.add_argument("--bed-type", default="Any")
+    availability_parser.add_argument("--near", help="only properties near this one")
+    availability_parser.add_argument("--radius", type=float, default=NEARBY_RADIUS_KM, help="km, with --near")
+    guests_parser = commands.add_parser("guests", help="a guest's reservations across properties")
+    guests_parser.add_argument("--first-name", default="")
+    guests_parser.add_argument("--last-name", default="")
+    args = parser.parse_args()
+
+    if args.command == "properties":
+        for key in db.properties():
+            settings = db.property_settings(key)
+            default = " (default)" if key == db.current_property() else ""
+            print(f"{key:<16} {settings.get('endpoint') or db.get_backend().name}{default}")
+    elif args.command == "revenue":
+        result = chain_revenue(args.year)
+        for key, totals in result["properties"].items():
+            print(f"{key:<16} {totals['Total']:>14,.2f}")
+        print(f"{'Chain':<16} {result['chain']['Total']:>14,.2f}")
+        _print_unavailable(result)
+    elif args.command == "availability":
+        result = search_availability(args.check_in, args.check_out, args.guests, args.bed_type, args.near, args.radius)
+        for room in result["rooms"]:
+            distance = f" {room['DistanceKm']:>6.1f} km" if "DistanceKm" in room else ""
+            print(f"{room['Property']:<16}{distance} {room['RoomCode']:<5} {room['RoomName']:<28} "
+                  f"{room['bedType']:<8} sleeps {room['maxOcc']}  ${float(room['basePrice']):.2f}")
+        _print_unavailable(result)
+    else:
+        if not args.first_name and not args.last_name:
+            parser.error("give --first-name and/or --last-name")
+        result = search_guests(args.first_name, args.last_name)
+        for row in result["reservations"]:
+            print(f"{row['Property']:<16} {row['CODE']:>8} {row['Room']:<5} {row['CheckIn']} to {row['Checkout']}  "
+                  f"{row['LastName']}, {row['FirstName']}")
+        _print_unavailable(result)
+
+
+if __name__ == "__main__":
+    main()
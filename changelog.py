@@ -0,0 +1,278 @@
+import argparse
+import datetime
+import os
+import threading
+import time
+from collections import namedtuple
+
+import availability
+import derived
+import name_index
+import occupancy
+import room_stats
+from db import PropertyState, connect_db, current_property, get_backend, use_property
+
+
+# Every change to lab7_reservations made through queries.py (or aqueries.py) appends a row here in the same
+# transaction, numbered by a monotonic Version. Other processes follow the log with a Subscriber and patch
+# their in-memory state (availability and name indexes, occupancy matrix, room listing cache) change by
+# change instead of reloading it. Bulk loads write a single "reload" record instead of one per row.
+
+BOOK, CANCEL, RELOAD = "book", "cancel", "reload"
+
+POLL_INTERVAL = float(os.environ.get("CHANGELOG_POLL_INTERVAL", "1"))
+POLL_LIMIT = 1000  # changes fetched per query
+# A version missing below ones already seen belongs to a transaction still in flight (MySQL hands out
+# AUTO_INCREMENT values at insert, not commit) or to one that rolled back; it is looked for this long
+GAP_TIMEOUT = float(os.environ.get("CHANGELOG_GAP_TIMEOUT", "30"))
+RETENTION_DAYS = 7
+
+_TABLE = {
+    "mysql": """
+    CREATE TABLE IF NOT EXISTS lab7_reservation_changes (
+        Version BIGINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+        Op VARCHAR(8) NOT NULL,
+        CODE INT NULL,
+        Room CHAR(5) NULL,
+        CheckIn DATE NULL,
+        Checkout DATE NULL,
+        FirstName VARCHAR(15) NULL,
+        LastName VARCHAR(15) NULL,
+        ChangedAt DATETIME NOT NULL
+    )
+    """,
+    "sqlite": """
+    CREATE TABLE IF NOT EXISTS lab7_reservation_changes (
+        Version INTEGER PRIMARY KEY AUTOINCREMENT,
+        Op VARCHAR(8) NOT NULL,
+        CODE INT NULL,
+        Room CHAR(5) NULL,
+        CheckIn DATE NULL,
+        Checkout DATE NULL,
+        FirstName VARCHAR(15) NULL,
+        LastName VARCHAR(15) NULL,
+        ChangedAt DATETIME NOT NULL
+    )
+    """,
+}
+
+INSERT_CHANGE = """
+INSERT INTO lab7_reservation_changes (Op, CODE, Room, CheckIn, Checkout, FirstName, LastName, ChangedAt)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+_COLUMNS = "Version, Op, CODE, Room, CheckIn, Checkout, FirstName, LastName"
+CHANGES_SINCE = f"SELECT {_COLUMNS} FROM lab7_reservation_changes WHERE Version > %s ORDER BY Version LIMIT %s"
+CURRENT_VERSION = "SELECT IFNULL(MAX(Version), 0), IFNULL(MIN(Version), 0) FROM lab7_reservation_changes"
+
+Change = namedtuple("Change", ["version", "op", "code", "room", "check_in", "check_out", "first_name", "last_name"])
+
+_state = PropertyState(ready=False, follower=None)  # each property has its own log
+
+
+# Creates the log table (also migration 3 in migrations.py)
+def create_table(cursor, dialect=None):
+    cursor.execute(_TABLE[dialect or get_backend().name])
+
+
+# Creates the table once per process; DDL commits, so call it before a booking transaction starts
+def ensure_ready(conn):
+    if _state.ready:
+        return
+    create_table(conn.cursor())
+    conn.commit()
+    _state.ready = True
+
+
+# Log rows for booked (sign=1) or cancelled (sign=-1) stays, in derived.py's stay tuple shape
+def change_rows(stays, sign=1):
+    now = datetime.datetime.now().replace(microsecond=0)
+    op = BOOK if sign > 0 else CANCEL
+    return [(op, code, room, check_in, check_out, first_name, last_name, now)
+            for code, room, check_in, check_out, _, first_name, last_name in stays]
+
+
+# Appends a "reload" record, for changes too big to log row by row (see importer.py)
+def record_reload(cursor):
+    cursor.execute(INSERT_CHANGE, (RELOAD, None, None, None, None, None, None,
+                                   datetime.datetime.now().replace(microsecond=0)))
+
+
+# (latest version, oldest retained version); (0, 0) for an empty log
+def versions():
+    conn = connect_db(primary=True)
+    if not conn:
+        return None
+    try:
+        ensure_ready(conn)
+        cursor = conn.cursor()
+        cursor.execute(CURRENT_VERSION)
+        latest, oldest = cursor.fetchone()
+        return int(latest), int(oldest)
+    finally:
+        conn.close()
+
+
+# Drops changes older than `days`; subscribers that fall behind the oldest kept version reload instead
+def prune(days=RETENTION_DAYS):
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        ensure_ready(conn)
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM lab7_reservation_changes WHERE ChangedAt < %s",
+                       (datetime.datetime.now().replace(microsecond=0) - datetime.timedelta(days=days),))
+        deleted = cursor.rowcount
+        conn.commit()
+        return deleted
+    finally:
+        conn.close()
+
+
+class Subscriber:
+    """Follows the current property's change log from a version onwards.
+
+    Create it before loading whatever state it keeps current: changes made in between are then replayed,
+    and replaying a change that is already reflected is harmless.
+    """
+
+    def __init__(self, since=None):
+        self.property = current_property()
+        if since is None:
+            current = versions()
+            since = current[0] if current else 0
+        self.version = since  # highest version seen
+        self._gaps = {}  # missing version -> time.monotonic() it was first missed
+
+    def _fetch(self, cursor, limit):
+        cursor.execute(CHANGES_SINCE, (self.version, limit))
+        rows = cursor.fetchall()
+        if self._gaps:
+            gaps = sorted(self._gaps)
+            cursor.execute(f"SELECT {_COLUMNS} FROM lab7_reservation_changes WHERE Version IN ({', '.join(['%s'] * len(gaps))})",
+                           gaps)
+            rows = cursor.fetchall() + rows
+        return [Change(*row) for row in rows]
+
+    def poll(self, limit=POLL_LIMIT):
+        """New changes since the last poll, oldest first, or None when the database can't be reached.
+
+        Returns a single RELOAD change when the log no longer reaches back to this subscriber's version.
+        """
+        with use_property(self.property):
+            return self._poll(limit)
+
+    def _poll(self, limit):
+        conn = connect_db(primary=True)  # a lagging replica would hide changes behind later ones
+        if not conn:
+            return None
+        try:
+            ensure_ready(conn)
+            cursor = conn.cursor()
+            if self.version:
+                cursor.execute(CURRENT_VERSION)
+                latest, oldest = cursor.fetchone()
+                if oldest and int(oldest) > self.version + 1:  # pruned past us
+                    self.version, self._gaps = int(latest), {}
+                    return [Change(int(latest), RELOAD, None, None, None, None, None, None)]
+            changes = self._fetch(cursor, limit)
+        finally:
+            conn.close()
+
+        now = time.monotonic()
+        for change in changes:
+            self._gaps.pop(change.version, None)
+            if change.version > self.version:
+                missing = range(self.version + 1, change.version)
+                self._gaps.update((version, now) for version in missing[-POLL_LIMIT:])
+                self.version = change.version
+        self._gaps = {version: since for version, since in self._gaps.items() if now - since < GAP_TIMEOUT}
+        return sorted(changes, key=lambda change: change.version)
+
+    def sync(self):
+        """Polls until caught up and applies every change to this process's state; returns the number applied."""
+        applied = 0
+        with use_property(self.property):
+            while True:
+                changes = self._poll(POLL_LIMIT)
+                if not changes:
+                    return applied
+                apply(changes)
+                applied += len(changes)
+                if len(changes) < POLL_LIMIT:
+                    return applied
+
+
+# Patches this process's in-memory state with changes, typically made by other processes
+def apply(changes):
+    for change in changes:
+        if change.op == RELOAD:
+            reload_state()
+            continue
+        stay = (change.code, change.room, change.check_in, change.check_out, None, change.first_name, change.last_name)
+        derived.after_commit([stay], sign=1 if change.op == BOOK else -1)
+
+
+# Reloads whatever in-memory state this process has built
+def reload_state():
+    if availability.is_loaded():
+        availability.reload_index()
+    if name_index.is_loaded():
+        name_index.reload_index()
+    if occupancy.is_loaded():
+        occupancy.reload_matrix()
+    room_stats.invalidate_cache()
+
+
+class Follower(threading.Thread):
+    """Background thread that syncs a Subscriber every `interval` seconds."""
+
+    def __init__(self, interval=POLL_INTERVAL, subscriber=None):
+        self.subscriber = subscriber or Subscriber()
+        super().__init__(name=f"changelog-follower-{self.subscriber.property}", daemon=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.subscriber.sync()
+            except Exception as e:  # keep following through a bad poll
+                print(f"Change log poll failed: {e}")
+
+    def stop(self):
+        self._stopped.set()
+
+
+# Starts following the current property's log (once per property); returns the Follower
+def follow(interval=POLL_INTERVAL):
+    if _state.follower is None:
+        _state.follower = Follower(interval)
+        _state.follower.start()
+    return _state.follower
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or prune the reservation change log")
+    parser.add_argument("command", choices=["status", "tail", "prune"])
+    parser.add_argument("--since", type=int, default=0, help="tail: print changes after this version")
+    parser.add_argument("--days", type=int, default=RETENTION_DAYS, help="prune: keep this many days")
+    args = parser.parse_args()
+
+    if args.command == "status":
+        current = versions()
+        if current is not None:
+            print(f"Latest version {current[0]}, oldest kept {current[1]}")
+    elif args.command == "tail":
+        for change in Subscriber(since=args.since).poll() or []:
+            print(f"{change.version:>8} {change.op:<6} {change.code or '':>6} {change.room or '':<5} "
+                  f"{change.check_in or ''} {change.check_out or ''}")
+    else:
+        deleted = prune(args.days)
+        if deleted is not None:
+            print(f"Pruned {deleted} changes older than {args.days} days.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import os
+import threading
+
+from db import PropertyState, connect_db, get_backend
+
+
+SEQUENCE_NAME = "reservation"
+CODE_ALLOCATOR = os.environ.get("CODE_ALLOCATOR", "hilo").lower()  # hilo, sequence or max
+CODE_BLOCK_SIZE = int(os.environ.get("CODE_BLOCK_SIZE", "20"))
+
+
+class CodeAllocator:
+    """Hands out new numeric reservation codes."""
+
+    def next_codes(self, count=1):
+        raise NotImplementedError
+
+    def next_code(self):
+        return self.next_codes(1)[0]
+
+
+class MaxScanAllocator(CodeAllocator):
+    """Original MAX(CODE) + 1 scheme. Scans the whole table and is not safe across concurrent writers."""
+
+    def next_codes(self, count=1):
+        conn = connect_db()
+        if not conn:
+            raise RuntimeError("Could not allocate reservation codes: no database connection")
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(CAST(CODE AS UNSIGNED)) FROM lab7_reservations")
+            max_code = cursor.fetchone()[0] or 0
+        finally:
+            conn.close()
+        return list(range(max_code + 1, max_code + 1 + count))
+
+
+class SequenceAllocator(CodeAllocator):
+    """Single-row sequence table bumped atomically with LAST_INSERT_ID(), one round trip per call."""
+
+    def __init__(self, name=SEQUENCE_NAME):
+        self.name = name
+        self._ready = False
+
+    def next_codes(self, count=1):
+        conn = connect_db()
+        if not conn:
+            raise RuntimeError("Could not allocate reservation codes: no database connection")
+        try:
+            cursor = conn.cursor()
+            if not self._ready:
+                ensure_sequence(cursor, self.name)
+                self._ready = True
+            # The row lock is held only for this tiny autocommitted transaction, never for a whole booking
+            if get_backend().name == "sqlite":
+                cursor.execute("UPDATE lab7_code_sequence SET next_value = next_value + %s WHERE name = %s RETURNING next_value",
+                               (count, self.name))
+            else:
+                cursor.execute(
+                    "UPDATE lab7_code_sequence SET next_value = LAST_INSERT_ID(next_value + %s) WHERE name = %s",
+                    (count, self.name)
+                )
+                cursor.execute("SELECT LAST_INSERT_ID()")
+            last = cursor.fetchone()[0]
+            conn.commit()
+        finally:
+            conn.close()
+        return list(range(last - count + 1, last + 1))
+
+
+class HiLoAllocator(CodeAllocator):
+    """Reserves blocks of codes from the sequence table and serves them from memory."""
+
+    def __init__(self, block_size=CODE_BLOCK_SIZE, sequence=None):
+        self.block_size = max(1, block_size)
+        self.sequence = sequence or SequenceAllocator()
+        self._next = 0
+        self._limit = 0  # first code past the current block
+        self._lock = threading.Lock()
+
+    def next_codes(self, count=1):
+        with self._lock:
+            codes = []
+            while len(codes) < count:
+                if self._next >= self._limit:
+                    # Big requests (batch bookings) reserve what they need in one go
+                    block = self.sequence.next_codes(max(self.block_size, count - len(codes)))
+                    self._next, self._limit = block[0], block[-1] + 1
+                take = min(count - len(codes), self._limit - self._next)
+                codes.extend(range(self._next, self._next + take))
+                self._next += take
+            return codes
+
+
+# Creates the sequence table and seeds it from the highest existing code (a one-off scan)
+def ensure_sequence(cursor, name=SEQUENCE_NAME):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS lab7_code_sequence (
+        name VARCHAR(32) PRIMARY KEY,
+        next_value BIGINT UNSIGNED NOT NULL
+    )
+    """)
+    cursor.execute("""
+    INSERT IGNORE INTO lab7_code_sequence (name, next_value)
+    SELECT %s, IFNULL(MAX(CAST(CODE AS UNSIGNED)), 0) FROM lab7_reservations
+    """, (name,))
+
+
+# Moves the sequence past `value`, e.g. after reservations were loaded with their own codes (see importer.py)
+def advance_sequence(value, name=SEQUENCE_NAME):
+    conn = connect_db()
+    if not conn:
+        return False
+    try:
+        cursor = conn.cursor()
+        ensure_sequence(cursor, name)
+        cursor.execute("UPDATE lab7_code_sequence SET next_value = GREATEST(next_value, %s) WHERE name = %s", (value, name))
+        conn.commit()
+    finally:
+        conn.close()
+    return True
+
+
+_ALLOCATORS = {
+    "hilo": HiLoAllocator,
+    "sequence": SequenceAllocator,
+    "max": MaxScanAllocator,
+}
+
+_state = PropertyState(allocator=None)  # one allocator per property: each has its own sequence
+_allocator_lock = threading.Lock()
+
+
+# Returns the current property's allocator, chosen by CODE_ALLOCATOR
+def get_allocator():
+    if _state.allocator is None:
+        with _allocator_lock:
+            if _state.allocator is None:
+                if CODE_ALLOCATOR not in _ALLOCATORS:
+                    raise ValueError(f"Unknown CODE_ALLOCATOR {CODE_ALLOCATOR!r}; expected one of {', '.join(_ALLOCATORS)}")
+                _state.allocator = _ALLOCATORS[CODE_ALLOCATOR]()
+    return _state.allocator
+
+
+# Swaps in a different allocator for the current property, e.g. a custom CodeAllocator subclass
+def set_allocator(allocator):
+    _state.allocator = allocator
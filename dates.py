@@ -0,0 +1,13 @@
+import datetime
+
+
+# Normalizes a DATE column value or a "YYYY-MM-DD" string into a datetime.date
+def to_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    text = str(value).strip()
+    if len(text) == 10 and text[4] == "-" and text[7] == "-":
+        return datetime.date.fromisoformat(text)  # the common case, far cheaper than strptime
+    return datetime.datetime.strptime(text, "%Y-%m-%d").date()
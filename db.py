@@ -1,18 +1,688 @@
-import mysql.connector
+import collections
+import contextlib
+import contextvars
+import functools
+import json
 import os
+import sqlite3
+import threading
+import time
 
-# Function to connect to the database
-def connect_db():
-    try:
-        #print("Attempting to connect to the database...")
-        conn = mysql.connector.connect(
-            host=os.environ["DB_HOST"],
+try:
+    import mysql.connector
+except ImportError:  # only the mysql backend needs it
+    mysql = None
+
+import metrics
+import sql
+import sqlite_backend
+
+
+# Pool sizing and housekeeping, all overridable from the environment
+POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "10"))  # seconds a caller waits for a free connection
+POOL_IDLE_TIMEOUT = float(os.environ.get("DB_POOL_IDLE_TIMEOUT", "300"))  # idle connections above min size are evicted after this
+POOL_RECONNECT_ATTEMPTS = int(os.environ.get("DB_POOL_RECONNECT_ATTEMPTS", "3"))
+POOL_PING_AFTER = float(os.environ.get("DB_POOL_PING_AFTER", "30"))  # connections idle longer than this are health-checked on checkout
+PREPARED_CACHE_SIZE = int(os.environ.get("DB_PREPARED_CACHE_SIZE", "32"))  # prepared statements kept per connection; 0 turns them off
+
+ER_UNKNOWN_STMT_HANDLER = 1243  # MySQL no longer has a statement this connection prepared
+
+# Storage backend: "mysql" (DB_HOST, DB_USER, DB_PASS, DB_NAME) or "sqlite" (DB_PATH, a file or ":memory:")
+DB_BACKEND = os.environ.get("DB_BACKEND", "mysql").lower()
+DB_PATH = os.environ.get("DB_PATH", "hotel.db")
+
+# Read replicas, comma-separated: "host" or "host:port" for MySQL (same user, password and database as the
+# primary), file paths for SQLite. Reads tagged with @reads go to them; everything else stays on the primary
+DB_REPLICAS = [endpoint.strip() for endpoint in os.environ.get("DB_REPLICAS", "").split(",") if endpoint.strip()]
+DB_READ_YOUR_WRITES = float(os.environ.get("DB_READ_YOUR_WRITES", "0"))  # seconds reads stay on the primary after a write
+DB_REPLICA_RETRY = float(os.environ.get("DB_REPLICA_RETRY", "30"))  # seconds an unreachable replica is skipped
+
+# Properties (hotels), each in its own database. SHARD_MAP names a JSON file such as
+#   {"default": "downtown",
+#    "properties": {"downtown": {"endpoint": "db1:3306", "database": "hotel_downtown", "replicas": ["db1r"],
+#                                "location": [40.71, -74.01]},
+#                   "airport": {"endpoint": "db2", "database": "hotel_airport", "location": [40.64, -73.78]}}}
+# where endpoint is "host" or "host:port" for MySQL (database defaults to DB_NAME) and a file path for SQLite.
+# Without one there is a single property, DEFAULT_PROPERTY, on the settings above. connect_db() and the
+# in-process caches (see PropertyState) always act for the current property: DB_PROPERTY or the map's
+# default, switched for a block with use_property()
+SHARD_MAP = os.environ.get("SHARD_MAP", "")
+DEFAULT_PROPERTY = "default"
+
+
+class PoolError(Exception):
+    """No pooled connection became available in time."""
+
+
+class MySQLBackend:
+    """MySQL server through mysql.connector."""
+
+    name = "mysql"
+    max_connections = None
+    explain_prefix = "EXPLAIN "
+
+    # endpoint is "host" or "host:port"; None means DB_HOST. database None means DB_NAME
+    def __init__(self, endpoint=None, database=None):
+        if mysql is None:
+            raise RuntimeError("DB_BACKEND=mysql needs mysql-connector-python installed")
+        self.errors = (mysql.connector.Error,)
+        self.endpoint = endpoint
+        self.database = database
+
+    # Opens a brand-new connection to the database
+    def connect(self):
+        host, port = os.environ["DB_HOST"], None
+        if self.endpoint:
+            host, _, port = self.endpoint.partition(":")
+        options = {"port": int(port)} if port else {}
+        return mysql.connector.connect(
+            host=host,
             user=os.environ["DB_USER"],
             password=os.environ["DB_PASS"],
-            database=os.environ["DB_NAME"]
+            database=self.database or os.environ["DB_NAME"],
+            **options
         )
+
+
+class SQLiteBackend:
+    """Embedded SQLite database in a file, or in memory for tests and benchmarks."""
+
+    name = "sqlite"
+    errors = (sqlite3.Error,)
+    explain_prefix = "EXPLAIN QUERY PLAN "
+
+    def __init__(self, path=None):
+        path = path or DB_PATH
+        self.path = path
+        self.endpoint = path
+        # An in-memory database lives and dies with its one connection, so the pool must never open a second
+        self.max_connections = 1 if path == ":memory:" else None
+
+    def connect(self):
+        return sqlite_backend.SQLiteConnection(self.path)
+
+
+_BACKENDS = {
+    "mysql": MySQLBackend,
+    "sqlite": SQLiteBackend,
+}
+
+_backend = None
+
+
+# Returns the configured storage backend
+def get_backend():
+    global _backend
+    if _backend is None:
+        if DB_BACKEND not in _BACKENDS:
+            raise ValueError(f"Unknown DB_BACKEND {DB_BACKEND!r}; expected one of {', '.join(_BACKENDS)}")
+        _backend = _BACKENDS[DB_BACKEND]()
+    return _backend
+
+
+# A backend of the configured kind for another database: a MySQL server (and database) or a SQLite file
+def make_backend(endpoint, database=None):
+    if get_backend().name == "sqlite":
+        return SQLiteBackend(endpoint)
+    return MySQLBackend(endpoint, database)
+
+
+class PooledConnection:
+    """Connection checked out of the pool; close() hands it back instead of disconnecting."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def cursor(self, *args, **kwargs):
+        # Buffered by default so a half-read result never poisons the next borrower
+        kwargs.setdefault("buffered", True)
+        cursor = self._raw.cursor(*args, **kwargs)
+        if metrics.enabled():
+            return metrics.InstrumentedCursor(cursor, self._raw, self._pool.explain_prefix, kwargs["buffered"])
+        return cursor
+
+    # Runs sql.STATEMENTS[name] and returns all its rows. The statement is prepared once per connection and the
+    # handle kept in the pool's StatementCache, so repeat calls skip the server's parse
+    def fetch_prepared(self, name, params=(), dictionary=False):
+        query = sql.STATEMENTS[name]
+        cache = self._pool.statement_cache(self._raw)
+        if cache is None:
+            cursor = self.cursor(dictionary=dictionary)
+            cursor.execute(query, params)
+            return cursor.fetchall()
+        for attempt in range(2):
+            cursor = cache.cursor(name, dictionary)
+            if metrics.enabled():
+                cursor = metrics.InstrumentedCursor(cursor, self._raw, self._pool.explain_prefix, buffered=False)
+            try:
+                cursor.execute(query, params)
+                return cursor.fetchall()
+            except self._pool.errors as e:
+                if attempt or getattr(e, "errno", None) != ER_UNKNOWN_STMT_HANDLER:
+                    raise
+                cache.discard(name, dictionary)  # the server dropped it: prepare it again
+
+    def close(self):
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool.release(raw)
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise PoolError("Connection has been returned to the pool")
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class StatementCache:
+    """Prepared cursors for one connection by statement name, least recently used closed first.
+
+    A prepared cursor holds one server-side statement handle and re-executes it while it is given the same
+    query text. SQLite connections hand back plain cursors, since sqlite3 already keeps each connection's
+    compiled statements.
+    """
+
+    def __init__(self, raw, size, count):
+        self._raw = raw
+        self.size = size
+        self._count = count  # the pool's stats counter
+        self._cursors = collections.OrderedDict()  # (name, dictionary) -> cursor
+
+    def cursor(self, name, dictionary=False):
+        key = (name, dictionary)
+        cursor = self._cursors.get(key)
+        if cursor is not None:
+            self._cursors.move_to_end(key)
+            self._count("prepared_hits")
+            return cursor
+        self._count("prepared_misses")
+        cursor = self._cursors[key] = self._raw.cursor(prepared=True, dictionary=dictionary, buffered=False)
+        while len(self._cursors) > self.size:
+            _, evicted = self._cursors.popitem(last=False)
+            ConnectionPool._close_quietly(evicted)  # deallocates its statement on the server
+            self._count("prepared_evictions")
+        return cursor
+
+    def discard(self, name, dictionary=False):
+        self._cursors.pop((name, dictionary), None)
+
+
+class ConnectionPool:
+    """Bounded pool of database connections with health checks and idle eviction."""
+
+    def __init__(self, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE, timeout=POOL_TIMEOUT,
+                 idle_timeout=POOL_IDLE_TIMEOUT, backend=None, prepared_cache_size=PREPARED_CACHE_SIZE,
+                 ping_after=POOL_PING_AFTER):
+        backend = backend or get_backend()
+        if backend.max_connections is not None:
+            max_size = min(max_size, backend.max_connections)
+            min_size = min(min_size, max_size)
+        if max_size < 1 or min_size < 0 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min={min_size}, max={max_size}")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self.prepared_cache_size = prepared_cache_size
+        self._connect = backend.connect
+        self.explain_prefix = backend.explain_prefix
+        self.errors = backend.errors
+        self._idle = []  # (raw connection, time it was returned), most recently used last
+        self._size = 0  # open connections, idle + in use
+        self._statements = {}  # raw connection -> StatementCache
+        self._cond = threading.Condition()
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "evicted": 0,
+            "reconnects": 0,
+            "failed_health_checks": 0,
+            "prepared_hits": 0,
+            "prepared_misses": 0,
+            "prepared_evictions": 0,
+            "prepared_resets": 0,
+        }
+        self._waiters = 0
+
+    # Checks a connection out of the pool, blocking up to `timeout` seconds when all are in use
+    def acquire(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        with self._cond:
+            self._evict_idle()
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolError(f"No connection available within {timeout:.1f}s (pool max {self.max_size})")
+                waited = True
+                self._waiters += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+            if self._idle:
+                raw, returned_at = self._idle.pop()
+            else:
+                raw, returned_at = None, None
+                self._size += 1  # reserve the slot before connecting outside the lock
+
+            wait_time = time.monotonic() - started
+            self._stats["checkouts"] += 1
+            if waited:
+                self._stats["waits"] += 1
+                self._stats["wait_time_total"] += wait_time
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], wait_time)
+
+        try:
+            raw = self._checkout(raw, returned_at)
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(self, raw)
+
+    # Returns a connection to the pool, dropping it if it is no longer usable
+    def release(self, raw):
+        try:
+            # End any open transaction so the next borrower doesn't read from a stale snapshot; a connection
+            # that isn't in one is handed back without a round trip
+            if raw.in_transaction:
+                raw.rollback()
+            healthy = True
+        except self.errors:
+            healthy = False
+
+        with self._cond:
+            if healthy and self._size <= self.max_size:
+                self._idle.append((raw, time.monotonic()))
+            else:
+                self._size -= 1
+                self._discard(raw)
+            self._cond.notify()
+
+    # Health check on checkout for connections idle longer than ping_after (a recently used one is trusted
+    # without the round trip); a dead connection is reconnected, or replaced by a new one
+    def _checkout(self, raw, returned_at=None):
+        if raw is None:
+            return self._new_connection()
+        if time.monotonic() - returned_at < self.ping_after or raw.is_connected():
+            return raw
+
+        self._count("failed_health_checks")
+        try:
+            raw.reconnect(attempts=POOL_RECONNECT_ATTEMPTS, delay=0)
+            self._count("reconnects")
+            # Prepared statements died with the old session; they are prepared again on next use
+            if self._statements.pop(raw, None) is not None:
+                self._count("prepared_resets")
+            return raw
+        except self.errors:
+            self._discard(raw)
+            return self._new_connection()
+
+    def _new_connection(self):
+        last_error = None
+        for _ in range(max(1, POOL_RECONNECT_ATTEMPTS)):
+            try:
+                raw = self._connect()
+                self._count("created")
+                return raw
+            except self.errors as e:
+                last_error = e
+        raise last_error
+
+    def _count(self, key):
+        with self._cond:
+            self._stats[key] += 1
+
+    # Closes idle connections that have sat unused past idle_timeout, keeping min_size around
+    def _evict_idle(self):
+        now = time.monotonic()
+        while self._idle and self._size > self.min_size:
+            raw, returned_at = self._idle[0]
+            if now - returned_at < self.idle_timeout:
+                break
+            self._idle.pop(0)
+            self._size -= 1
+            self._stats["evicted"] += 1
+            self._discard(raw)
+
+    # The connection's StatementCache, created on first use; None when prepared statements are turned off
+    def statement_cache(self, raw):
+        if self.prepared_cache_size <= 0:
+            return None
+        cache = self._statements.get(raw)
+        if cache is None:
+            cache = self._statements[raw] = StatementCache(raw, self.prepared_cache_size, self._count)
+        return cache
+
+    # Closes a connection the pool is done with, forgetting its prepared statements
+    def _discard(self, raw):
+        self._statements.pop(raw, None)
+        self._close_quietly(raw)
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    # Closes every idle connection; connections still checked out are closed as they come back
+    def close_all(self):
+        with self._cond:
+            while self._idle:
+                raw, _ = self._idle.pop()
+                self._size -= 1
+                self._discard(raw)
+            self.max_size = 0
+            self._cond.notify_all()
+
+    # Snapshot of pool usage, for sizing min/max
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": self._size - len(self._idle),
+                "waiters": self._waiters,
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+            })
+        stats["wait_time_avg"] = stats["wait_time_total"] / stats["waits"] if stats["waits"] else 0.0
+        prepared = stats["prepared_hits"] + stats["prepared_misses"]
+        stats["prepared_hit_rate"] = stats["prepared_hits"] / prepared if prepared else 0.0
+        return stats
+
+
+_shards = None  # ({property: settings}, default property)
+_shards_lock = threading.Lock()
+_property = contextvars.ContextVar("db_property", default=None)
+
+
+def _load_shards():
+    global _shards
+    if _shards is None:
+        with _shards_lock:
+            if _shards is None:
+                if SHARD_MAP:
+                    with open(SHARD_MAP) as f:
+                        config = json.load(f)
+                    shards = config.get("properties") or {}
+                    if not shards:
+                        raise ValueError(f"SHARD_MAP {SHARD_MAP} lists no properties")
+                    default = config.get("default") or next(iter(shards))
+                else:
+                    shards, default = {DEFAULT_PROPERTY: {}}, DEFAULT_PROPERTY
+                default = os.environ.get("DB_PROPERTY") or default
+                if default not in shards:
+                    raise ValueError(f"Unknown default property {default!r}; expected one of {', '.join(shards)}")
+                _shards = (shards, default)
+    return _shards
+
+
+# Every property in the shard map, in map order
+def properties():
+    return list(_load_shards()[0])
+
+
+# A property's shard map entry: endpoint, database, replicas, location
+def property_settings(key):
+    return _load_shards()[0][key]
+
+
+def current_property():
+    return _property.get() or _load_shards()[1]
+
+
+# Runs a block against another property's database and in-process state
+@contextlib.contextmanager
+def use_property(key):
+    if key not in _load_shards()[0]:
+        raise ValueError(f"Unknown property {key!r}; expected one of {', '.join(properties())}")
+    token = _property.set(key)
+    try:
+        yield
+    finally:
+        _property.reset(token)
+
+
+class PropertyState:
+    """Module-level state kept once per property, read and written as attributes.
+
+    Each default is the initial value, or a callable (such as a class) that makes one, for every property
+    on first use.
+    """
+
+    def __init__(self, **defaults):
+        object.__setattr__(self, "_defaults", defaults)
+        object.__setattr__(self, "_values", {})  # property -> {name: value}
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def _current(self):
+        key = current_property()
+        values = self._values.get(key)
+        if values is None:
+            with self._lock:
+                values = self._values.get(key)
+                if values is None:
+                    values = {name: default() if callable(default) else default
+                              for name, default in self._defaults.items()}
+                    self._values[key] = values
+        return values
+
+    def __getattr__(self, name):
+        try:
+            return self._current()[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name, value):
+        if name not in self._defaults:
+            raise AttributeError(name)
+        self._current()[name] = value
+
+
+# Returns the current property's primary pool, creating it on first use
+def get_pool():
+    return get_router().primary
+
+
+# Pool statistics: in-use, idle, waiters, wait times
+def pool_stats():
+    return get_pool().stats()
+
+
+# Read/write routing. queries.py tags each operation @reads or @writes; connect_db() sends a read operation's
+# connections to a replica and everything else to the primary. A read nested inside a write stays on the
+# primary, as do reads within DB_READ_YOUR_WRITES seconds of a write in the same session (see session())
+READ, WRITE = "read", "write"
+
+_route = contextvars.ContextVar("db_route", default=None)
+_session = contextvars.ContextVar("db_session", default=None)  # None: the whole process is one session
+
+
+def _tagged(kind):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _route.get() == WRITE:
+                return func(*args, **kwargs)
+            token = _route.set(kind)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _route.reset(token)
+                if kind == WRITE:
+                    get_router().wrote(_session.get())
+        return wrapper
+    return decorator
+
+
+reads = _tagged(READ)
+writes = _tagged(WRITE)
+
+
+# Scopes read-your-writes to one client, e.g. a web session, instead of the whole process
+@contextlib.contextmanager
+def session(key):
+    token = _session.set(key)
+    try:
+        yield
+    finally:
+        _session.reset(token)
+
+
+class Router:
+    """Primary pool plus one pool per read replica; picks a pool for each connect_db() call."""
+
+    def __init__(self, primary, replicas=(), read_your_writes=DB_READ_YOUR_WRITES, retry_after=DB_REPLICA_RETRY):
+        self.primary = primary
+        self.replicas = list(replicas)  # (endpoint, pool)
+        self.read_your_writes = read_your_writes
+        self.retry_after = retry_after
+        self._down_until = {}  # endpoint -> time.monotonic() before which it isn't tried
+        self._last_write = {}  # session key -> time.monotonic() of its last write
+        self._next = 0
+        self._lock = threading.Lock()
+        self._stats = {"primary": 0, "replica": 0, "read_your_writes": 0, "fallbacks": 0}
+
+    def wrote(self, session_key):
+        if self.read_your_writes > 0:
+            with self._lock:
+                self._last_write[session_key] = time.monotonic()
+                if len(self._last_write) > 10000:  # forget sessions whose window has long passed
+                    cutoff = time.monotonic() - self.read_your_writes
+                    self._last_write = {key: at for key, at in self._last_write.items() if at >= cutoff}
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    # Replicas to try for a read, healthy ones in round-robin order; empty if the read must see the primary
+    def _read_candidates(self):
+        if not self.replicas:
+            return []
+        now = time.monotonic()
+        with self._lock:
+            last_write = self._last_write.get(_session.get())
+            if last_write is not None and now - last_write < self.read_your_writes:
+                self._stats["read_your_writes"] += 1
+                return []
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+            ordered = self.replicas[start:] + self.replicas[:start]
+            return [(endpoint, pool) for endpoint, pool in ordered if self._down_until.get(endpoint, 0) <= now]
+
+    def acquire(self, primary=False):
+        if not primary and _route.get() == READ:
+            for endpoint, pool in self._read_candidates():
+                try:
+                    conn = pool.acquire()
+                except (PoolError,) + pool.errors:
+                    with self._lock:
+                        self._down_until[endpoint] = time.monotonic() + self.retry_after
+                        self._stats["fallbacks"] += 1
+                    continue
+                self._count("replica")
+                return conn
+        self._count("primary")
+        return self.primary.acquire()
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self._stats)
+            down = {endpoint for endpoint, until in self._down_until.items() if until > now}
+        stats["replicas"] = [{"endpoint": endpoint, "available": endpoint not in down, **pool.stats()}
+                             for endpoint, pool in self.replicas]
+        return stats
+
+    def close_all(self):
+        self.primary.close_all()
+        for _, pool in self.replicas:
+            pool.close_all()
+
+
+_routers = {}  # property -> Router
+_router_lock = threading.Lock()
+
+
+# A property's replica endpoints: its "replicas" in the shard map, or DB_REPLICAS without one
+def _replica_endpoints(key):
+    return property_settings(key).get("replicas", []) if SHARD_MAP else DB_REPLICAS
+
+
+def _build_router(key):
+    settings = property_settings(key)
+    endpoint, database = settings.get("endpoint"), settings.get("database")
+    primary = ConnectionPool(backend=make_backend(endpoint, database) if endpoint else None)
+    replicas = [(replica, ConnectionPool(backend=make_backend(replica, database))) for replica in _replica_endpoints(key)]
+    return Router(primary, replicas)
+
+
+# Returns the current property's router over its primary pool and a pool per replica, creating it on first use
+def get_router():
+    key = current_property()
+    router = _routers.get(key)
+    if router is None:
+        with _router_lock:
+            router = _routers.get(key)
+            if router is None:
+                router = _routers[key] = _build_router(key)
+    return router
+
+
+# Closes every property's pools, e.g. at shutdown
+def close_all():
+    with _router_lock:
+        routers = list(_routers.values())
+    for router in routers:
+        router.close_all()
+
+
+# Whether the current property has read replicas to route to
+def has_replicas():
+    return bool(_replica_endpoints(current_property()))
+
+
+# Read routing statistics: connections handed out per target, read-your-writes hits, fallbacks, replica pools
+def routing_stats():
+    return get_router().stats()
+
+
+# Function to connect to the database. Inside a @reads operation this is a replica connection when one is
+# configured and reachable; primary=True always gets the primary, for reads that go on to write
+def connect_db(primary=False):
+    try:
+        #print("Attempting to connect to the database...")
+        if not metrics.enabled():
+            return get_router().acquire(primary)
+        started = time.perf_counter()
+        conn = get_router().acquire(primary)
+        metrics.record_connect(time.perf_counter() - started)
         #print("Connected to the database successfully!")
         return conn
-    except mysql.connector.Error as e:
+    except (PoolError,) + get_backend().errors as e:
         print(f"Database connection failed: {e}")
         return None
@@ -0,0 +1,56 @@
+import availability
+import changelog
+import name_index
+import occupancy
+import revenue
+import room_stats
+import sql
+
+
+# Derived tables and in-process indexes that follow every change to lab7_reservations.
+# A stay is a (code, room, check_in, check_out, rate, first_name, last_name) tuple.
+
+
+# Creates the derived tables if needed; DDL commits, so call it before a booking transaction starts
+def prepare(conn):
+    revenue.ensure_ready(conn)
+    room_stats.ensure_ready(conn)
+    changelog.ensure_ready(conn)
+
+
+# Statements that apply booked (sign=1) or cancelled (sign=-1) stays to the derived tables,
+# as (query, params, executemany) so both the blocking and the asyncio drivers can run them
+def statements(stays, sign=1):
+    rows = [month for stay in stays for month in revenue.stay_rows(stay[1], stay[2], stay[3], stay[4], sign)]
+    rooms = sorted({stay[1] for stay in stays})
+    result = []
+    if rows:
+        result.append((sql.REVENUE_UPSERT, rows, True))
+    if rooms:
+        result.append((sql.room_stats_refresh(len(rooms)), rooms, False))
+    if stays:
+        result.append((changelog.INSERT_CHANGE, changelog.change_rows(stays, sign), True))
+    return result
+
+
+# Applies stays to the derived tables inside the caller's transaction
+def update(cursor, stays, sign=1):
+    for query, params, many in statements(stays, sign):
+        if many:
+            cursor.executemany(query, params)
+        else:
+            cursor.execute(query, params)
+
+
+# Brings in-process indexes and caches in line once the transaction has committed
+def after_commit(stays, sign=1):
+    for code, room_code, check_in, check_out, _, first_name, last_name in stays:
+        if sign > 0:
+            availability.record_booking(code, room_code, check_in, check_out)
+            name_index.record_booking(code, first_name, last_name)
+            occupancy.record_booking(room_code, check_in, check_out)
+        else:
+            availability.record_cancellation(code)
+            name_index.record_cancellation(code)
+            occupancy.record_cancellation(room_code, check_in, check_out)
+    room_stats.invalidate_cache()
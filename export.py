@@ -0,0 +1,166 @@
+import argparse
+import csv
+import datetime
+import decimal
+import json
+import sys
+
+from db import connect_db
+from dates import to_date
+from revenue import split_by_month
+
+
+CHUNK_SIZE = 5000
+
+RESERVATION_FIELDS = ["CODE", "Room", "RoomName", "CheckIn", "Checkout", "Rate", "LastName", "FirstName", "Adults", "Kids"]
+REVENUE_FIELDS = ["Room", "Year", "Month", "Nights", "Revenue"]
+
+
+# Runs a query on an unbuffered cursor and yields rows chunk by chunk, so the result set never sits in memory.
+# Raises RuntimeError without a connection, so a failed export can't pass for an empty one
+def _stream_query(query, params, chunk_size=CHUNK_SIZE):
+    conn = connect_db()
+    if not conn:
+        raise RuntimeError("No database connection")
+    try:
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        conn.close()  # also discards any unread rows if the consumer stopped early
+
+
+def _range_filter(start, end, rooms, alias="res"):
+    conditions = [f"{alias}.CheckIn < %s", f"{alias}.Checkout > %s"]
+    params = [end, start]
+    if rooms:
+        conditions.append(f"{alias}.Room IN ({', '.join(['%s'] * len(rooms))})")
+        params.extend(rooms)
+    return " AND ".join(conditions), params
+
+
+# Every reservation overlapping [start, end), optionally limited to some rooms
+def stream_reservations(start, end, rooms=None, chunk_size=CHUNK_SIZE):
+    where, params = _range_filter(start, end, rooms)
+    query = f"""
+    SELECT res.CODE, res.Room, r.RoomName, res.CheckIn, res.Checkout, res.Rate,
+           res.LastName, res.FirstName, res.Adults, res.Kids
+    FROM lab7_reservations res
+    JOIN lab7_rooms r ON res.Room = r.RoomCode
+    WHERE {where}
+    ORDER BY res.CheckIn, res.CODE
+    """
+    return _stream_query(query, params, chunk_size)
+
+
+# Revenue per room and month for the nights that fall inside [start, end)
+def stream_revenue(start, end, rooms=None, chunk_size=CHUNK_SIZE):
+    start, end = to_date(start), to_date(end)
+    where, params = _range_filter(start, end, rooms)
+    query = f"""
+    SELECT res.Room, res.CheckIn, res.Checkout, res.Rate
+    FROM lab7_reservations res
+    WHERE {where}
+    ORDER BY res.Room
+    """
+
+    # Rows arrive grouped by room, so only the current room's months are ever held
+    current_room = None
+    months = {}
+    for row in _stream_query(query, params, chunk_size):
+        if row["Room"] != current_room:
+            yield from _revenue_rows(current_room, months)
+            current_room, months = row["Room"], {}
+        check_in = max(to_date(row["CheckIn"]), start)
+        check_out = min(to_date(row["Checkout"]), end)
+        for year, month, nights in split_by_month(check_in, check_out):
+            total = months.setdefault((year, month), [0, decimal.Decimal(0)])
+            total[0] += nights
+            total[1] += nights * decimal.Decimal(str(row["Rate"]))
+    yield from _revenue_rows(current_room, months)
+
+
+def _revenue_rows(room, months):
+    for (year, month), (nights, revenue) in sorted(months.items()):
+        yield {"Room": room, "Year": year, "Month": month, "Nights": nights, "Revenue": revenue}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return str(value)
+
+
+# Writes rows as CSV, flushing every chunk_size rows
+def write_csv(rows, out, fields, chunk_size=CHUNK_SIZE):
+    writer = csv.DictWriter(out, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    count = 0
+    for row in rows:
+        writer.writerow(row)
+        count += 1
+        if count % chunk_size == 0:
+            out.flush()
+    out.flush()
+    return count
+
+
+# Writes rows as JSON Lines, one object per line, in chunks of chunk_size
+def write_jsonl(rows, out, chunk_size=CHUNK_SIZE):
+    buffer = []
+    count = 0
+    for row in rows:
+        buffer.append(json.dumps(row, default=_json_default))
+        count += 1
+        if len(buffer) >= chunk_size:
+            out.write("\n".join(buffer) + "\n")
+            out.flush()
+            buffer = []
+    if buffer:
+        out.write("\n".join(buffer) + "\n")
+    out.flush()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream reservations or revenue for a date range to CSV or JSON Lines")
+    parser.add_argument("kind", choices=["reservations", "revenue"])
+    parser.add_argument("--start", required=True, help="first date, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="end date (exclusive), YYYY-MM-DD")
+    parser.add_argument("--room", action="append", dest="rooms", help="limit to a room code; repeat for several rooms")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--output", help="file to write (default: stdout)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    start, end = to_date(args.start), to_date(args.end)
+    if start >= end:
+        parser.error("--start must be before --end")
+
+    if args.kind == "reservations":
+        rows, fields = stream_reservations(start, end, args.rooms, args.chunk_size), RESERVATION_FIELDS
+    else:
+        rows, fields = stream_revenue(start, end, args.rooms, args.chunk_size), REVENUE_FIELDS
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        if args.format == "csv":
+            count = write_csv(rows, out, fields, args.chunk_size)
+        else:
+            count = write_jsonl(rows, out, args.chunk_size)
+    except RuntimeError as e:
+        sys.exit(f"Export failed: {e}")
+    finally:
+        if args.output:
+            out.close()
+    print(f"Exported {count} {args.kind} rows.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
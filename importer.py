@@ -0,0 +1,289 @@
+import argparse
+import csv
+import decimal
+import itertools
+import json
+import sys
+import time
+from collections import Counter, defaultdict
+
+import availability
+import catalog
+import changelog
+import codes
+import derived
+import revenue
+import room_stats
+import sql
+from db import connect_db
+from dates import to_date
+
+
+# Bulk load of reservation history, e.g. from a property's previous system. Rows stream in from CSV or JSON
+# Lines (the export.py reservation format; RoomName is ignored and CODE is optional), are validated in memory
+# against room capacity and every existing or already-accepted stay, and go in as multi-row INSERTs with a
+# commit every COMMIT_SIZE rows. Rejected rows are counted by reason and can be written out with the reason.
+
+BATCH_SIZE = 1000  # rows per INSERT statement
+COMMIT_SIZE = 20000  # rows per transaction
+
+FIELDS = ["CODE", "Room", "CheckIn", "Checkout", "Rate", "LastName", "FirstName", "Adults", "Kids"]
+REQUIRED_FIELDS = ["Room", "CheckIn", "Checkout", "Rate", "LastName", "FirstName", "Adults", "Kids"]
+NAME_LENGTH = 15  # LastName / FirstName are VARCHAR(15)
+REJECT_FIELDS = ["Line", "Reason", "Detail"] + FIELDS
+
+
+class Rejected(Exception):
+    """A row that can't be imported; reason is a short key for the summary, detail says what was wrong."""
+
+    def __init__(self, reason, detail=""):
+        super().__init__(detail or reason)
+        self.reason = reason
+        self.detail = detail
+
+
+def read_csv(f):
+    reader = csv.DictReader(f)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_jsonl(f):
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record if isinstance(record, dict) else None
+
+
+def _count(record, field):
+    try:
+        value = int(record[field])
+    except (TypeError, ValueError):
+        raise Rejected("bad_number", f"{field} {record[field]!r} is not a whole number")
+    if value < 0:
+        raise Rejected("bad_number", f"{field} is negative")
+    return value
+
+
+def _name(record, field):
+    value = str(record[field]).strip()
+    if not value:
+        raise Rejected("missing_field", f"{field} is empty")
+    if len(value) > NAME_LENGTH:
+        raise Rejected("name_too_long", f"{field} is longer than {NAME_LENGTH} characters")
+    return value
+
+
+class Validator:
+    """Turns records into insert rows, checking them against the rooms and every stay seen so far.
+
+    index holds the stays already in the database and gains each accepted row, so overlaps within the file
+    are caught as well. Rows without a CODE get one from next_code.
+    """
+
+    def __init__(self, rooms, index, next_code):
+        self.rooms = rooms
+        self.index = index
+        self.next_code = next_code
+        self.max_code = 0
+
+    def _code(self, record):
+        value = record.get("CODE")
+        if value is None or str(value).strip() == "":
+            code = self.next_code()
+            while self.index.has_code(code):  # a code the file already used explicitly
+                code = self.next_code()
+            return code
+        try:
+            code = int(value)
+        except (TypeError, ValueError):
+            raise Rejected("bad_number", f"CODE {value!r} is not a whole number")
+        if self.index.has_code(code):
+            raise Rejected("duplicate_code", f"reservation {code} already exists")
+        return code
+
+    # The INSERT_RESERVATION row for a record, or Rejected
+    def check(self, record):
+        if record is None:
+            raise Rejected("bad_record", "not a JSON object")
+        missing = [field for field in REQUIRED_FIELDS if record.get(field) in (None, "")]
+        if missing:
+            raise Rejected("missing_field", f"no {', '.join(missing)}")
+
+        room = self.rooms.get(str(record["Room"]).strip())
+        if room is None:
+            raise Rejected("unknown_room", f"no room {record['Room']!r}")
+        try:
+            check_in, check_out = to_date(record["CheckIn"]), to_date(record["Checkout"])
+        except ValueError:
+            raise Rejected("bad_date", f"dates {record['CheckIn']!r} to {record['Checkout']!r} are not YYYY-MM-DD")
+        if check_in >= check_out:
+            raise Rejected("empty_stay", f"CheckIn {check_in} is not before Checkout {check_out}")
+        try:
+            rate = decimal.Decimal(str(record["Rate"]).strip())
+        except decimal.InvalidOperation:
+            raise Rejected("bad_number", f"Rate {record['Rate']!r} is not a number")
+        if not rate.is_finite() or rate < 0:
+            raise Rejected("bad_number", f"Rate {record['Rate']!r} is not a price")
+
+        adults, kids = _count(record, "Adults"), _count(record, "Kids")
+        if adults + kids == 0:
+            raise Rejected("no_guests", "Adults and Kids are both 0")
+        if adults + kids > room.maxOcc:
+            raise Rejected("over_capacity", f"{adults + kids} guests in {room.RoomCode}, which sleeps {room.maxOcc}")
+        last_name, first_name = _name(record, "LastName"), _name(record, "FirstName")
+
+        if not self.index.is_free(room.RoomCode, check_in, check_out):
+            raise Rejected("overlap", f"{room.RoomCode} is already booked between {check_in} and {check_out}")
+        code = self._code(record)
+
+        self.index.add(code, room.RoomCode, check_in, check_out)
+        self.max_code = max(self.max_code, code)
+        return (code, room.RoomCode, check_in, check_out, rate.quantize(decimal.Decimal("0.01")), last_name,
+                first_name, adults, kids)
+
+
+# Revenue upserts for a block of rows, summed per room and month first
+def _revenue_rows(rows):
+    totals = defaultdict(lambda: [0, 0.0])
+    for _, room, check_in, check_out, rate, *_ in rows:
+        for _, year, month, nights, revenue_amount in revenue.stay_rows(room, check_in, check_out, rate):
+            total = totals[(room, year, month)]
+            total[0] += nights
+            total[1] += revenue_amount
+    return [(room, year, month, nights, round(amount, 2)) for (room, year, month), (nights, amount) in totals.items()]
+
+
+# Inserts rows in one transaction, batch_size rows per statement, with the revenue aggregate in step.
+# Room stats are refreshed once when the import ends rather than for every transaction
+def _write(rows, batch_size):
+    conn = connect_db()
+    if not conn:
+        raise RuntimeError("Could not import reservations: no database connection")
+    stays = [(code, room, check_in, check_out, rate, first_name, last_name)
+             for code, room, check_in, check_out, rate, last_name, first_name, _, _ in rows]
+    try:
+        derived.prepare(conn)
+        cursor = conn.cursor()
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(sql.insert_reservations(len(batch)), [value for row in batch for value in row])
+        cursor.executemany(sql.REVENUE_UPSERT, _revenue_rows(rows))
+        changelog.record_reload(cursor)  # one record per transaction, not one per row
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    derived.after_commit(stays)
+
+
+def import_reservations(records, batch_size=BATCH_SIZE, commit_size=COMMIT_SIZE, dry_run=False, on_reject=None):
+    """Imports (line number, record) pairs, as read_csv()/read_jsonl() yield them.
+
+    on_reject(line number, record, Rejected) is called for every row left out. Rows are committed every
+    commit_size accepted rows, so a failure part-way keeps what was already committed. With dry_run nothing
+    is written and no codes are allocated. Returns {"read", "imported", "rejected", "reasons", "seconds"}.
+    """
+    started = time.perf_counter()
+    rooms = catalog.get_catalog()
+    index = availability.AvailabilityIndex()  # a private copy: it also gains rows that are never committed
+    if rooms is None or not index.load():
+        raise RuntimeError("Could not import reservations: no database connection")
+
+    if dry_run:
+        placeholder_codes = itertools.count(-1, -1)
+
+        def next_code():
+            return next(placeholder_codes)
+    else:
+        allocator = codes.get_allocator()
+        block = iter(())
+
+        def next_code():
+            nonlocal block
+            code = next(block, None)
+            if code is None:
+                block = iter(allocator.next_codes(batch_size))
+                code = next(block)
+            return code
+
+    validator = Validator(rooms, index, next_code)
+    reasons = Counter()
+    read = imported = 0
+    pending = []
+    for line_number, record in records:
+        read += 1
+        try:
+            pending.append(validator.check(record))
+        except Rejected as rejected:
+            reasons[rejected.reason] += 1
+            if on_reject:
+                on_reject(line_number, record, rejected)
+            continue
+        if len(pending) >= commit_size:
+            if not dry_run:
+                _write(pending, batch_size)
+            imported += len(pending)
+            pending = []
+    if pending and not dry_run:
+        _write(pending, batch_size)
+    imported += len(pending)
+
+    if imported and not dry_run:
+        codes.advance_sequence(validator.max_code)  # explicit codes from the file may run past the sequence
+        room_stats.refresh_all()
+    return {"read": read, "imported": imported, "rejected": sum(reasons.values()), "reasons": dict(reasons),
+            "seconds": time.perf_counter() - started}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-import reservations from CSV or JSON Lines")
+    parser.add_argument("input", help="file to read; '-' for stdin")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension, else csv")
+    parser.add_argument("--rejects", help="write rejected rows, with the reason, to this CSV file")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per INSERT statement")
+    parser.add_argument("--commit-size", type=int, default=COMMIT_SIZE, help="rows per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="validate only; write nothing")
+    args = parser.parse_args(argv)
+    if args.batch_size < 1 or args.commit_size < 1:
+        parser.error("--batch-size and --commit-size must be at least 1")
+
+    fmt = args.format or ("jsonl" if args.input.endswith((".jsonl", ".ndjson")) else "csv")
+    source = sys.stdin if args.input == "-" else open(args.input, newline="")
+    rejects_file = open(args.rejects, "w", newline="") if args.rejects else None
+    try:
+        if rejects_file:
+            writer = csv.DictWriter(rejects_file, fieldnames=REJECT_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+
+        def _write_reject(line_number, record, rejected):
+            writer.writerow({**(record or {}), "Line": line_number, "Reason": rejected.reason,
+                             "Detail": rejected.detail})
+
+        on_reject = _write_reject if rejects_file else None
+
+        records = read_jsonl(source) if fmt == "jsonl" else read_csv(source)
+        summary = import_reservations(records, args.batch_size, args.commit_size, args.dry_run, on_reject)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if rejects_file:
+            rejects_file.close()
+
+    rate = summary["read"] / summary["seconds"] if summary["seconds"] else 0
+    verb = "Validated" if args.dry_run else "Imported"
+    print(f"{verb} {summary['imported']:,} of {summary['read']:,} rows in {summary['seconds']:.1f}s ({rate:,.0f} rows/s).")
+    for reason, count in sorted(summary["reasons"].items(), key=lambda item: -item[1]):
+        print(f"  rejected {count:,} {reason}")
+    sys.exit(1 if summary["rejected"] else 0)
+
+
+if __name__ == "__main__":
+    main()
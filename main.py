@@ -1,5 +1,5 @@
-import datetime
-from queries import generate_revenue_report, get_all_rooms, check_room_availability, get_room_details, make_reservation, cancel_reservation, search_reservations, check_reservation_exists, cancel_reservation, find_alternative_rooms, get_room_price
+from rates import quote_rooms, stay_cost
+from queries import generate_revenue_report, get_all_rooms, get_room_details, book_reservation, cancel_reservation, search_reservations_page, check_reservation_exists, find_alternative_rooms, get_room_price, find_matching_rooms, stay_dates
 
 # Lists all available rooms along with their details
 def display_menu():
@@ -40,6 +40,9 @@ def book_room():
     bed_type = input("Desired bed type (or 'Any' for no preference): ").strip()
     check_in = input("Enter check-in date (YYYY-MM-DD): ")
     check_out = input("Enter check-out date (YYYY-MM-DD): ")
+    if stay_dates(check_in, check_out) is None:
+        print("Check-out must be a valid date after check-in.")
+        return
     
     adults = input("Number of adults: ")
     while not adults.isdigit():
@@ -57,25 +60,19 @@ def book_room():
 
     # If the user chose "Any" for room preference, find an available room
     if room_code.lower() == "any":
-        available_rooms = get_all_rooms()
-        matching_rooms = []
-
-        for room in available_rooms:
-            if bed_type.lower() == "any" or room["bedType"].lower() == bed_type.lower():
-                if room["maxOcc"] >= total_guests:
-                    matching_rooms.append(room)
+        # Served from the in-memory room catalog: best fit for the party first, then cheapest
+        matching_rooms = find_matching_rooms(bed_type, total_guests)
 
         if len(matching_rooms) == 0:
             print("No rooms available matching your preference.")
             return
 
         print("\nMatching Available Rooms:")
-        count = 0
-        for room in matching_rooms:
-            print(f"{count + 1}. {room['RoomCode']} - {room['RoomName']} | Beds: {room['Beds']} | Type: {room['bedType']} | Max Occupancy: {room['maxOcc']} | Price: ${room['basePrice']}")
-            count += 1
-            if count == 5:  # Show up to 5 options
-                break
+        shown = matching_rooms[:5]  # Show up to 5 options
+        totals = quote_rooms([room["RoomCode"] for room in shown], check_in, check_out)
+        for count, (room, total) in enumerate(zip(shown, totals)):
+            stay_total = f" | Stay Total: ${total:.2f}" if total is not None else ""
+            print(f"{count + 1}. {room['RoomCode']} - {room['RoomName']} | Beds: {room['Beds']} | Type: {room['bedType']} | Max Occupancy: {room['maxOcc']} | Price: ${room['basePrice']}{stay_total}")
 
         choice = input("Enter the option number to book (or press Enter to cancel): ").strip()
         if choice.isdigit():
@@ -89,40 +86,32 @@ def book_room():
             print("Booking cancelled.")
             return
 
-    # Check availability of selected room
-    if not check_room_availability(room_code, check_in, check_out):
-        print(f"Room {room_code} is not available for the selected dates.")
-
-        # Suggest alternative rooms
-        alternatives = find_alternative_rooms(check_in, check_out, total_guests, bed_type)
-
-        if len(alternatives) > 0:
-            print("\nSuggested Alternative Rooms:")
-
-            for alt in alternatives:
-                if 'RoomName' in alt: 
-                    next_available = alt.get('NextAvailableFrom', 'Available Now')
-                    print(f"{alt['RoomCode']} - {alt['RoomName']} | {alt['bedType']} | Max: {alt['maxOcc']} | ${alt['basePrice']} (Next Available: {next_available})")
-                else:  # Next available room (fetch full details)
-                    room_details = get_room_details(alt['Room'])  # Fetch room details
-                    if room_details:
-                        print(f"{room_details['RoomCode']} - {room_details['RoomName']} | {room_details['bedType']} | Max: {room_details['maxOcc']} | ${room_details['basePrice']} (Next Available: {alt['NextAvailableFrom']})")
-
-        return  # Stop function execution if room isn't available
-
     # Fetch room details and price
     room_details = get_room_details(room_code)
+    if not room_details:
+        print(f"Room {room_code} does not exist.")
+        return
     rate = get_room_price(room_code)
 
     # Calculate total cost
-    total_cost = calculate_total_cost(check_in, check_out, rate)
+    total_cost = quote_stay(room_code, check_in, check_out, rate)
 
-    # Make the reservation
-    success = make_reservation(room_code, check_in, check_out, first_name, last_name, adults, children, rate)
-    
-    if success:
+    # Check availability and make the reservation in a single transaction
+    result = book_reservation(room_code, check_in, check_out, first_name, last_name, adults, children, rate)
+
+    if result["status"] == "conflict":
+        print(f"Room {room_code} is not available for the selected dates.")
+        show_alternatives(check_in, check_out, total_guests, bed_type, room_code)
+        return  # Stop function execution if room isn't available
+
+    if result["status"] == "over_capacity":
+        print(f"Room {room_code} sleeps at most {room_details['maxOcc']} guests.")
+        return
+
+    if result["status"] == "booked":
         # Display confirmation screen
         print("\nReservation Confirmed!")
+        print(f"Reservation Code: {result['code']}")
         print(f"Guest Name: {first_name} {last_name}")
         print(f"Room: {room_details['RoomCode']} - {room_details['RoomName']}")
         print(f"Bed Type: {room_details['bedType']}")
@@ -135,22 +124,39 @@ def book_room():
         print("Reservation failed.")
 
 
-# Function to calculate total cost based on weekdays and weekends
+# Suggests alternative rooms when the requested one is taken
+def show_alternatives(check_in, check_out, total_guests, bed_type, room_code=None):
+    alternatives = find_alternative_rooms(check_in, check_out, total_guests, bed_type, room_code)
+
+    if len(alternatives) > 0:
+        print("\nSuggested Alternative Rooms:")
+
+        # Price every suggestion for the requested dates in one batch quote
+        totals = quote_rooms([alt.get('RoomCode', alt.get('Room')) for alt in alternatives], check_in, check_out)
+
+        for alt, total in zip(alternatives, totals):
+            stay_total = f" | Stay Total: ${total:.2f}" if total is not None else ""
+            if 'ShiftDays' in alt:  # Recommended stay, possibly on shifted dates
+                shift = "same dates" if alt['ShiftDays'] == 0 else f"{abs(alt['ShiftDays'])} day(s) {'later' if alt['ShiftDays'] > 0 else 'earlier'}"
+                print(f"{alt['RoomCode']} - {alt['RoomName']} | {alt['bedType']} | Max: {alt['maxOcc']} | {alt['CheckIn']} to {alt['Checkout']} ({shift}) | Stay Total: ${alt['StayTotal']:.2f}")
+            elif 'RoomCode' in alt: 
+                next_available = alt.get('NextAvailableFrom', 'Available Now')
+                print(f"{alt['RoomCode']} - {alt['RoomName']} | {alt['bedType']} | Max: {alt['maxOcc']} | ${alt['basePrice']}{stay_total} (Next Available: {next_available})")
+            else:  # Next available room (fetch full details)
+                room_details = get_room_details(alt['Room'])  # Fetch room details
+                if room_details:
+                    print(f"{room_details['RoomCode']} - {room_details['RoomName']} | {room_details['bedType']} | Max: {room_details['maxOcc']} | ${room_details['basePrice']}{stay_total} (Next Available: {alt['NextAvailableFrom']})")
+
+
+# Function to calculate total cost based on weekdays and weekends (110% for weekends)
 def calculate_total_cost(check_in, check_out, base_rate):
-    check_in_date = datetime.datetime.strptime(check_in, "%Y-%m-%d")
-    check_out_date = datetime.datetime.strptime(check_out, "%Y-%m-%d")
-    
-    total_cost = 0
-    current_date = check_in_date
+    return stay_cost(check_in, check_out, base_rate)
 
-    while current_date < check_out_date:
-        if current_date.weekday() in [5, 6]:  # Saturday (5) or Sunday (6)
-            total_cost += base_rate * 1.10  # 110% for weekends
-        else:
-            total_cost += base_rate  # Base rate for weekdays
-        current_date += datetime.timedelta(days=1)
 
-    return total_cost
+# Quotes a stay from the rate calendar, falling back to the flat weekday/weekend rate
+def quote_stay(room_code, check_in, check_out, base_rate):
+    total_cost = quote_rooms([room_code], check_in, check_out)[0]
+    return total_cost if total_cost is not None else calculate_total_cost(check_in, check_out, base_rate)
 
 
 
@@ -189,16 +195,23 @@ def search_bookings():
     end_date = input("End Date (YYYY-MM-DD): ").strip() or None
     room_code = input("Room Code: ").strip()
 
-    results = search_reservations(reservation_code, first_name, last_name, start_date, end_date, room_code)
+    results, after_code = search_reservations_page(reservation_code, first_name, last_name, start_date, end_date, room_code)
 
     if results:
         print("\nMatching Reservations:")
         print("-" * 100)
-        for res in results:
-            print(f"Reservation Code: {res['CODE']} | Guest: {res['FirstName']} {res['LastName']} | Room: {res['Room']} ({res['RoomName']})")
-            print(f"Check-in: {res['CheckIn']} | Check-out: {res['Checkout']} | Rate: ${res['Rate']}")
-            print(f"Guests: {res['Adults']} adults, {res['Kids']} children")
-            print("-" * 100)
+        while True:
+            for res in results:
+                print(f"Reservation Code: {res['CODE']} | Guest: {res['FirstName']} {res['LastName']} | Room: {res['Room']} ({res['RoomName']})")
+                print(f"Check-in: {res['CheckIn']} | Check-out: {res['Checkout']} | Rate: ${res['Rate']}")
+                print(f"Guests: {res['Adults']} adults, {res['Kids']} children")
+                print("-" * 100)
+
+            # Fetch the next page only if the clerk asks for it
+            if after_code is None or input("Show more results? (Y/N): ").strip().lower() != "y":
+                break
+            results, after_code = search_reservations_page(reservation_code, first_name, last_name, start_date, end_date, room_code,
+                                                           after_code=after_code)
     else:
         print("No reservations found.")
 
@@ -207,10 +220,15 @@ def search_bookings():
 
 # Generates and displays a revenue report for each room, grouped by month
 def show_revenue_report():
-    revenue_data = generate_revenue_report()
+    year = input("Year (leave blank for the current year): ").strip()
+    while year and not year.isdigit():
+        print("Invalid input. Please enter a valid year.")
+        year = input("Year (leave blank for the current year): ").strip()
+
+    revenue_data = generate_revenue_report(int(year) if year else None)
     if revenue_data:
         revenue_data.sort(key=lambda x: x["Total"], reverse=True)
-        print("\nRevenue Report (Per Room)")
+        print(f"\nRevenue Report (Per Room){' - ' + year if year else ''}")
         
         # Column Headers
         months = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
@@ -0,0 +1,328 @@
+import atexit
+import bisect
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import sql
+
+
+# Query instrumentation. When enabled, every cursor handed out by db.py is wrapped so each statement's
+# execute time, fetch time and row count land in latency histograms keyed by its sql.STATEMENTS name, and
+# connection checkouts are timed too. queries.py functions are tagged with @operation, so the same numbers are
+# also broken down per FR operation. When disabled, cursors are not wrapped at all and @operation is a
+# single flag check.
+
+SLOW_QUERY_MS = float(os.environ.get("QUERY_SLOW_MS", "200"))
+EXPLAIN_SLOW = os.environ.get("QUERY_EXPLAIN", "").lower() in ("1", "true", "yes")
+METRICS_DUMP = os.environ.get("QUERY_METRICS_DUMP")  # write a JSON snapshot here at exit
+SLOW_QUERY_KEEP = 100  # most recent slow queries kept for snapshot()
+PARAMS_MAX_CHARS = 500
+
+# Bucket upper bounds in milliseconds; anything slower lands in the overflow bucket
+BUCKETS_MS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+slow_log = logging.getLogger("hotel.slow_queries")
+
+_enabled = os.environ.get("QUERY_METRICS", "").lower() in ("1", "true", "yes")
+_operation = contextvars.ContextVar("operation", default=None)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram in milliseconds."""
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+
+    # Upper bound of the bucket holding the q-th quantile (the observed max for the overflow bucket)
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(BUCKETS_MS[i], self.max) if i < len(BUCKETS_MS) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "p99_ms": self.quantile(0.99),
+            "max_ms": self.max,
+            "buckets": {("+Inf" if i == len(BUCKETS_MS) else str(BUCKETS_MS[i])): count
+                        for i, count in enumerate(self.counts) if count},
+        }
+
+
+class _StatementStats:
+    __slots__ = ("execute", "fetch", "rows")
+
+    def __init__(self):
+        self.execute = Histogram()
+        self.fetch = Histogram()
+        self.rows = 0
+
+    def summary(self):
+        return {"calls": self.execute.count, "rows": self.rows,
+                "execute": self.execute.summary(), "fetch": self.fetch.summary()}
+
+
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.started = time.time()
+        self.connect = Histogram()
+        self.statements = {}  # statement name -> _StatementStats
+        self.operations = {}  # operation -> {"total": Histogram, "connect": Histogram, "statements": {...}}
+        self.slow = deque(maxlen=SLOW_QUERY_KEEP)
+
+    def _operation(self, name):
+        stats = self.operations.get(name)
+        if stats is None:
+            stats = self.operations[name] = {"total": Histogram(), "connect": Histogram(), "statements": {}}
+        return stats
+
+    def _statement_stats(self, statement):
+        targets = [self.statements.setdefault(statement, _StatementStats())]
+        operation = _operation.get()
+        if operation is not None:
+            targets.append(self._operation(operation)["statements"].setdefault(statement, _StatementStats()))
+        return targets
+
+    def record_statement(self, statement, execute_ms=None, fetch_ms=None, rows=0):
+        with self.lock:
+            for stats in self._statement_stats(statement):
+                if execute_ms is not None:
+                    stats.execute.add(execute_ms)
+                if fetch_ms is not None:
+                    stats.fetch.add(fetch_ms)
+                stats.rows += rows
+
+    def record_connect(self, ms):
+        operation = _operation.get()
+        with self.lock:
+            self.connect.add(ms)
+            if operation is not None:
+                self._operation(operation)["connect"].add(ms)
+
+    def record_operation(self, name, ms):
+        with self.lock:
+            self._operation(name)["total"].add(ms)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "enabled": _enabled,
+                "since": self.started,
+                "slow_query_ms": SLOW_QUERY_MS,
+                "connect": self.connect.summary(),
+                "statements": {name: stats.summary() for name, stats in sorted(self.statements.items())},
+                "operations": {
+                    name: {
+                        "total": stats["total"].summary(),
+                        "connect": stats["connect"].summary(),
+                        "statements": {statement: s.summary() for statement, s in sorted(stats["statements"].items())},
+                    }
+                    for name, stats in sorted(self.operations.items())
+                },
+                "slow_queries": list(self.slow),
+            }
+
+
+_registry = _Registry()
+
+
+def enabled():
+    return _enabled
+
+
+def enable(slow_query_ms=None, explain=None):
+    global _enabled, SLOW_QUERY_MS, EXPLAIN_SLOW
+    if slow_query_ms is not None:
+        SLOW_QUERY_MS = slow_query_ms
+    if explain is not None:
+        EXPLAIN_SLOW = explain
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    with _registry.lock:
+        _registry.reset()
+
+
+# Every histogram and the recent slow queries, as plain JSON-ready data
+def snapshot():
+    return _registry.snapshot()
+
+
+# Writes snapshot() as JSON to path, or returns it as a string when path is None
+def dump(path=None):
+    data = json.dumps(snapshot(), indent=2, default=str)
+    if path is None:
+        return data
+    with open(path, "w") as f:
+        f.write(data)
+    return path
+
+
+def record_connect(seconds):
+    _registry.record_connect(seconds * 1000)
+
+
+# Tags a queries.py function: its statements and connection waits are also broken down under its name
+def operation(func):
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled or _operation.get() is not None:  # nested calls count toward the outer operation
+            return func(*args, **kwargs)
+        token = _operation.set(name)
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _registry.record_operation(name, (time.perf_counter() - started) * 1000)
+            _operation.reset(token)
+    return wrapper
+
+
+def _format_params(params):
+    text = repr(params)
+    return text if len(text) <= PARAMS_MAX_CHARS else text[:PARAMS_MAX_CHARS] + "..."
+
+
+class InstrumentedCursor:
+    """Wraps a driver cursor, timing execute and fetch calls and counting rows."""
+
+    def __init__(self, cursor, conn, explain_prefix, buffered=True):
+        self._cursor = cursor
+        self._conn = conn
+        self._explain_prefix = explain_prefix
+        self._buffered = buffered
+        self._statement = None
+
+    def execute(self, query, params=()):
+        started = time.perf_counter()
+        result = self._cursor.execute(query, params)
+        elapsed = (time.perf_counter() - started) * 1000
+        self._statement = sql.statement_name(query)
+        # Writes report affected rows; reads count rows as they are fetched
+        rows = max(self._cursor.rowcount, 0) if self._cursor.description is None else 0
+        _registry.record_statement(self._statement, execute_ms=elapsed, rows=rows)
+        if elapsed >= SLOW_QUERY_MS:
+            self._log_slow(query, params, elapsed)
+        return result
+
+    def executemany(self, query, seq_params):
+        seq_params = list(seq_params)
+        started = time.perf_counter()
+        result = self._cursor.executemany(query, seq_params)
+        elapsed = (time.perf_counter() - started) * 1000
+        self._statement = sql.statement_name(query)
+        _registry.record_statement(self._statement, execute_ms=elapsed, rows=max(self._cursor.rowcount, 0))
+        if elapsed >= SLOW_QUERY_MS:
+            self._log_slow(query, f"{len(seq_params)} rows, first {_format_params(seq_params[:1])}", elapsed)
+        return result
+
+    def _fetched(self, started, rows):
+        elapsed = (time.perf_counter() - started) * 1000
+        _registry.record_statement(self._statement, fetch_ms=elapsed, rows=rows)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(started, row is not None)
+        return row
+
+    def fetchmany(self, size=1):
+        started = time.perf_counter()
+        rows = self._cursor.fetchmany(size)
+        self._fetched(started, len(rows))
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = self._cursor.fetchall()
+        self._fetched(started, len(rows))
+        return rows
+
+    def __iter__(self):
+        rows = 0
+        fetch_time = 0.0
+        iterator = iter(self._cursor)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    row = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    fetch_time += time.perf_counter() - started
+                rows += 1
+                yield row
+        finally:
+            _registry.record_statement(self._statement, fetch_ms=fetch_time * 1000, rows=rows)
+
+    def _log_slow(self, query, params, elapsed):
+        entry = {
+            "at": time.time(),
+            "statement": self._statement,
+            "operation": _operation.get(),
+            "ms": round(elapsed, 3),
+            "params": params if isinstance(params, str) else _format_params(params),
+            "query": " ".join(query.split()),
+        }
+        # EXPLAIN needs the connection to itself, which an unbuffered cursor with rows still pending doesn't allow
+        if EXPLAIN_SLOW and self._buffered and query.lstrip().upper().startswith("SELECT"):
+            entry["explain"] = self._explain(query, params)
+        with _registry.lock:
+            _registry.slow.append(entry)
+        slow_log.warning("slow query %s", json.dumps(entry, default=str))
+
+    def _explain(self, query, params):
+        try:
+            cursor = self._conn.cursor()
+            cursor.execute(self._explain_prefix + query, params)
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        except Exception as e:  # the plan is a nice-to-have; never fail the query over it
+            return f"EXPLAIN failed: {e}"
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+if METRICS_DUMP:
+    atexit.register(dump, METRICS_DUMP)
@@ -0,0 +1,299 @@
+import argparse
+import datetime
+import re
+import sys
+
+import changelog
+import db
+import sql
+
+
+# Schema management: numbered migrations applied in order and recorded in lab7_schema_migrations, plus a check
+# that EXPLAINs every statement in sql.STATEMENTS and flags full scans of lab7_reservations.
+#
+#   python migrations.py status    which migrations have been applied
+#   python migrations.py upgrade   apply the pending ones
+#   python migrations.py check     EXPLAIN each statement; exits 1 if one scans a large table unexpectedly
+
+MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS lab7_schema_migrations (
+    Version INT PRIMARY KEY,
+    Name VARCHAR(100) NOT NULL,
+    AppliedAt DATETIME NOT NULL
+)
+"""
+
+# (table, index name, columns, unique) for the access paths queries.py relies on
+INDEXES = [
+    # Availability, conflict checks, next-available and the per-room stats subqueries: Room = ? AND CheckIn < ?
+    ("lab7_reservations", "lab7_reservations_room", ("Room", "CheckIn", "Checkout"), False),
+    # Reservation codes are looked up, locked and deleted one at a time; tables loaded without a key get one
+    ("lab7_reservations", "lab7_reservations_code", ("CODE",), True),
+    # FR4 date-range search and the revenue rebuild's year filter
+    ("lab7_reservations", "lab7_reservations_dates", ("CheckIn", "Checkout"), False),
+    # Exact-name lookups; substring searches still scan (see EXPECTED_SCANS)
+    ("lab7_reservations", "lab7_reservations_name", ("LastName", "FirstName"), False),
+]
+
+# Tables big enough that a full scan is worth flagging; the rest hold one row per room
+LARGE_TABLES = {"lab7_reservations"}
+
+# Checked statements whose full scan is inherent, with the reason printed instead of a failure
+EXPECTED_SCANS = {
+    "search_page:name": "substring LIKE can't use an index; the in-memory name index (NAME_INDEX) avoids it",
+    "search_page:room": "substring LIKE on Room can't use an index",
+    # CheckIn < end AND Checkout > start bounds each column on one side only, so an index range still covers
+    # everything before `end`; walking CODE order for the LIMIT is no worse
+    "search_page:dates": "an open-ended overlap range; (CheckIn, Checkout) narrows it to stays starting before the end date",
+}
+
+
+def _dialect(dialect=None):
+    return dialect or db.get_backend().name
+
+
+def _create_base_tables(cursor, dialect):
+    cursor.execute(sql.ROOMS_TABLE)
+    cursor.execute(sql.RESERVATIONS_TABLE)
+
+
+def _create_indexes(cursor, dialect):
+    for table, name, columns, unique in INDEXES:
+        ensure_index(cursor, table, name, columns, unique, dialect)
+
+
+# (version, name, step); a step takes (cursor, dialect) and must be safe to re-run on a database that already
+# has its objects, since existing deployments predate this table
+MIGRATIONS = [
+    (1, "base tables", _create_base_tables),
+    (2, "reservation access-path indexes", _create_indexes),
+    (3, "reservation change log", changelog.create_table),
+]
+
+
+# {index name: (columns, unique)} for a table, including SQLite's INTEGER PRIMARY KEY (the rowid itself)
+def existing_indexes(cursor, table, dialect=None):
+    dialect = _dialect(dialect)
+    indexes = {}
+    if dialect == "sqlite":
+        cursor.execute(f"PRAGMA index_list({table})")
+        for row in cursor.fetchall():
+            name, unique = row[1], bool(row[2])
+            cursor.execute(f"PRAGMA index_info({name})")
+            indexes[name] = (tuple(info[2] for info in cursor.fetchall()), unique)
+        cursor.execute(f"PRAGMA table_info({table})")
+        for _, column, column_type, _, _, pk in cursor.fetchall():
+            if pk == 1 and column_type.upper() == "INTEGER":
+                indexes["rowid"] = ((column,), True)
+        return indexes
+
+    cursor.execute("""
+    SELECT INDEX_NAME, NON_UNIQUE, COLUMN_NAME
+    FROM information_schema.STATISTICS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    ORDER BY INDEX_NAME, SEQ_IN_INDEX
+    """, (table,))
+    for name, non_unique, column in cursor.fetchall():
+        columns, _ = indexes.get(name, ((), not non_unique))
+        indexes[name] = (columns + (column,), not non_unique)
+    return indexes
+
+
+# Creates the index unless one already starts with these columns (and is unique, if uniqueness is asked for).
+# Returns True if it created one
+def ensure_index(cursor, table, name, columns, unique=False, dialect=None):
+    columns = tuple(columns)
+    for existing, existing_unique in existing_indexes(cursor, table, dialect).values():
+        if tuple(column.lower() for column in existing[:len(columns)]) == tuple(column.lower() for column in columns):
+            if existing_unique or not unique:
+                return False
+    cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({', '.join(columns)})")
+    return True
+
+
+def applied_versions(cursor):
+    cursor.execute(MIGRATIONS_TABLE)
+    cursor.execute("SELECT Version FROM lab7_schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+# Applies every pending migration on conn, committing after each; returns the versions applied
+def upgrade(conn, dialect=None):
+    dialect = _dialect(dialect)
+    cursor = conn.cursor()
+    done = applied_versions(cursor)
+    conn.commit()
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if version in done:
+            continue
+        try:
+            step(cursor, dialect)
+            cursor.execute("INSERT INTO lab7_schema_migrations (Version, Name, AppliedAt) VALUES (%s, %s, %s)",
+                           (version, name, datetime.datetime.now().replace(microsecond=0)))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+
+# Sample parameters for EXPLAIN; plans depend on the statement's shape, not on these values
+_ROOM, _OTHER_ROOM = "AOB", "CAS"
+_FROM, _TO = datetime.date(2025, 1, 1), datetime.date(2025, 1, 8)
+_CODE = 10105
+
+_SAMPLE_PARAMS = {
+    "room_details": (_ROOM,),
+    "room_price": (_ROOM,),
+    "catalog_rooms": (),
+    "catalog_version": (),
+    "check_availability": (_ROOM, _TO, _FROM),
+    "room_conflicts": (_ROOM, _TO, _FROM),
+    "available_rooms": (_TO, _FROM, 2, 2),
+    "rooms_for_occupancy": (2, 2),
+    "next_available_rooms": ("King", _FROM),
+    "lock_room": (_ROOM,),
+    "lock_reservation": (_CODE,),
+    "delete_reservation": (_CODE,),
+    "count_reservation": (_CODE,),
+    "monthly_revenue": (2025,),
+    "room_stats_refresh": (),
+    "room_listing": (),
+}
+
+
+def _search(**filters):
+    conditions, params = sql.search_conditions(**filters)
+    return sql.search_page(conditions, params, 50)
+
+
+# (name, query, params) for every statement worth a plan: the fixed ones, except single-row INSERT ... VALUES
+# which have no access path, and representative shapes of the ones built per call
+def checked_statements():
+    statements = [(name, sql.STATEMENTS[name], params) for name, params in _SAMPLE_PARAMS.items()]
+    statements += [
+        ("lock_rooms", sql.lock_rooms(2), (_ROOM, _OTHER_ROOM)),
+        ("batch_conflicts", sql.batch_conflicts(2), (_ROOM, _OTHER_ROOM, _TO, _FROM)),
+        ("room_stats_refresh_rooms", sql.room_stats_refresh(2), (_ROOM, _OTHER_ROOM)),
+        ("search_page:code", *_search(reservation_code=_CODE)),
+        ("search_page:dates", *_search(start_date=_FROM, end_date=_TO)),
+        ("search_page:name", *_search(first_name="AN", last_name="SM")),
+        ("search_page:room", *_search(room_code="AO")),
+        ("search_page:codes", *sql.search_page([], [], 50, codes=[_CODE, _CODE + 1])),
+    ]
+    return statements
+
+
+# alias -> table for every lab7_ table the query names, so plans that report aliases can be resolved
+def _aliases(query):
+    aliases = {}
+    for table, alias in re.findall(r"\b(lab7_\w+)(?:\s+(?!ON\b|WHERE\b|JOIN\b|LEFT\b|ORDER\b|GROUP\b|SET\b)(\w+))?", query):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+# Plan lines and the large tables read in full, for one statement
+def explain(cursor, query, params):
+    dialect = db.get_backend().name
+    aliases = _aliases(query)
+    cursor.execute(db.get_backend().explain_prefix + query, tuple(params))
+    rows = cursor.fetchall()
+    lines, scans = [], []
+    if dialect == "sqlite":
+        for row in rows:
+            detail = row[-1]
+            lines.append(detail)
+            # "SCAN t" reads every row, "SCAN t USING [COVERING] INDEX i" every index entry; SEARCH is a seek
+            match = re.match(r"SCAN (?:TABLE )?(\w+)", detail)
+            if match and aliases.get(match.group(1), match.group(1)) in LARGE_TABLES:
+                scans.append(aliases.get(match.group(1), match.group(1)))
+        return lines, scans
+
+    columns = [column[0] for column in cursor.description]
+    for row in rows:
+        plan = dict(zip(columns, row))
+        lines.append(f"{plan.get('table')}: type={plan.get('type')} key={plan.get('key')} rows={plan.get('rows')} {plan.get('Extra') or ''}".rstrip())
+        # ALL is a table scan and index a full index scan
+        table = aliases.get(plan.get("table"), plan.get("table"))
+        if plan.get("type") in ("ALL", "index") and table in LARGE_TABLES:
+            scans.append(table)
+    return lines, scans
+
+
+# Explains every checked statement; returns [(name, plan lines, scanned large tables, error)]
+def check(conn):
+    import revenue
+    import room_stats
+    revenue.ensure_ready(conn, fill=False)  # the derived tables some statements read
+    room_stats.ensure_ready(conn)
+    cursor = conn.cursor()
+    results = []
+    for name, query, params in checked_statements():
+        try:
+            lines, scans = explain(cursor, query, params)
+            results.append((name, lines, sorted(set(scans)), None))
+        except db.get_backend().errors as e:
+            results.append((name, [], [], str(e)))
+    conn.rollback()  # SQLite's EXPLAIN of a write or locking read still opens a transaction
+    return results
+
+
+# Runs one command against the current property's database; returns False if it failed
+def _run(command, verbose):
+    conn = db.connect_db()
+    if not conn:
+        return False
+    try:
+        if command == "status":
+            cursor = conn.cursor()
+            done = applied_versions(cursor)
+            conn.commit()
+            for version, name, _ in MIGRATIONS:
+                print(f"{version:>3}  {'applied' if version in done else 'pending':<8} {name}")
+        elif command == "upgrade":
+            applied = upgrade(conn)
+            print(f"Applied migrations {', '.join(map(str, applied))}." if applied else "Schema is up to date.")
+        else:
+            failed = False
+            for name, lines, scans, error in check(conn):
+                if error:
+                    status, failed = f"ERROR {error}", True
+                elif scans and name in EXPECTED_SCANS:
+                    status = f"scan (expected: {EXPECTED_SCANS[name]})"
+                elif scans:
+                    status, failed = f"FULL SCAN of {', '.join(scans)}", True
+                else:
+                    status = "ok"
+                print(f"{name:<26} {status}")
+                if verbose or (scans and name not in EXPECTED_SCANS):
+                    for line in lines:
+                        print(f"    {line}")
+            return not failed
+    finally:
+        conn.close()
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Schema migrations and query-plan checks")
+    parser.add_argument("command", choices=["status", "upgrade", "check"])
+    parser.add_argument("--verbose", action="store_true", help="print every plan, not just the flagged ones")
+    parser.add_argument("--all-properties", action="store_true",
+                        help="run against every property's database in the shard map, not just DB_PROPERTY's")
+    args = parser.parse_args()
+
+    ok = True
+    for key in db.properties() if args.all_properties else [db.current_property()]:
+        if args.all_properties:
+            print(f"== {key}")
+        with db.use_property(key):
+            ok = _run(args.command, args.verbose) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
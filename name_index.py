@@ -0,0 +1,151 @@
+import os
+import threading
+from collections import defaultdict
+
+from db import PropertyState, connect_db
+
+
+GRAM = 3
+
+
+def _grams(text):
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class NameIndex:
+    """Trigram index over FirstName/LastName for case-insensitive substring search.
+
+    Terms of three or more characters intersect the posting lists of their trigrams and then verify the
+    few candidates; shorter terms fall back to scanning the names held in memory.
+    """
+
+    def __init__(self):
+        self._names = {}  # code -> (first name, last name), lower-cased
+        self._grams = ({}, {})  # per field: trigram -> set of codes
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    def load(self):
+        conn = connect_db()
+        if not conn:
+            return False
+        try:
+            cursor = conn.cursor(buffered=False)
+            cursor.execute("SELECT CODE, FirstName, LastName FROM lab7_reservations")
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        names = {}
+        grams = (defaultdict(set), defaultdict(set))
+        for code, first_name, last_name in rows:
+            entry = ((first_name or "").lower(), (last_name or "").lower())
+            names[code] = entry
+            for field, value in enumerate(entry):
+                for gram in _grams(value):
+                    grams[field][gram].add(code)
+
+        with self._lock:
+            self._names = names
+            self._grams = (dict(grams[0]), dict(grams[1]))
+            self.loaded = True
+        return True
+
+    def add(self, code, first_name, last_name):
+        with self._lock:
+            if code in self._names:
+                return
+            entry = ((first_name or "").lower(), (last_name or "").lower())
+            self._names[code] = entry
+            for field, value in enumerate(entry):
+                for gram in _grams(value):
+                    self._grams[field].setdefault(gram, set()).add(code)
+
+    def remove(self, code):
+        with self._lock:
+            entry = self._names.pop(code, None)
+            if entry is None:
+                return
+            for field, value in enumerate(entry):
+                for gram in _grams(value):
+                    postings = self._grams[field].get(gram)
+                    if postings is not None:
+                        postings.discard(code)
+                        if not postings:
+                            del self._grams[field][gram]
+
+    def _match_field(self, field, term):
+        if len(term) < GRAM:
+            return {code for code, entry in self._names.items() if term in entry[field]}
+        postings = [self._grams[field].get(gram, set()) for gram in _grams(term)]
+        postings.sort(key=len)
+        candidates = set(postings[0]).intersection(*postings[1:])
+        return {code for code in candidates if term in self._names[code][field]}
+
+    # Codes whose first and last names contain the given substrings (either may be blank)
+    def match(self, first_name="", last_name=""):
+        with self._lock:
+            matches = None
+            for field, term in enumerate((first_name.lower(), last_name.lower())):
+                if term:
+                    found = self._match_field(field, term)
+                    matches = found if matches is None else matches & found
+            return matches if matches is not None else set(self._names)
+
+
+_state = PropertyState(index=NameIndex)  # one index per property
+_enabled = os.environ.get("NAME_INDEX", "").lower() in ("1", "true", "yes")
+
+
+# Turns the index on for this process and loads it
+def enable_index():
+    global _enabled
+    _enabled = True
+    return _state.index.load()
+
+
+# Drops back to LIKE matching in SQL
+def disable_index():
+    global _enabled
+    _enabled = False
+
+
+def reload_index():
+    return _state.index.load()
+
+
+# Returns the loaded index when enabled, otherwise None so callers fall back to SQL
+def get_index():
+    if not _enabled:
+        return None
+    index = _state.index
+    if not index.loaded and not index.load():
+        return None
+    return index
+
+
+def is_loaded():
+    return _state.index.loaded
+
+
+def record_booking(code, first_name, last_name):
+    index = _state.index
+    if index.loaded:
+        index.add(code, first_name, last_name)
+
+
+def record_cancellation(code):
+    index = _state.index
+    if index.loaded:
+        index.remove(code)
+
+
+# Sorted codes matching the name filters past after_code, or None when names should be matched in SQL instead
+def candidates(first_name="", last_name="", after_code=None):
+    if not (first_name or last_name):
+        return None
+    index = get_index()
+    if index is None:
+        return None
+    after_code = None if after_code is None else int(after_code)  # codes are ints; callers may pass the raw text
+    return sorted(code for code in index.match(first_name, last_name) if after_code is None or code > after_code)
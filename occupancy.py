@@ -0,0 +1,250 @@
+import argparse
+import csv
+import datetime
+import sys
+import threading
+
+import numpy as np
+
+import catalog
+from db import PropertyState, connect_db
+from dates import to_date
+
+
+# Rooms x days occupancy matrix for analytics: a bool per room-night plus per-room prefix sums, so booked
+# nights over any window are two lookups per room and every answer below is one vectorized expression.
+# Built from lab7_reservations and kept in step with bookings and cancellations made through queries.py.
+
+POPULARITY_DAYS = 180
+
+
+def _day(value):
+    return np.datetime64(to_date(value), "D")
+
+
+class OccupancyMatrix:
+    """booked[room, day] is True when the room is taken the night of start + day."""
+
+    def __init__(self, room_codes, start, end):
+        self.rooms = list(room_codes)
+        self.room_index = {room: i for i, room in enumerate(self.rooms)}
+        self.start = to_date(start)
+        self.end = to_date(end)  # exclusive
+        days = (self.end - self.start).days
+        self.booked = np.zeros((len(self.rooms), days), dtype=bool)
+        self.prefix = np.zeros((len(self.rooms), days + 1), dtype=np.int32)
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_stays(cls, room_codes, rooms, check_ins, check_outs):
+        """Builds the matrix in one pass; rooms/check_ins/check_outs are parallel sequences, one per stay."""
+        check_ins = np.asarray(check_ins, dtype="datetime64[D]")
+        check_outs = np.asarray(check_outs, dtype="datetime64[D]")
+        today = datetime.date.today()
+        start = min(check_ins.min().item(), today) if check_ins.size else today
+        end = max(check_outs.max().item(), today) if check_outs.size else today
+        room_codes = list(dict.fromkeys(list(room_codes) + list(rooms)))
+        matrix = cls(room_codes, start, end + datetime.timedelta(days=1))
+
+        if check_ins.size:
+            # +1 on each check-in night, -1 on each check-out day; a running sum above zero means booked
+            rows = np.array([matrix.room_index[room] for room in rooms], dtype=np.int64)
+            delta = np.zeros(matrix.prefix.shape, dtype=np.int32)
+            np.add.at(delta, (rows, matrix._offsets(check_ins)), 1)
+            np.add.at(delta, (rows, matrix._offsets(check_outs)), -1)
+            matrix.booked = np.cumsum(delta, axis=1)[:, :-1] > 0
+            np.cumsum(matrix.booked, axis=1, out=matrix.prefix[:, 1:])
+        return matrix
+
+    def _offsets(self, days):
+        return (np.asarray(days, dtype="datetime64[D]") - np.datetime64(self.start, "D")).astype(np.int64)
+
+    # Offsets of [start, end) clipped to the matrix; nights outside it have no bookings
+    def _window(self, start, end):
+        start, end = to_date(start), to_date(end)
+        if end <= start:
+            raise ValueError(f"Empty window {start} to {end}")
+        days = (end - start).days
+        lo = min(max((start - self.start).days, 0), self.booked.shape[1])
+        hi = min(max((end - self.start).days, 0), self.booked.shape[1])
+        return lo, hi, days
+
+    # Grows the matrix to cover [first, last) and to know room_code, keeping what is already marked
+    def _ensure_covers(self, first, last, room_code=None):
+        before = max(0, (self.start - first).days)
+        after = max(0, (last - self.end).days)
+        new_room = room_code is not None and room_code not in self.room_index
+        if not (before or after or new_room):
+            return
+        self.booked = np.pad(self.booked, ((0, int(new_room)), (before, after)))
+        if new_room:
+            self.room_index[room_code] = len(self.rooms)
+            self.rooms.append(room_code)
+        self.start -= datetime.timedelta(days=before)
+        self.end += datetime.timedelta(days=after)
+        self.prefix = np.zeros((len(self.rooms), self.booked.shape[1] + 1), dtype=np.int32)
+        np.cumsum(self.booked, axis=1, out=self.prefix[:, 1:])
+
+    # Marks a stay booked (or free again, for a cancellation) and refreshes that room's prefix sums
+    def mark(self, room_code, check_in, check_out, booked=True):
+        check_in, check_out = to_date(check_in), to_date(check_out)
+        with self._lock:
+            self._ensure_covers(check_in, check_out, room_code)
+            row = self.room_index[room_code]
+            lo, hi = (check_in - self.start).days, (check_out - self.start).days
+            self.booked[row, lo:hi] = booked
+            np.cumsum(self.booked[row, lo:], out=self.prefix[row, lo + 1:])
+            self.prefix[row, lo + 1:] += self.prefix[row, lo]
+
+    # Booked nights per room (in self.rooms order) over [start, end)
+    def booked_nights(self, start, end):
+        lo, hi, _ = self._window(start, end)
+        with self._lock:
+            return self.prefix[:, hi] - self.prefix[:, lo]
+
+    def free_nights(self, start, end):
+        _, _, days = self._window(start, end)
+        return days - self.booked_nights(start, end)
+
+    # Share of nights booked per room over [start, end)
+    def occupancy_rate(self, start, end):
+        _, _, days = self._window(start, end)
+        return self.booked_nights(start, end) / days
+
+    # Share of all room-nights booked over [start, end)
+    def hotel_occupancy(self, start, end):
+        return float(self.occupancy_rate(start, end).mean()) if self.rooms else 0.0
+
+    # Booked share of the `days` nights before as_of (today by default), the listing's popularity measure
+    def popularity(self, as_of=None, days=POPULARITY_DAYS):
+        as_of = to_date(as_of) if as_of else datetime.date.today()
+        return self.occupancy_rate(as_of - datetime.timedelta(days=days), as_of)
+
+    # (dates, rooms, rooms x dates bool array) for [start, end), zero-padded outside the matrix
+    def heatmap(self, start, end, room_codes=None):
+        start, end = to_date(start), to_date(end)
+        lo, hi, days = self._window(start, end)
+        offset = lo - (start - self.start).days  # days of the window before the matrix starts
+        with self._lock:
+            rows = [self.room_index[room] for room in room_codes] if room_codes is not None else slice(None)
+            grid = np.zeros((len(room_codes) if room_codes is not None else len(self.rooms), days), dtype=bool)
+            grid[:, offset:offset + hi - lo] = self.booked[rows, lo:hi]
+            rooms = list(room_codes) if room_codes is not None else list(self.rooms)
+        dates = np.arange(_day(start), _day(end))
+        return dates, rooms, grid
+
+    # Hotel-wide share of rooms booked each night of [start, end)
+    def daily_occupancy(self, start, end):
+        dates, _, grid = self.heatmap(start, end)
+        return dates, grid.mean(axis=0) if len(grid) else np.zeros(len(dates))
+
+
+def load_matrix():
+    rooms = catalog.get_catalog()  # before taking a connection: the catalog may load itself
+    conn = connect_db()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor(buffered=False)
+        cursor.execute("SELECT Room, CheckIn, Checkout FROM lab7_reservations")
+        stays = cursor.fetchall()
+    finally:
+        conn.close()
+    room_codes = [room.RoomCode for room in rooms.rooms] if rooms is not None else []
+    return OccupancyMatrix.from_stays(room_codes, [stay[0] for stay in stays],
+                                      [to_date(stay[1]) for stay in stays], [to_date(stay[2]) for stay in stays])
+
+
+_state = PropertyState(matrix=None)  # one matrix per property
+_matrix_lock = threading.Lock()
+
+
+# Returns the current property's matrix, building it on first use
+def get_matrix():
+    if _state.matrix is None:
+        with _matrix_lock:
+            if _state.matrix is None:
+                _state.matrix = load_matrix()
+    return _state.matrix
+
+
+def reload_matrix():
+    matrix = load_matrix()
+    if matrix is not None:
+        _state.matrix = matrix
+    return matrix is not None
+
+
+def is_loaded():
+    return _state.matrix is not None
+
+
+# Keeps a built matrix in step with a new reservation
+def record_booking(room_code, check_in, check_out):
+    matrix = _state.matrix
+    if matrix is not None:
+        matrix.mark(room_code, check_in, check_out, True)
+
+
+# Keeps a built matrix in step with a cancellation
+def record_cancellation(room_code, check_in, check_out):
+    matrix = _state.matrix
+    if matrix is not None:
+        matrix.mark(room_code, check_in, check_out, False)
+
+
+# Per-room occupancy rate, booked and free nights over [start, end), plus popularity as of end
+def room_summary(start, end):
+    matrix = get_matrix()
+    if matrix is None:
+        return []
+    booked = matrix.booked_nights(start, end)
+    rates = matrix.occupancy_rate(start, end)
+    popularity = matrix.popularity(end)
+    _, _, days = matrix._window(start, end)
+    return [{"Room": room, "BookedNights": int(booked[i]), "FreeNights": int(days - booked[i]),
+             "OccupancyRate": round(float(rates[i]), 4), "Popularity": round(float(popularity[i]), 4)}
+            for i, room in enumerate(matrix.rooms)]
+
+
+# Writes a rooms x dates heatmap as CSV: 1 for a booked night, with a last row of hotel-wide occupancy per night
+def export_heatmap(out, start, end, room_codes=None):
+    matrix = get_matrix()
+    if matrix is None:
+        return False
+    dates, rooms, grid = matrix.heatmap(start, end, room_codes)
+    writer = csv.writer(out)
+    writer.writerow(["Room"] + [str(day) for day in dates])
+    for room, row in zip(rooms, grid.astype(np.uint8)):
+        writer.writerow([room] + row.tolist())
+    writer.writerow(["Occupancy"] + [f"{share:.3f}" for share in (grid.mean(axis=0) if len(grid) else np.zeros(len(dates)))])
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Occupancy analytics over lab7_reservations")
+    parser.add_argument("command", choices=["summary", "heatmap"])
+    parser.add_argument("--start", required=True, help="first night, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, help="day after the last night, YYYY-MM-DD")
+    parser.add_argument("--room", action="append", help="limit the heatmap to these rooms (repeatable)")
+    parser.add_argument("--output", help="heatmap CSV path (default stdout)")
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        rows = room_summary(args.start, args.end)
+        print(f"{'Room':<6} {'Booked':>7} {'Free':>6} {'Occupancy':>10} {'Popularity':>11}")
+        for row in rows:
+            print(f"{row['Room']:<6} {row['BookedNights']:>7} {row['FreeNights']:>6} {row['OccupancyRate']:>10.1%} {row['Popularity']:>11.2f}")
+        return
+
+    out = open(args.output, "w", newline="") if args.output else sys.stdout
+    try:
+        if not export_heatmap(out, args.start, args.end, args.room):
+            print("Could not build the occupancy matrix.", file=sys.stderr)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,379 +1,433 @@
-from db import connect_db
+from db import connect_db, reads, writes
+import datetime
 from collections import defaultdict
-
-# FR1: Get all rooms and their details, including popularity score, next available check-in, and last stay length
+import availability
+import catalog
+import codes
+import derived
+import metrics
+import name_index
+import recommend
+import revenue
+import room_stats
+import sql
+from dates import to_date
+
+
+# FR1: Get all rooms and their details, including popularity score, next available check-in, and last stay length.
+# Served from the lab7_room_stats materialization (cached in memory), so the listing never scans reservations
+@metrics.operation
+@reads
 def get_all_rooms():
-    conn = connect_db()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        query = """
-        WITH RoomUsage AS (
-            SELECT
-                Room AS RoomID,
-                SUM(DATEDIFF(Checkout,
-                    CASE 
-                        WHEN CheckIn >= CURRENT_DATE - INTERVAL 180 DAY 
-                        THEN CheckIn
-                        ELSE CURRENT_DATE - INTERVAL 180 DAY
-                    END
-                )) AS TotalDaysBooked
-            FROM lab7_reservations
-            WHERE Checkout > CURRENT_DATE - INTERVAL 180 DAY
-            GROUP BY Room
-        ),
-        RecentStays AS (
-            SELECT 
-                res1.Room AS RoomID, 
-                res1.CheckIn AS LatestCheckIn, 
-                res1.Checkout AS LatestCheckOut,
-                DATEDIFF(res1.Checkout, res1.CheckIn) AS StayDuration
-            FROM lab7_reservations res1
-            WHERE res1.Checkout < CURRENT_DATE
-              AND res1.Checkout = (
-                  SELECT MAX(res2.Checkout)
-                  FROM lab7_reservations res2
-                  WHERE res2.Room = res1.Room
-                    AND res2.Checkout < CURRENT_DATE
-              )
-        ),
-        NextAvailable AS (
-            SELECT 
-                Room AS RoomID,
-                MIN(CheckIn) AS NextCheckIn
-            FROM lab7_reservations
-            WHERE CheckIn > CURRENT_DATE
-            GROUP BY Room
-        )
-        SELECT 
-            r.*, 
-            ROUND(IFNULL(ru.TotalDaysBooked, 0) / 180, 2) AS popularity_score,
-            IFNULL(na.NextCheckIn, CURRENT_DATE) AS next_available_checkin,
-            IFNULL(rs.StayDuration, 0) AS last_stay_length,
-            rs.LatestCheckOut AS last_checkout_date  -- Added this field
-        FROM lab7_rooms r
-        LEFT JOIN RoomUsage ru ON r.RoomCode = ru.RoomID
-        LEFT JOIN RecentStays rs ON r.RoomCode = rs.RoomID
-        LEFT JOIN NextAvailable na ON r.RoomCode = na.RoomID
-        ORDER BY popularity_score DESC;
-        """
-        cursor.execute(query)
-        rooms = cursor.fetchall()
-        conn.close()
-        return rooms
-    return []
+    return room_stats.get_room_listing()
 
 
 
 # FR2: Make a reservation
+@metrics.operation
+@reads
 def get_room_details(room_code):
-    conn = connect_db()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        query = """
-        SELECT RoomCode, RoomName, Beds, bedType, maxOcc, basePrice
-        FROM lab7_rooms
-        WHERE RoomCode = %s
-        """
-        cursor.execute(query, (room_code,))
-        result = cursor.fetchone()
-        conn.close()
-        return result
-    return None  # Return None if no details found
+    room = catalog.get_room(room_code)
+    return room.as_dict() if room else None  # Return None if no details found
 
 # FR2: Make a reservation
+@metrics.operation
+@writes
 def make_reservation(room_code, check_in, check_out, first_name, last_name, adults, kids, rate):
+    # Generate a unique reservation CODE before borrowing a connection for the insert
+    new_code = codes.get_allocator().next_code()
+
     conn = connect_db()
     if conn:
-        cursor = conn.cursor()
-        
-        # Generate a unique reservation CODE
-        cursor.execute("SELECT MAX(CAST(CODE AS UNSIGNED)) FROM lab7_reservations")
-        max_code = cursor.fetchone()[0]
-        new_code = max_code + 1 if max_code is not None else 1  # Start from 1 if empty
-        
-        query = """
-        INSERT INTO lab7_reservations (CODE, Room, CheckIn, Checkout, Rate, LastName, FirstName, Adults, Kids)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-        """
-        cursor.execute(query, (new_code, room_code, check_in, check_out, rate, last_name, first_name, adults, kids))
-        conn.commit()
-        conn.close()
+        try:
+            derived.prepare(conn)
+            cursor = conn.cursor()
+            cursor.execute(sql.INSERT_RESERVATION, (new_code, room_code, check_in, check_out, rate, last_name, first_name, adults, kids))
+            stays = [(new_code, room_code, check_in, check_out, rate, first_name, last_name)]
+            derived.update(cursor, stays)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()  # back to the pool even when the insert fails
+        derived.after_commit(stays)
         return new_code  # Return the new reservation code
     return None  # Return None if failed
 
 
 
+# (check_in, check_out) as dates, or None when either doesn't parse or the stay isn't at least one night
+def stay_dates(check_in, check_out):
+    try:
+        check_in, check_out = to_date(check_in), to_date(check_out)
+    except (TypeError, ValueError):
+        return None
+    return (check_in, check_out) if check_in < check_out else None
+
+
+# FR2: Check availability and book in one transaction, so concurrent clerks can't double-book a room
+@metrics.operation
+@writes
+def book_reservation(room_code, check_in, check_out, first_name, last_name, adults, kids, rate):
+    """Returns {"status": "booked", "code": ...}, or "conflict" with the clashing stays, "unknown_room", "invalid"
+    (bad dates), "over_capacity" (more guests than the room sleeps) or "error"."""
+    if stay_dates(check_in, check_out) is None:
+        return {"status": "invalid", "code": None, "conflicts": []}
+
+    # Allocated up front so the room lock is never held while the allocator talks to the database;
+    # a code lost to a conflict just leaves a gap
+    new_code = codes.get_allocator().next_code()
+
+    conn = connect_db()
+    if not conn:
+        return {"status": "error", "code": None, "conflicts": []}
+
+    try:
+        derived.prepare(conn)
+        # READ COMMITTED so the overlap check sees whatever the previous lock holder just committed
+        conn.start_transaction(isolation_level="READ COMMITTED")
+        cursor = conn.cursor(dictionary=True)
+
+        # Lock the room row: bookings for the same room queue here, bookings for other rooms don't wait
+        cursor.execute(sql.LOCK_ROOM, (room_code,))
+        room = cursor.fetchone()
+        if room is None:
+            conn.rollback()
+            return {"status": "unknown_room", "code": None, "conflicts": []}
+        if adults + kids > room["maxOcc"]:
+            conn.rollback()
+            return {"status": "over_capacity", "code": None, "conflicts": []}
+
+        cursor.execute(sql.ROOM_CONFLICTS, (room_code, check_out, check_in))
+        conflicts = cursor.fetchall()
+        if conflicts:
+            conn.rollback()
+            return {"status": "conflict", "code": None, "conflicts": conflicts}
+
+        cursor.execute(sql.INSERT_RESERVATION, (new_code, room_code, check_in, check_out, rate, last_name, first_name, adults, kids))
+        stays = [(new_code, room_code, check_in, check_out, rate, first_name, last_name)]
+        derived.update(cursor, stays)
+        conn.commit()
+    finally:
+        conn.close()
+
+    derived.after_commit(stays)
+    return {"status": "booked", "code": new_code, "conflicts": []}
+
+
+# FR2: Book a block of rooms (group and tour bookings) in one transaction
+@metrics.operation
+@writes
+def make_reservations_batch(reservations, all_or_nothing=False):
+    """Each item is a dict with room_code, check_in, check_out, first_name, last_name, adults, kids and rate.
+
+    Returns one result per item, in order, shaped like book_reservation()'s: "booked", "conflict",
+    "unknown_room", "invalid" (unparseable or empty dates), "over_capacity" (more guests than the room sleeps)
+    or "error", and in all_or_nothing mode "aborted" for items booked alongside one that failed.
+    """
+    if not reservations:
+        return []
+
+    # Every code is allocated up front in one call; codes of items that don't get booked leave gaps
+    new_codes = codes.get_allocator().next_codes(len(reservations))
+
+    conn = connect_db()
+    if not conn:
+        return [{"status": "error", "code": None, "conflicts": []} for _ in reservations]
+
+    results = [None] * len(reservations)
+    try:
+        derived.prepare(conn)
+        conn.start_transaction(isolation_level="READ COMMITTED")
+        cursor = conn.cursor(dictionary=True)
+
+        # Lock every room in the block, in key order so two overlapping batches can't deadlock
+        rooms = sorted({item["room_code"] for item in reservations})
+        cursor.execute(sql.lock_rooms(len(rooms)), rooms)
+        capacity = {row["RoomCode"]: row["maxOcc"] for row in cursor.fetchall()}
+
+        stays = []
+        for i, item in enumerate(reservations):
+            check_in, check_out = stay_dates(item["check_in"], item["check_out"]) or (None, None)
+            if check_in is None:
+                results[i] = {"status": "invalid", "code": None, "conflicts": []}
+            elif item["room_code"] not in capacity:
+                results[i] = {"status": "unknown_room", "code": None, "conflicts": []}
+            elif item["adults"] + item["kids"] > capacity[item["room_code"]]:
+                results[i] = {"status": "over_capacity", "code": None, "conflicts": []}
+            stays.append((check_in, check_out))
+
+        valid = [i for i, result in enumerate(results) if result is None]
+        booked_by_room = defaultdict(list)
+        if valid:
+            # One query fetches every existing stay that could clash with any item in the block
+            valid_rooms = sorted({reservations[i]["room_code"] for i in valid})
+            cursor.execute(sql.batch_conflicts(len(valid_rooms)),
+                           valid_rooms + [max(stays[i][1] for i in valid), min(stays[i][0] for i in valid)])
+            for row in cursor.fetchall():
+                booked_by_room[row["Room"]].append((to_date(row["CheckIn"]), to_date(row["Checkout"]), row))
+
+        rows = []
+        for i in valid:
+            item = reservations[i]
+            check_in, check_out = stays[i]
+            taken = booked_by_room[item["room_code"]]
+            conflicts = [row for start, end, row in taken if start < check_out and end > check_in]
+            if conflicts:
+                results[i] = {"status": "conflict", "code": None, "conflicts": conflicts}
+                continue
+            # Later items in the same block must not overlap this one either
+            taken.append((check_in, check_out, {"CODE": new_codes[i], "Room": item["room_code"], "CheckIn": check_in, "Checkout": check_out}))
+            results[i] = {"status": "booked", "code": new_codes[i], "conflicts": []}
+            rows.append((new_codes[i], item["room_code"], check_in, check_out, item["rate"],
+                         item["last_name"], item["first_name"], item["adults"], item["kids"]))
+
+        failed = len(rows) < len(reservations)
+        if not rows or (all_or_nothing and failed):
+            conn.rollback()
+            for result in results:
+                if result["status"] == "booked":
+                    result.update(status="aborted", code=None)
+            return results
+
+        cursor.executemany(sql.INSERT_RESERVATION, rows)
+        stays = [row[:5] + (row[6], row[5]) for row in rows]
+        derived.update(cursor, stays)
+        conn.commit()
+    finally:
+        conn.close()
+
+    derived.after_commit(stays)
+    return results
+
 
 # FR2: Check room availability for given dates
+@metrics.operation
+@reads
 def check_room_availability(room_code, check_in, check_out):
+    index = availability.get_index()
+    if index is not None:
+        return index.is_free(room_code, check_in, check_out)
+
     conn = connect_db()
     if conn:
-        cursor = conn.cursor()
-        query = """
-        SELECT 1 FROM lab7_reservations
-        WHERE Room = %s
-        AND (CheckIn <= %s AND Checkout > %s)  -- Ensures no overlapping reservation
-        """
-        cursor.execute(query, (room_code, check_out, check_in))
-        result = cursor.fetchone()
-        conn.close()
-        return result is None  # Returns True if available, False if occupied
+        try:
+            rows = conn.fetch_prepared("check_availability", (room_code, check_out, check_in))
+        finally:
+            conn.close()
+        return not rows  # Returns True if available, False if occupied
     return False
 
 
 
-# FR2: Find alternative rooms if requested room is unavailable
-def find_alternative_rooms(check_in, check_out, total_guests, bed_type):
+# FR2: Rooms that are free for the requested stay
+@metrics.operation
+@reads
+def find_available_rooms(check_in, check_out, total_guests, bed_type=None):
+    """Rooms free for the whole stay that sleep the party, closest fit and cheapest first.
+
+    bed_type narrows them to one bed type ("Any" or None for all). None if the database can't be reached.
+    """
+    # The index and catalog may load themselves, so they are consulted before this call takes a connection of its own
+    available_rooms = free_rooms_from_index(check_in, check_out, total_guests, bed_type)
+    if available_rooms is not None:
+        return available_rooms
+
     conn = connect_db()
-    if conn:
+    if not conn:
+        return None
+    try:
         cursor = conn.cursor(dictionary=True)
-
-        # Step 1: Try finding fully available rooms (most likely empty set)
-        query = """
-        SELECT r.RoomCode, r.RoomName, r.Beds, r.bedType, r.maxOcc, r.basePrice
-        FROM lab7_rooms r
-        LEFT JOIN lab7_reservations res 
-            ON r.RoomCode = res.Room 
-            AND res.CheckIn < %s 
-            AND res.CheckOut > %s
-        WHERE r.maxOcc >= %s  
-        AND res.Room IS NULL  
-        ORDER BY ABS(r.maxOcc - %s), r.basePrice ASC
-        """
-        cursor.execute(query, (check_out, check_in, total_guests, total_guests))
+        cursor.execute(sql.AVAILABLE_ROOMS, (check_out, check_in, total_guests, total_guests))
         available_rooms = cursor.fetchall()
+    finally:
+        conn.close()
+    if bed_type is not None and bed_type.lower() != "any":
+        available_rooms = [room for room in available_rooms if room["bedType"].lower() == bed_type.lower()]
+    return available_rooms
 
-        if available_rooms:
-            conn.close()
-            return available_rooms  # Step 1: Fully available rooms
-
-        # Step 2: If no exact matches, find next available rooms
-        query = """
-        SELECT DISTINCT res.Room, MIN(res.CheckOut) AS NextAvailableFrom, 
-        r.RoomName, r.bedType, r.maxOcc, r.basePrice
-        FROM lab7_reservations res
-        JOIN lab7_rooms r ON r.RoomCode = res.Room
-        WHERE r.bedType = %s
-        AND res.CheckOut > %s  
-        GROUP BY res.Room, r.RoomName, r.bedType, r.maxOcc, r.basePrice
-        ORDER BY NextAvailableFrom ASC
-        LIMIT 5;
-
-        """
-        cursor.execute(query, (bed_type, check_out))
-        alternative_rooms = cursor.fetchall()
 
-        conn.close()
-        return alternative_rooms  # Step 2: Show next available rooms
+# find_available_rooms() answered from the availability index and room catalog alone, with no query at all;
+# None when either isn't loaded, so the caller asks the database instead
+def free_rooms_from_index(check_in, check_out, total_guests, bed_type=None):
+    index = availability.get_index()
+    rooms = catalog.get_catalog() if index is not None else None
+    if rooms is None:
+        return None
+    free_rooms = set(index.free_rooms(check_in, check_out))
+    return [room.as_dict() for room in rooms.for_occupancy(total_guests, bed_type) if room.RoomCode in free_rooms]
 
-    return []
+
+# Alternatives for find_alternative_rooms() here and in aqueries.py, given the rooms free for the exact dates:
+# those rooms when there are any, else recommend.recommend()'s closest stays that fit the party and the whole
+# stay. None when no recommendation can be made and the caller should list NEXT_AVAILABLE_ROOMS instead
+def rank_alternatives(available_rooms, check_in, check_out, total_guests, bed_type, room_code=None):
+    if available_rooms:
+        return available_rooms
+    return recommend.recommend(check_in, check_out, total_guests, bed_type, room_code)
+
+
+# FR2: Find alternative rooms if requested room is unavailable
+@metrics.operation
+@reads
+def find_alternative_rooms(check_in, check_out, total_guests, bed_type, room_code=None):
+    """Rooms free for the exact dates or, failing that, recommend.recommend()'s best nearby stays.
+
+    room_code is the room the guest asked for, if any, so suggestions can favour rooms like it.
+    """
+    # Step 1: Try finding fully available rooms (most likely empty set)
+    available_rooms = find_available_rooms(check_in, check_out, total_guests)
+    if available_rooms is None:
+        return []
+
+    # Step 2: If no exact matches, suggest the closest stays that fit the party and the whole stay
+    alternatives = rank_alternatives(available_rooms, check_in, check_out, total_guests, bed_type, room_code)
+    if alternatives is not None:
+        return alternatives
+
+    # Without the index or catalog, fall back to the rooms of that bed type that free up soonest
+    conn = connect_db()
+    if not conn:
+        return []
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql.NEXT_AVAILABLE_ROOMS, (bed_type, check_out))
+        return cursor.fetchall()  # Step 2: Show next available rooms
+    finally:
+        conn.close()
 
 
 
 
 
 # FR2: Fetch the base price of a given room
+@metrics.operation
+@reads
 def get_room_price(room_code):
     """Fetch the base price of a given room."""
-    conn = connect_db()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-        query = "SELECT basePrice FROM lab7_rooms WHERE RoomCode = %s"
-        cursor.execute(query, (room_code,))
-        result = cursor.fetchone()
-        conn.close()
-        return result["basePrice"] if result else None
-    return None
+    room = catalog.get_room(room_code)
+    return room.basePrice if room else None
+
+
+# FR2: Rooms with the wanted bed type ("Any" for all) that sleep the whole party, closest fit and cheapest first
+@metrics.operation
+@reads
+def find_matching_rooms(bed_type, total_guests):
+    rooms = catalog.get_catalog()
+    if rooms is None:
+        return []
+    return [room.as_dict() for room in rooms.for_occupancy(total_guests, bed_type)]
 
 
 
 
 
 # FR3: Cancel a reservation by removing it from the database
+@metrics.operation
+@writes
 def cancel_reservation(reservation_code):
     """Deletes a reservation from the database."""
     conn = connect_db()
     if conn:
-        cursor = conn.cursor()
-        query = "DELETE FROM lab7_reservations WHERE CODE = %s"
-        cursor.execute(query, (reservation_code,))
-        conn.commit()
-        conn.close()
-        return cursor.rowcount > 0  # Returns True if a reservation was deleted
+        try:
+            derived.prepare(conn)
+            cursor = conn.cursor()
+            # Lock the row first so its nights can be taken back out of the derived tables
+            cursor.execute(sql.LOCK_RESERVATION, (reservation_code,))
+            stays = cursor.fetchall()
+            cursor.execute(sql.DELETE_RESERVATION, (reservation_code,))
+            deleted = cursor.rowcount > 0
+            if deleted:
+                derived.update(cursor, stays, sign=-1)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        if deleted:
+            derived.after_commit(stays, sign=-1)
+        return deleted  # Returns True if a reservation was deleted
     return False
 
 
 # FR3: Check if a reservation exists before attempting to cancel it
+@metrics.operation
+@reads
 def check_reservation_exists(reservation_code):
     """Check if a reservation exists before attempting to cancel it."""
     conn = connect_db()
     if conn:
-        cursor = conn.cursor()
-        query = "SELECT COUNT(*) FROM lab7_reservations WHERE CODE = %s"
-        cursor.execute(query, (reservation_code,))
-        result = cursor.fetchone()
-        conn.close()
-        return result[0] > 0  # Returns True if reservation exists, False otherwise
+        try:
+            rows = conn.fetch_prepared("count_reservation", (reservation_code,))
+        finally:
+            conn.close()
+        return rows[0][0] > 0  # Returns True if reservation exists, False otherwise
     return False
 
 
 
 
-# FR4: Search reservations based on user input criteria
-def search_reservations(reservation_code="", first_name="", last_name="", start_date=None, end_date=None, room_code=""):
-    conn = connect_db()
-    if conn:
-        cursor = conn.cursor(dictionary=True)
-
-        query = """
-        SELECT r.RoomName, res.*
-        FROM lab7_reservations res
-        JOIN lab7_rooms r ON res.Room = r.RoomCode
-        WHERE (%s = '' OR res.CODE = %s)
-        AND (%s = '' OR res.FirstName LIKE %s)
-        AND (%s = '' OR res.LastName LIKE %s)
-        AND (%s = '' OR res.Room LIKE %s)
-        """
-
-        params = [
-            reservation_code, reservation_code,
-            first_name, f"%{first_name}%",
-            last_name, f"%{last_name}%",
-            room_code, f"%{room_code}%"
-        ]
-
- 
-        if start_date and end_date:
-            query += " AND (res.CheckIn < %s AND res.Checkout > %s)"  # Overlap logic
-            params.extend([end_date, start_date])  
-
-        cursor.execute(query, params)
-        results = cursor.fetchall()
-        conn.close()
-        return results
-    
-    return []
-
+SEARCH_PAGE_SIZE = 50
+SEARCH_CANDIDATE_CHUNK = 500  # name-index matches sent per IN list
 
 
-# FR5: Generate revenue report for each month
+# FR4: Search reservations one keyset page at a time; only the filters actually supplied go into the query
+@metrics.operation
+@reads
+def search_reservations_page(reservation_code="", first_name="", last_name="", start_date=None, end_date=None, room_code="",
+                             after_code=None, page_size=SEARCH_PAGE_SIZE):
+    """Returns (rows, next_after_code). Pass next_after_code back as after_code for the next page; None means no more."""
+    # Name matching goes through the trigram index when it is enabled, otherwise through LIKE
+    candidates = name_index.candidates(first_name, last_name, after_code)
+    if candidates is not None and not candidates:
+        return [], None
+    conditions, params = sql.search_conditions(reservation_code, first_name, last_name, start_date, end_date, room_code,
+                                               match_names=candidates is None)
 
-def generate_revenue_report():
     conn = connect_db()
-    if conn:
+    if not conn:
+        return [], None
+    try:
         cursor = conn.cursor(dictionary=True)
-
-        query = """
-        WITH reservations_per_month AS (
-            SELECT 
-                r.CODE, 
-                r.Room, 
-                r.Rate, 
-                r.CheckIn, 
-                MONTH(r.CheckIn) AS CheckInMonth, 
-                r.CheckOut, 
-                MONTH(r.CheckOut) AS CheckOutMonth, 
-                DATEDIFF(r.CheckOut, r.CheckIn) AS NightsStayed
-            FROM lab7_reservations r
-            WHERE YEAR(r.CheckIn) = YEAR(CURRENT_DATE())
-        ),
-
-        same_month_stays AS (
-            SELECT 
-                CODE, 
-                Room, 
-                CheckInMonth AS Month, 
-                NightsStayed, 
-                Rate, 
-                NightsStayed * Rate AS Revenue
-            FROM reservations_per_month
-            WHERE CheckInMonth = CheckOutMonth
-        ),
-
-        multi_month_stays AS (
-            SELECT 
-                CODE, 
-                Room, 
-                CheckInMonth, 
-                CheckOutMonth, 
-                NightsStayed, 
-                Rate,
-                NightsStayed - (DAYOFMONTH(CheckOut) - 1) AS CheckInMonthNights,
-                (DAYOFMONTH(CheckOut) - 1) AS CheckOutMonthNights
-            FROM reservations_per_month
-            WHERE CheckInMonth != CheckOutMonth
-        ),
-
-        same_month_revenue AS (
-            SELECT 
-                Room, 
-                Month, 
-                SUM(Revenue) AS TotalRevenue
-            FROM same_month_stays
-            GROUP BY Room, Month
-        ),
-
-        multi_month_revenue AS (
-            SELECT 
-                Room, 
-                CheckInMonth AS Month, 
-                SUM(CheckInMonthNights * Rate) AS Revenue
-            FROM multi_month_stays
-            GROUP BY Room, CheckInMonth
-
-            UNION ALL
-
-            SELECT 
-                Room, 
-                CheckOutMonth AS Month, 
-                SUM(CheckOutMonthNights * Rate) AS Revenue
-            FROM multi_month_stays
-            GROUP BY Room, CheckOutMonth
-        ),
-
-        final_revenue_per_room AS (
-            SELECT Room, Month, SUM(TotalRevenue) AS MonthRevenue
-            FROM same_month_revenue
-            GROUP BY Room, Month
-
-            UNION ALL
-
-            SELECT Room, Month, SUM(Revenue) AS MonthRevenue
-            FROM multi_month_revenue
-            GROUP BY Room, Month
-        )
-
-        SELECT * 
-        FROM final_revenue_per_room
-        ORDER BY Room, Month;
-        """
-
-        cursor.execute(query)
-        reservations = cursor.fetchall()
+        if candidates is None:
+            cursor.execute(*sql.search_page(conditions, params, page_size, after_code=after_code))
+            rows = cursor.fetchall()
+        else:
+            # Feed the name matches through in bounded IN lists until the page is full
+            rows = []
+            for i in range(0, len(candidates), SEARCH_CANDIDATE_CHUNK):
+                cursor.execute(*sql.search_page(conditions, params, page_size - len(rows),
+                                                codes=candidates[i:i + SEARCH_CANDIDATE_CHUNK]))
+                rows.extend(cursor.fetchall())
+                if len(rows) >= page_size:
+                    break
+    finally:
         conn.close()
 
-        revenue_per_room = defaultdict(lambda: defaultdict(float))  
-
-        for res in reservations:
-            room = res["Room"]
-            month = res["Month"]
-            revenue = float(res["MonthRevenue"])
-
-            revenue_per_room[room][month] += revenue  
-
-        revenue_report = []
-        for room, revenue in sorted(revenue_per_room.items()):
-            room_data = {
-                "Room": room,
-                **{month: revenue.get(month, 0) for month in range(1, 13)},
-                "Total": sum(revenue.values())
-            }
-            revenue_report.append(room_data)
-
-        return revenue_report
-    return []
-
-
-
+    next_after_code = rows[-1]["CODE"] if len(rows) == page_size else None
+    return rows, next_after_code
 
 
+# FR4: Search reservations based on user input criteria, returning every match
+@metrics.operation
+@reads
+def search_reservations(reservation_code="", first_name="", last_name="", start_date=None, end_date=None, room_code=""):
+    results = []
+    after_code = None
+    while True:
+        rows, after_code = search_reservations_page(reservation_code, first_name, last_name, start_date, end_date, room_code,
+                                                    after_code=after_code)
+        results.extend(rows)
+        if after_code is None:
+            return results
+
+
+
+# FR5: Generate revenue report for each month, read from the incrementally maintained lab7_revenue_monthly
+@metrics.operation
+@reads
+def generate_revenue_report(year=None):
+    year = year or datetime.date.today().year
+    return revenue.build_report(revenue.monthly_revenue(year))
@@ -0,0 +1,206 @@
+import datetime
+import json
+import os
+import threading
+
+import numpy as np
+
+import catalog
+from dates import to_date
+from db import PropertyState
+
+
+WEEKEND_MULTIPLIER = 1.10  # 110% on weekends
+WEEKEND_DAYS = (5, 6)  # Saturday, Sunday
+RATE_RULES_FILE = os.environ.get("RATE_RULES_FILE")
+HORIZON_PAST_DAYS = 365
+HORIZON_FUTURE_DAYS = 730
+
+_EPOCH_WEEKDAY = 3  # 1970-01-01 was a Thursday
+
+
+class Season:
+    """Multiplier applied to [start, end) for the given rooms, or every room when rooms is None."""
+
+    def __init__(self, start, end, multiplier, rooms=None):
+        self.start = to_date(start)
+        self.end = to_date(end)
+        self.multiplier = float(multiplier)
+        self.rooms = set(rooms) if rooms else None
+
+
+class RateRules:
+    """Pricing rules: base price per room, weekend multiplier, seasons and per-day overrides."""
+
+    def __init__(self, base_prices, weekend_multiplier=WEEKEND_MULTIPLIER, weekend_days=WEEKEND_DAYS,
+                 seasons=None, overrides=None):
+        self.base_prices = {room: float(price) for room, price in base_prices.items()}
+        self.weekend_multiplier = float(weekend_multiplier)
+        self.weekend_days = tuple(weekend_days)
+        self.seasons = list(seasons or [])
+        self.overrides = {(room, to_date(day)): float(price) for (room, day), price in (overrides or {}).items()}
+
+    # Adds seasons and overrides from a JSON rules file on top of the given base prices
+    @classmethod
+    def from_file(cls, path, base_prices):
+        with open(path) as f:
+            config = json.load(f)
+        seasons = [Season(s["start"], s["end"], s["multiplier"], s.get("rooms")) for s in config.get("seasons", [])]
+        overrides = {(o["room"], o["date"]): o["price"] for o in config.get("overrides", [])}
+        return cls(base_prices,
+                   weekend_multiplier=config.get("weekend_multiplier", WEEKEND_MULTIPLIER),
+                   weekend_days=config.get("weekend_days", WEEKEND_DAYS),
+                   seasons=seasons, overrides=overrides)
+
+
+class RateCalendar:
+    """Rules compiled into a rooms x days price matrix with per-room prefix sums.
+
+    The price of any stay is prefix[room, check_out] - prefix[room, check_in], so quotes are O(1)
+    and batches of quotes are a single fancy-indexing operation. The compiled (start, end, prefix) is
+    replaced as a whole when the horizon grows, and each quote reads it once, so a quote never mixes
+    the old and new horizons.
+    """
+
+    def __init__(self, rules, start, end):
+        self.rules = rules
+        self.catalog_version = None  # version of the room catalog the base prices came from
+        self.rooms = sorted(rules.base_prices)
+        self.room_index = {room: i for i, room in enumerate(self.rooms)}
+        self._lock = threading.Lock()
+        self._window = self._compile(to_date(start), to_date(end))
+
+    @property
+    def start(self):
+        return self._window[0]
+
+    @property
+    def end(self):
+        return self._window[1]
+
+    # Returns (start, end, prefix) for the days [start, end)
+    def _compile(self, start, end):
+        rules = self.rules
+        dates = np.arange(np.datetime64(start, "D"), np.datetime64(end, "D"))
+        weekdays = (dates.astype(np.int64) + _EPOCH_WEEKDAY) % 7
+        day_multiplier = np.where(np.isin(weekdays, rules.weekend_days), rules.weekend_multiplier, 1.0)
+
+        base = np.array([rules.base_prices[room] for room in self.rooms], dtype=np.float64)
+        prices = base[:, None] * day_multiplier[None, :]
+
+        for season in rules.seasons:
+            lo = max(0, (season.start - start).days)
+            hi = min(len(dates), (season.end - start).days)
+            if lo >= hi:
+                continue
+            if season.rooms is None:
+                prices[:, lo:hi] *= season.multiplier
+            else:
+                rows = [self.room_index[room] for room in season.rooms if room in self.room_index]
+                prices[rows, lo:hi] *= season.multiplier
+
+        for (room, day), price in rules.overrides.items():
+            offset = (day - start).days
+            if room in self.room_index and 0 <= offset < len(dates):
+                prices[self.room_index[room], offset] = price
+
+        prefix = np.zeros((len(self.rooms), len(dates) + 1), dtype=np.float64)
+        np.cumsum(prices, axis=1, out=prefix[:, 1:])
+        return start, end, prefix
+
+    # Returns a compiled window covering [first, last], recompiling with a wider horizon when needed
+    def _covering(self, first, last):
+        window = self._window
+        if first >= window[0] and last <= window[1]:
+            return window
+        with self._lock:
+            start, end, _ = window = self._window
+            if first < start or last > end:
+                window = self._window = self._compile(min(first, start), max(last, end))
+        return window
+
+    # Total price of one stay
+    def quote(self, room_code, check_in, check_out):
+        check_in, check_out = to_date(check_in), to_date(check_out)
+        if check_out < check_in:
+            raise ValueError("Check-out must not be before check-in")
+        start, _, prefix = self._covering(check_in, check_out)
+        row = self.room_index[room_code]
+        return float(prefix[row, (check_out - start).days] - prefix[row, (check_in - start).days])
+
+    def quote_batch(self, room_codes, check_ins, check_outs):
+        """Quotes many stays at once; arguments broadcast against each other like NumPy arrays.
+
+        quote_batch(rooms, "2025-06-01", "2025-06-05") prices one date range for many rooms, and
+        quote_batch(np.array(rooms)[:, None], ins[None, :], outs[None, :]) gives a rooms x ranges matrix.
+        """
+        rooms = np.vectorize(self.room_index.__getitem__, otypes=[np.int64])(np.asarray(room_codes, dtype=object))
+        ins = np.asarray(check_ins, dtype="datetime64[D]")
+        outs = np.asarray(check_outs, dtype="datetime64[D]")
+        rooms, ins, outs = np.broadcast_arrays(rooms, ins, outs)
+        if not rooms.size:
+            return np.zeros(rooms.shape, dtype=np.float64)
+        if (outs < ins).any():
+            raise ValueError("Check-out must not be before check-in")
+        start, _, prefix = self._covering(to_date(ins.min().item()), to_date(outs.max().item()))
+        origin = np.datetime64(start, "D")
+        ins, outs = (ins - origin).astype(np.int64), (outs - origin).astype(np.int64)
+        return prefix[rooms, outs] - prefix[rooms, ins]
+
+
+# Cost of a stay at a flat base rate with the weekend markup, without walking the days one by one
+def stay_cost(check_in, check_out, base_rate, weekend_multiplier=WEEKEND_MULTIPLIER):
+    check_in, check_out = to_date(check_in), to_date(check_out)
+    nights = max(0, (check_out - check_in).days)
+    weekend_nights = int(np.busday_count(check_in, check_out, weekmask="0000011")) if nights else 0
+    return base_rate * (nights - weekend_nights) + base_rate * weekend_multiplier * weekend_nights
+
+
+_state = PropertyState(calendar=None)  # one calendar per property, from its own rooms
+_calendar_lock = threading.Lock()
+
+
+# Builds the calendar from the room catalog's base prices plus RATE_RULES_FILE, if set
+def load_calendar(rooms=None):
+    rooms = rooms or catalog.get_catalog()
+    if rooms is None:
+        return None
+    base_prices = rooms.base_prices()
+
+    if RATE_RULES_FILE:
+        rules = RateRules.from_file(RATE_RULES_FILE, base_prices)
+    else:
+        rules = RateRules(base_prices)
+    today = datetime.date.today()
+    calendar = RateCalendar(rules,
+                            today - datetime.timedelta(days=HORIZON_PAST_DAYS),
+                            today + datetime.timedelta(days=HORIZON_FUTURE_DAYS))
+    calendar.catalog_version = rooms.version
+    return calendar
+
+
+# Returns the current property's calendar, compiling it on first use and again whenever the room catalog changes
+def get_calendar():
+    rooms = catalog.get_catalog()
+    calendar = _state.calendar
+    if calendar is None or (rooms is not None and calendar.catalog_version != rooms.version):
+        with _calendar_lock:
+            calendar = _state.calendar
+            if calendar is None or (rooms is not None and calendar.catalog_version != rooms.version):
+                calendar = _state.calendar = load_calendar(rooms)
+    return calendar
+
+
+# Forces the next get_calendar() to recompile, e.g. after room prices or rules change
+def invalidate_calendar():
+    _state.calendar = None
+
+
+# Quotes the same stay for several rooms in one vectorized call; rooms the calendar doesn't know are None
+def quote_rooms(room_codes, check_in, check_out):
+    calendar = get_calendar()
+    if calendar is None:
+        return [None] * len(room_codes)
+    known = [room for room in room_codes if room in calendar.room_index]
+    totals = dict(zip(known, calendar.quote_batch(known, check_in, check_out).tolist())) if known else {}
+    return [totals.get(room) for room in room_codes]
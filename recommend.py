@@ -0,0 +1,144 @@
+import datetime
+import os
+
+import numpy as np
+
+import availability
+import catalog
+import rates
+import sql
+from db import connect_db
+from dates import to_date
+
+
+# Alternative-room recommendations from the free gaps in each room's calendar. Every room that sleeps the party
+# is scanned for gaps, within MAX_SHIFT_DAYS of the requested dates, long enough for the whole stay. Each
+# fitting gap yields the stay closest to the requested dates. The options are then scored on how far the dates
+# moved, how far the price is from the reference and how unlike the wanted room they are; lower is better.
+
+MAX_SHIFT_DAYS = int(os.environ.get("RECOMMEND_MAX_SHIFT_DAYS", "14"))
+DEFAULT_LIMIT = 5
+
+# Score weights, in "days of date shift" per unit
+PRICE_WEIGHT = 10.0  # per 100% price difference, so 10% dearer or cheaper counts like one day's shift
+BED_TYPE_WEIGHT = 5.0  # different bed type from the one asked for
+BEDS_WEIGHT = 1.0  # per bed more or fewer than the wanted room
+SPARE_CAPACITY_WEIGHT = 0.5  # per place beyond the party size
+DECOR_WEIGHT = 0.5  # different decor from the wanted room
+
+
+def _stay_prices(room_codes, check_ins, check_outs, rooms):
+    calendar = rates.get_calendar()
+    if calendar is not None and all(room in calendar.room_index for room in room_codes):
+        return calendar.quote_batch(room_codes, check_ins, check_outs)
+    return np.array([rates.stay_cost(check_in, check_out, float(rooms.get(room).basePrice))
+                     for room, check_in, check_out in zip(room_codes, check_ins, check_outs)])
+
+
+# For each (room code, check-in, check-out), whether the database has a stay overlapping it. Clashing stays are
+# added to the index so they aren't suggested again; without a connection nothing can be checked and all pass
+def _booked_elsewhere(index, stays):
+    conn = connect_db()
+    if not conn:
+        return [False] * len(stays)
+    rooms = sorted({room for room, _, _ in stays})
+    try:
+        cursor = conn.cursor()
+        window = [max(end for _, _, end in stays), min(start for _, start, _ in stays)]
+        cursor.execute(sql.batch_conflicts(len(rooms)), rooms + window)
+        rows = [(code, room, to_date(start), to_date(end)) for code, room, start, end in cursor.fetchall()]
+    finally:
+        conn.close()
+    for code, room, start, end in rows:
+        index.add(code, room, start, end)
+    return [any(room == other and start < check_out and end > check_in for _, other, start, end in rows)
+            for room, check_in, check_out in stays]
+
+
+def recommend(check_in, check_out, total_guests, bed_type="Any", room_code=None, limit=DEFAULT_LIMIT,
+              max_shift_days=MAX_SHIFT_DAYS):
+    """Top `limit` stays of the same length as [check_in, check_out), one per room, best first.
+
+    Each is a dict with the room's details plus CheckIn, Checkout, ShiftDays, StayTotal, PriceDifference
+    (relative to the wanted room's price for the requested dates, or to the cheapest option) and Score.
+    room_code is the room the guest wanted, if any; its features are what other rooms are compared against.
+    Returns None when the availability index or room catalog can't be loaded.
+
+    The gaps come from availability.shared_index(), which may have missed other processes' bookings, so the
+    chosen stays are checked against the database (one query per round) before they are returned. A stay that
+    turns out to be taken is replaced by the next best option and its booking is added to the index.
+    """
+    check_in, check_out = to_date(check_in), to_date(check_out)
+    nights = (check_out - check_in).days
+    if nights <= 0:
+        return []
+    index = availability.shared_index()
+    rooms = catalog.get_catalog()
+    if index is None or rooms is None:
+        return None
+
+    wanted = rooms.get(room_code) if room_code else None
+    bed_type = None if not bed_type or bed_type.lower() == "any" else bed_type.lower()
+    if bed_type is None and wanted is not None:
+        bed_type = wanted.bedType.lower()
+    candidates = rooms.for_occupancy(total_guests)
+    if not candidates:
+        return []
+
+    # Earliest and latest check-in allowed; the window runs to the last check-out that could follow
+    shift = datetime.timedelta(days=max_shift_days)
+    earliest, latest = check_in - shift, check_in + shift
+    gaps = index.free_gaps([room.RoomCode for room in candidates], earliest, latest + datetime.timedelta(days=nights))
+
+    options = []  # (room, check-in) per gap that fits the stay, placed as close to the requested check-in as it goes
+    stay = datetime.timedelta(days=nights)
+    for room in candidates:
+        for gap_start, gap_end in gaps[room.RoomCode]:
+            if gap_end - gap_start < stay:
+                continue
+            options.append((room, min(max(check_in, gap_start), gap_end - stay)))
+    if not options:
+        return []
+
+    check_ins = [day for _, day in options]
+    totals = _stay_prices([room.RoomCode for room, _ in options], check_ins, [day + stay for day in check_ins], rooms)
+
+    if wanted is not None:
+        reference = float(_stay_prices([wanted.RoomCode], [check_in], [check_out], rooms)[0])
+    else:
+        reference = float(totals.min())
+
+    best = {}  # room code -> best-scoring option for that room
+    for (room, day), total in zip(options, totals.tolist()):
+        shift_days = abs((day - check_in).days)
+        price_difference = (total - reference) / reference if reference else 0.0
+        score = shift_days + PRICE_WEIGHT * abs(price_difference) + SPARE_CAPACITY_WEIGHT * (room.maxOcc - total_guests)
+        if bed_type is not None and room.bedType.lower() != bed_type:
+            score += BED_TYPE_WEIGHT
+        if wanted is not None:
+            score += BEDS_WEIGHT * abs(room.Beds - wanted.Beds)
+            if room.decor != wanted.decor:
+                score += DECOR_WEIGHT
+        key = (score, shift_days, total, room.RoomCode)
+        if room.RoomCode not in best or key < best[room.RoomCode][0]:
+            best[room.RoomCode] = (key, room, day, total, price_difference)
+
+    ranked = sorted(best.values(), key=lambda entry: entry[0])
+    chosen = []
+    while ranked and len(chosen) < limit:
+        batch, ranked = ranked[:limit - len(chosen)], ranked[limit - len(chosen):]
+        taken = _booked_elsewhere(index, [(room.RoomCode, day, day + stay) for _, room, day, _, _ in batch])
+        chosen.extend(entry for entry, clash in zip(batch, taken) if not clash)
+
+    results = []
+    for (score, shift_days, total, _), room, day, _, price_difference in chosen:
+        results.append({
+            **room.as_dict(),
+            "CheckIn": day,
+            "Checkout": day + stay,
+            "ShiftDays": (day - check_in).days,
+            "StayTotal": round(total, 2),
+            "PriceDifference": round(price_difference, 4),
+            "Score": round(score, 3),
+        })
+    return results
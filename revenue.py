@@ -0,0 +1,135 @@
+import argparse
+import datetime
+from collections import defaultdict
+
+import sql
+from db import PropertyState, connect_db
+from dates import to_date
+
+
+_state = PropertyState(ready=False)  # per property: each has its own aggregate table
+
+
+# Splits a stay into (year, month, nights) for every month it touches; nights are counted on the night they start
+def split_by_month(check_in, check_out):
+    check_in, check_out = to_date(check_in), to_date(check_out)
+    months = []
+    current = check_in
+    while current < check_out:
+        next_month = (current.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+        end = min(next_month, check_out)
+        months.append((current.year, current.month, (end - current).days))
+        current = end
+    return months
+
+
+# Per-month rows to add (sign=1) or subtract (sign=-1) for one reservation
+def stay_rows(room_code, check_in, check_out, rate, sign=1):
+    return [(room_code, year, month, sign * nights, sign * nights * float(rate))
+            for year, month, nights in split_by_month(check_in, check_out)]
+
+
+# Creates the aggregate table on first use and fills it if it is empty. Runs outside any booking transaction,
+# since the DDL would commit it
+def ensure_ready(conn, fill=True):
+    if _state.ready:
+        return
+    cursor = conn.cursor()
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS lab7_revenue_monthly (
+        Room CHAR(5) NOT NULL,
+        Year SMALLINT NOT NULL,
+        Month TINYINT NOT NULL,
+        Nights INT NOT NULL DEFAULT 0,
+        Revenue DECIMAL(14, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (Year, Room, Month)
+    )
+    """)
+    cursor.execute("SELECT 1 FROM lab7_revenue_monthly LIMIT 1")
+    empty = cursor.fetchone() is None
+    conn.commit()
+    _state.ready = True
+    if empty and fill:
+        rebuild(conn)
+
+
+# Recomputes the whole aggregate from lab7_reservations, on the given connection or a new one
+def rebuild(conn=None):
+    owns_conn = conn is None
+    conn = conn or connect_db()
+    if not conn:
+        return False
+    try:
+        cursor = conn.cursor()
+        # Delete first: its locks hold back concurrent bookings' upserts until we commit, and the read below
+        # then sees every booking that committed before us, so no stay is counted twice or missed
+        cursor.execute("DELETE FROM lab7_revenue_monthly")
+
+        totals = defaultdict(lambda: [0, 0.0])
+        reader = conn.cursor(buffered=False)  # stream the reservations; only the monthly totals stay in memory
+        reader.execute("SELECT Room, CheckIn, Checkout, Rate FROM lab7_reservations")
+        for room, check_in, check_out, rate in reader:
+            for _, year, month, nights, revenue in stay_rows(room, check_in, check_out, rate):
+                total = totals[(room, year, month)]
+                total[0] += nights
+                total[1] += revenue
+
+        rows = [(room, year, month, nights, round(revenue, 2)) for (room, year, month), (nights, revenue) in totals.items()]
+        if rows:
+            cursor.executemany(sql.REVENUE_UPSERT, rows)
+        conn.commit()
+    finally:
+        if owns_conn:
+            conn.close()
+    return True
+
+
+# Revenue per room and month for one year, straight from the aggregate
+def monthly_revenue(year):
+    conn = connect_db(primary=not _state.ready)  # the first call may create and fill the table
+    if not conn:
+        return []
+    try:
+        ensure_ready(conn)
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql.MONTHLY_REVENUE, (year,))
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+# Shapes MONTHLY_REVENUE rows into one dict per room with months 1-12 and a yearly Total
+def build_report(rows):
+    revenue_per_room = defaultdict(lambda: defaultdict(float))
+
+    for row in rows:
+        revenue_per_room[row["Room"]][row["Month"]] += float(row["MonthRevenue"])
+
+    revenue_report = []
+    for room, room_revenue in sorted(revenue_per_room.items()):
+        room_data = {
+            "Room": room,
+            **{month: room_revenue.get(month, 0) for month in range(1, 13)},
+            "Total": sum(room_revenue.values())
+        }
+        revenue_report.append(room_data)
+
+    return revenue_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the lab7_revenue_monthly aggregate")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+    if args.command == "rebuild":
+        conn = connect_db()
+        if conn:
+            try:
+                ensure_ready(conn, fill=False)
+            finally:
+                conn.close()
+        print("Revenue aggregate rebuilt." if rebuild() else "Rebuild failed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import datetime
+import os
+import threading
+import time
+
+import sql
+from db import PropertyState, connect_db
+
+
+ROOM_STATS_TTL = float(os.environ.get("ROOM_STATS_TTL", "60"))  # seconds the listing is served from memory
+
+_state = PropertyState(ready=False, cache=None)  # cache: (loaded_at, rows)
+_cache_lock = threading.Lock()
+
+
+# Creates the stats table on first use and fills it if it is empty; must run outside a booking transaction
+def ensure_ready(conn):
+    if _state.ready:
+        return
+    cursor = conn.cursor()
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS lab7_room_stats (
+        Room CHAR(5) PRIMARY KEY,
+        popularity_score DECIMAL(6, 2) NOT NULL DEFAULT 0,
+        next_available_checkin DATE NOT NULL,
+        last_stay_length INT NOT NULL DEFAULT 0,
+        last_checkout_date DATE NULL,
+        AsOf DATE NOT NULL
+    )
+    """)
+    cursor.execute("SELECT 1 FROM lab7_room_stats LIMIT 1")
+    empty = cursor.fetchone() is None
+    if empty:
+        cursor.execute(sql.room_stats_refresh())
+    conn.commit()
+    _state.ready = True
+
+
+# Recomputes stats for the given rooms (all rooms when None) inside the caller's transaction
+def refresh_rooms(cursor, room_codes=None):
+    if room_codes is None:
+        cursor.execute(sql.room_stats_refresh())
+    elif room_codes:
+        room_codes = sorted(set(room_codes))
+        cursor.execute(sql.room_stats_refresh(len(room_codes)), room_codes)
+
+
+# Recomputes every room's stats; the daily job that rolls the 180-day window and "today" forward
+def refresh_all():
+    conn = connect_db()
+    if not conn:
+        return False
+    try:
+        ensure_ready(conn)
+        refresh_rooms(conn.cursor())
+        conn.commit()
+    finally:
+        conn.close()
+    invalidate_cache()
+    return True
+
+
+# Drops the in-process listing so the next read comes from lab7_room_stats
+def invalidate_cache():
+    _state.cache = None
+
+
+# The cached listing if it is still within ROOM_STATS_TTL, otherwise None
+def cached_listing():
+    cached = _state.cache
+    if cached is not None and time.monotonic() - cached[0] < ROOM_STATS_TTL:
+        return cached[1]
+    return None
+
+
+# True if any ROOM_LISTING row was computed before today and needs rolling forward
+def needs_refresh(rows):
+    today = datetime.date.today()
+    return any(row["AsOf"] is None or row["AsOf"] < today for row in rows)
+
+
+# Finishes ROOM_LISTING rows for callers and caches them
+def store_listing(rows):
+    for row in rows:
+        del row["AsOf"]
+        if row["next_available_checkin"] is None:
+            row["next_available_checkin"] = datetime.date.today()
+    _state.cache = (time.monotonic(), rows)
+    return rows
+
+
+# Rooms joined with their stats, most popular first; served from memory for ROOM_STATS_TTL seconds
+def get_room_listing():
+    rows = cached_listing()
+    if rows is not None:
+        return rows
+
+    with _cache_lock:
+        rows = cached_listing()
+        if rows is not None:
+            return rows
+
+        conn = connect_db(primary=not _state.ready)  # creating the table is a write; after that a replica will do
+        if not conn:
+            return []
+        try:
+            ensure_ready(conn)
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute(sql.ROOM_LISTING)
+            rows = cursor.fetchall()
+        finally:
+            conn.close()
+
+        # Stats computed on an earlier day are stale; roll them forward on the primary if the daily job hasn't yet
+        if needs_refresh(rows):
+            conn = connect_db(primary=True)
+            if not conn:
+                return []
+            try:
+                cursor = conn.cursor(dictionary=True)
+                refresh_rooms(cursor)
+                conn.commit()
+                cursor.execute(sql.ROOM_LISTING)
+                rows = cursor.fetchall()
+            finally:
+                conn.close()
+
+        return store_listing(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the lab7_room_stats table")
+    parser.add_argument("command", choices=["refresh"], help="recompute stats for every room (run daily)")
+    parser.parse_args()
+    print("Room stats refreshed." if refresh_all() else "Refresh failed.")
+
+
+if __name__ == "__main__":
+    main()
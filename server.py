@@ -0,0 +1,401 @@
+import argparse
+import contextlib
+import datetime
+import decimal
+import json
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import availability
+import chain
+import changelog
+import db
+import metrics as query_metrics
+import name_index
+import occupancy
+import queries
+import rates
+import room_stats
+
+
+# Long-running JSON service over queries.py. One process keeps its connection pool, availability and
+# name indexes, rate calendar and room listing warm across requests.
+
+# Seconds a keep-alive connection may sit idle (or a client may stall mid-request) before it is dropped,
+# so idle clients can't hold on to the fixed worker threads
+IDLE_TIMEOUT = float(os.environ.get("HTTP_IDLE_TIMEOUT", "5"))
+
+class _Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._routes = defaultdict(lambda: {"requests": 0, "errors": 0, "time_total": 0.0, "time_max": 0.0})
+
+    def record(self, route, elapsed, status):
+        with self._lock:
+            stats = self._routes[route]
+            stats["requests"] += 1
+            stats["errors"] += status >= 500
+            stats["time_total"] += elapsed
+            stats["time_max"] = max(stats["time_max"], elapsed)
+
+    def snapshot(self):
+        with self._lock:
+            routes = {route: dict(stats, time_avg=stats["time_total"] / stats["requests"] if stats["requests"] else 0.0)
+                      for route, stats in self._routes.items()}
+        return {"uptime": time.time() - self.started, "routes": routes}
+
+
+metrics = _Metrics()
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, set):
+        return sorted(value)
+    return str(value)
+
+
+def _param(query, name, default=None, required=False):
+    values = query.get(name)
+    if not values:
+        if required:
+            raise HttpError(400, f"Missing query parameter '{name}'")
+        return default
+    return values[0]
+
+
+def _int_param(query, name, default=None):
+    value = _param(query, name)
+    if value is None:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise HttpError(400, f"Query parameter '{name}' must be an integer")
+
+
+# Route handlers: each takes (query, body, path arguments) and returns (status, payload)
+
+def _health(query, body):
+    conn = db.connect_db()
+    if not conn:
+        return 503, {"status": "unavailable", "database": False}
+    conn.close()
+    return 200, {"status": "ok", "database": True}
+
+
+def _metrics(query, body):
+    return 200, {
+        **metrics.snapshot(),
+        "pool": db.pool_stats(),
+        "routing": db.routing_stats() if db.has_replicas() else None,
+        "availability_index": availability.get_index() is not None,
+        "name_index": name_index.get_index() is not None,
+        "queries": query_metrics.snapshot() if query_metrics.enabled() else None,
+    }
+
+
+def _rooms(query, body):
+    return 200, {"rooms": queries.get_all_rooms()}
+
+
+def _room(query, body, room_code):
+    room = queries.get_room_details(room_code)
+    if room is None:
+        raise HttpError(404, f"Unknown room {room_code}")
+    return 200, room
+
+
+def _availability(query, body):
+    check_in = _param(query, "check_in", required=True)
+    check_out = _param(query, "check_out", required=True)
+    room_code = _param(query, "room")
+    if room_code:
+        return 200, {"room": room_code, "available": queries.check_room_availability(room_code, check_in, check_out)}
+    guests = _int_param(query, "guests", 1)
+    bed_type = _param(query, "bed_type", "Any")
+    return 200, {"rooms": queries.find_alternative_rooms(check_in, check_out, guests, bed_type)}
+
+
+def _quote(query, body):
+    check_in = _param(query, "check_in", required=True)
+    check_out = _param(query, "check_out", required=True)
+    room_codes = query.get("room") or []
+    if not room_codes:
+        raise HttpError(400, "Give at least one 'room' parameter")
+    totals = rates.quote_rooms(room_codes, check_in, check_out)
+    return 200, {"quotes": [{"room": room, "total": total} for room, total in zip(room_codes, totals)]}
+
+
+def _book(query, body):
+    required = ["room_code", "check_in", "check_out", "first_name", "last_name"]
+    missing = [field for field in required if not body.get(field)]
+    if missing:
+        raise HttpError(400, f"Missing fields: {', '.join(missing)}")
+    rate = body.get("rate")
+    if rate is None:
+        rate = queries.get_room_price(body["room_code"])
+        if rate is None:
+            raise HttpError(404, f"Unknown room {body['room_code']}")
+    result = queries.book_reservation(body["room_code"], body["check_in"], body["check_out"],
+                                      body["first_name"], body["last_name"],
+                                      int(body.get("adults", 1)), int(body.get("kids", 0)), rate)
+    status = {"booked": 201, "conflict": 409, "unknown_room": 404, "invalid": 400, "over_capacity": 400}.get(result["status"], 500)
+    return status, result
+
+
+def _cancel(query, body, code):
+    if not queries.cancel_reservation(code):
+        raise HttpError(404, f"No reservation {code}")
+    return 200, {"cancelled": code}
+
+
+def _search(query, body):
+    rows, next_after = queries.search_reservations_page(
+        reservation_code=_param(query, "code", ""),
+        first_name=_param(query, "first_name", ""),
+        last_name=_param(query, "last_name", ""),
+        start_date=_param(query, "start"),
+        end_date=_param(query, "end"),
+        room_code=_param(query, "room", ""),
+        after_code=_int_param(query, "after"),
+        page_size=min(_int_param(query, "limit", queries.SEARCH_PAGE_SIZE), 500),
+    )
+    return 200, {"reservations": rows, "next": next_after}
+
+
+def _occupancy(query, body):
+    start = _param(query, "start", required=True)
+    end = _param(query, "end", required=True)
+    return 200, {"rooms": occupancy.room_summary(start, end)}
+
+
+def _revenue(query, body):
+    return 200, {"report": queries.generate_revenue_report(_int_param(query, "year"))}
+
+
+def _properties(query, body):
+    return 200, {"properties": db.properties(), "default": db.current_property()}
+
+
+def _chain_revenue(query, body):
+    return 200, chain.chain_revenue(_int_param(query, "year"))
+
+
+def _chain_availability(query, body):
+    radius = _param(query, "radius_km")
+    return 200, chain.search_availability(_param(query, "check_in", required=True),
+                                          _param(query, "check_out", required=True),
+                                          _int_param(query, "guests", 1), _param(query, "bed_type", "Any"),
+                                          _param(query, "near"), float(radius) if radius else chain.NEARBY_RADIUS_KM)
+
+
+def _chain_guests(query, body):
+    first_name, last_name = _param(query, "first_name", ""), _param(query, "last_name", "")
+    if not first_name and not last_name:
+        raise HttpError(400, "Give 'first_name' and/or 'last_name'")
+    return 200, chain.search_guests(first_name, last_name, _param(query, "start"), _param(query, "end"))
+
+
+# (method, path segments, handler); a segment in braces captures that part of the path
+ROUTES = [
+    ("GET", ["health"], _health),
+    ("GET", ["metrics"], _metrics),
+    ("GET", ["rooms"], _rooms),
+    ("GET", ["rooms", "{code}"], _room),
+    ("GET", ["availability"], _availability),
+    ("GET", ["quote"], _quote),
+    ("POST", ["reservations"], _book),
+    ("GET", ["reservations"], _search),
+    ("DELETE", ["reservations", "{code}"], _cancel),
+    ("GET", ["revenue"], _revenue),
+    ("GET", ["occupancy"], _occupancy),
+    ("GET", ["properties"], _properties),
+    ("GET", ["chain", "revenue"], _chain_revenue),
+    ("GET", ["chain", "availability"], _chain_availability),
+    ("GET", ["chain", "reservations"], _chain_guests),
+]
+
+
+def _match(method, path):
+    segments = [segment for segment in path.split("/") if segment]
+    allowed = False
+    for route_method, pattern, handler in ROUTES:
+        if len(pattern) != len(segments):
+            continue
+        args = []
+        for expected, actual in zip(pattern, segments):
+            if expected.startswith("{"):
+                args.append(actual)
+            elif expected != actual:
+                break
+        else:
+            if route_method == method:
+                return "/" + "/".join(pattern), handler, args
+            allowed = True
+    raise HttpError(405 if allowed else 404, "Method not allowed" if allowed else "Not found")
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "HotelReservation/1.0"
+    timeout = IDLE_TIMEOUT
+
+    def _dispatch(self, method):
+        started = time.monotonic()
+        route = "unmatched"
+        try:
+            url = urlsplit(self.path)
+            route, handler, args = _match(method, url.path)
+            body = {}
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                try:
+                    body = json.loads(self.rfile.read(length))
+                except ValueError:
+                    raise HttpError(400, "Request body must be JSON")
+            query = parse_qs(url.query)
+            # Per-hotel routes act for the X-Property header or ?property=, else the default property
+            property_key = self.headers.get("X-Property") or _param(query, "property")
+            # Read-your-writes is tracked per X-Session-Id when the client sends one, else for the whole process
+            with db.session(self.headers.get("X-Session-Id")), \
+                    (db.use_property(property_key) if property_key else contextlib.nullcontext()):
+                status, payload = handler(query, body, *args)
+        except HttpError as e:
+            status, payload = e.status, {"error": str(e)}
+        except ValueError as e:  # bad dates and numbers from the caller
+            status, payload = 400, {"error": str(e)}
+        except Exception as e:
+            traceback.print_exc()
+            status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+
+        data = json.dumps(payload, default=_json_default).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        metrics.record(f"{method} {route}", time.monotonic() - started, status)
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        pass  # per-request timings go to /metrics instead of stderr
+
+
+class WorkerPoolHTTPServer(ThreadingHTTPServer):
+    """HTTP server that hands each connection to a fixed pool of worker threads."""
+
+    def __init__(self, address, handler, workers):
+        super().__init__(address, handler)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http-worker")
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self._connections_lock:
+            self._connections.add(request)
+        self.executor.submit(self._serve_connection, request, client_address)
+
+    def _serve_connection(self, request, client_address):
+        try:
+            self.process_request_thread(request, client_address)
+        finally:
+            with self._connections_lock:
+                self._connections.discard(request)
+
+    def server_close(self):
+        super().server_close()
+        # Stop reading from every open connection: idle keep-alive clients see end of stream and are closed,
+        # queued ones close as soon as a worker picks them up, and in-flight requests still send their response
+        with self._connections_lock:
+            connections = list(self._connections)
+        for request in connections:
+            try:
+                request.shutdown(socket.SHUT_RD)
+            except OSError:
+                pass  # already closed by the client
+        self.executor.shutdown(wait=True)
+
+
+# Loads every property's indexes, rate calendar and room listing up front so the first requests don't pay for it
+def warm_up():
+    for key in db.properties():
+        with db.use_property(key):
+            availability.enable_index()
+            name_index.enable_index()
+            rates.get_calendar()
+            room_stats.get_room_listing()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the hotel reservation API as JSON over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--no-warm", action="store_true", help="skip loading indexes and caches at startup")
+    parser.add_argument("--query-metrics", action="store_true", help="time every query; reported under /metrics")
+    parser.add_argument("--follow-changes", action="store_true",
+                        help="apply other processes' bookings and cancellations to the in-memory indexes and caches")
+    args = parser.parse_args()
+
+    if args.query_metrics:
+        query_metrics.enable()
+
+    # Subscribers start at each log's current version before anything is loaded, so nothing falls in between
+    subscribers = []
+    if args.follow_changes:
+        for key in db.properties():
+            with db.use_property(key):
+                subscribers.append(changelog.Subscriber())
+    if not args.no_warm:
+        warm_up()
+    for subscriber in subscribers:
+        changelog.Follower(subscriber=subscriber).start()
+
+    server = WorkerPoolHTTPServer((args.host, args.port), RequestHandler, args.workers)
+
+    # serve_forever() runs in this thread, so shutdown() has to be called from another one
+    def stop(signum, frame):
+        print("Shutting down...")
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        db.close_all()
+    print("Stopped.")
+
+
+if __name__ == "__main__":
+    main()
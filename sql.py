@@ -0,0 +1,318 @@
+import functools
+import re
+
+
+# SQL shared by the blocking queries.py and the asyncio aqueries.py, so the two can't drift apart.
+# Fixed statements are module constants registered by name in STATEMENTS; statements whose shape
+# depends on the input (IN lists, optional filters) are built by the functions below.
+
+
+# FR2: room lookups
+ROOM_DETAILS = """
+SELECT RoomCode, RoomName, Beds, bedType, maxOcc, basePrice
+FROM lab7_rooms
+WHERE RoomCode = %s
+"""
+
+ROOM_PRICE = "SELECT basePrice FROM lab7_rooms WHERE RoomCode = %s"
+
+# Base tables (see migrations.py). The DDL is valid as-is on both MySQL and SQLite
+ROOMS_TABLE = """
+CREATE TABLE IF NOT EXISTS lab7_rooms (
+    RoomCode CHAR(5) PRIMARY KEY,
+    RoomName VARCHAR(30) NOT NULL UNIQUE,
+    Beds INT NOT NULL,
+    bedType VARCHAR(8) NOT NULL,
+    maxOcc INT NOT NULL,
+    basePrice DECIMAL(6, 2) NOT NULL,
+    decor VARCHAR(20) NOT NULL
+)
+"""
+
+RESERVATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS lab7_reservations (
+    CODE INTEGER PRIMARY KEY,
+    Room CHAR(5),
+    CheckIn DATE,
+    Checkout DATE NOT NULL,
+    Rate DECIMAL(6, 2) NOT NULL,
+    LastName VARCHAR(15),
+    FirstName VARCHAR(15),
+    Adults INT,
+    Kids INT,
+    FOREIGN KEY (Room) REFERENCES lab7_rooms (RoomCode)
+)
+"""
+
+# Room catalog (see catalog.py). The version sums a CRC32 of every whole row, so adding, removing or editing
+# any room changes it, including edits that plain column sums miss (two rooms swapping prices, offsetting price
+# changes, a same-length rename); cheap enough to re-check every few seconds on a table this size
+CATALOG_ROOMS = "SELECT RoomCode, RoomName, Beds, bedType, maxOcc, basePrice, decor FROM lab7_rooms"
+
+CATALOG_VERSION = """
+SELECT COUNT(*), IFNULL(SUM(CRC32(CONCAT_WS('|', RoomCode, RoomName, Beds, bedType, maxOcc, basePrice, decor))), 0)
+FROM lab7_rooms
+"""
+
+# FR2: availability
+CHECK_AVAILABILITY = """
+SELECT 1 FROM lab7_reservations
+WHERE Room = %s
+AND (CheckIn < %s AND Checkout > %s)  -- Ensures no overlapping reservation
+LIMIT 1
+"""
+
+ROOM_CONFLICTS = """
+SELECT CODE, CheckIn, Checkout FROM lab7_reservations
+WHERE Room = %s
+AND (CheckIn < %s AND Checkout > %s)
+"""
+
+AVAILABLE_ROOMS = """
+SELECT r.RoomCode, r.RoomName, r.Beds, r.bedType, r.maxOcc, r.basePrice
+FROM lab7_rooms r
+LEFT JOIN lab7_reservations res
+    ON r.RoomCode = res.Room
+    AND res.CheckIn < %s
+    AND res.CheckOut > %s
+WHERE r.maxOcc >= %s
+AND res.Room IS NULL
+ORDER BY ABS(r.maxOcc - %s), r.basePrice ASC, r.RoomCode
+"""
+
+# Room metadata only; used when the availability index already knows which rooms are free
+ROOMS_FOR_OCCUPANCY = """
+SELECT RoomCode, RoomName, Beds, bedType, maxOcc, basePrice
+FROM lab7_rooms
+WHERE maxOcc >= %s
+ORDER BY ABS(maxOcc - %s), basePrice ASC, RoomCode
+"""
+
+NEXT_AVAILABLE_ROOMS = """
+SELECT DISTINCT res.Room, MIN(res.CheckOut) AS NextAvailableFrom,
+r.RoomName, r.bedType, r.maxOcc, r.basePrice
+FROM lab7_reservations res
+JOIN lab7_rooms r ON r.RoomCode = res.Room
+WHERE r.bedType = %s
+AND res.CheckOut > %s
+GROUP BY res.Room, r.RoomName, r.bedType, r.maxOcc, r.basePrice
+ORDER BY NextAvailableFrom ASC, res.Room
+LIMIT 5
+"""
+
+# FR2: booking
+LOCK_ROOM = "SELECT RoomCode, maxOcc FROM lab7_rooms WHERE RoomCode = %s FOR UPDATE"
+
+INSERT_RESERVATION = """
+INSERT INTO lab7_reservations (CODE, Room, CheckIn, Checkout, Rate, LastName, FirstName, Adults, Kids)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+# FR3: cancellation
+LOCK_RESERVATION = """
+SELECT CODE, Room, CheckIn, Checkout, Rate, FirstName, LastName
+FROM lab7_reservations
+WHERE CODE = %s
+FOR UPDATE
+"""
+
+DELETE_RESERVATION = "DELETE FROM lab7_reservations WHERE CODE = %s"
+
+COUNT_RESERVATION = "SELECT COUNT(*) FROM lab7_reservations WHERE CODE = %s"
+
+# FR5: revenue aggregate (see revenue.py)
+REVENUE_UPSERT = """
+INSERT INTO lab7_revenue_monthly (Room, Year, Month, Nights, Revenue)
+VALUES (%s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE Nights = Nights + VALUES(Nights), Revenue = Revenue + VALUES(Revenue)
+"""
+
+MONTHLY_REVENUE = """
+SELECT Room, Month, Revenue AS MonthRevenue
+FROM lab7_revenue_monthly
+WHERE Year = %s
+ORDER BY Room, Month
+"""
+
+# FR1: room statistics (see room_stats.py). Each value is a scalar subquery on that room's own reservations
+# (served by the (Room, CheckIn, Checkout) index), instead of a correlated MAX over every reservation
+ROOM_STATS_REFRESH = """
+INSERT INTO lab7_room_stats (Room, popularity_score, next_available_checkin, last_stay_length, last_checkout_date, AsOf)
+SELECT
+    r.RoomCode,
+    ROUND(IFNULL((
+        SELECT SUM(DATEDIFF(res.Checkout, GREATEST(res.CheckIn, CURRENT_DATE - INTERVAL 180 DAY)))
+        FROM lab7_reservations res
+        WHERE res.Room = r.RoomCode AND res.Checkout > CURRENT_DATE - INTERVAL 180 DAY
+    ), 0) / 180.0, 2),
+    IFNULL((
+        SELECT MIN(res.CheckIn)
+        FROM lab7_reservations res
+        WHERE res.Room = r.RoomCode AND res.CheckIn > CURRENT_DATE
+    ), CURRENT_DATE),
+    IFNULL((
+        SELECT DATEDIFF(res.Checkout, res.CheckIn)
+        FROM lab7_reservations res
+        WHERE res.Room = r.RoomCode AND res.Checkout < CURRENT_DATE
+        ORDER BY res.Checkout DESC
+        LIMIT 1
+    ), 0),
+    (
+        SELECT MAX(res.Checkout)
+        FROM lab7_reservations res
+        WHERE res.Room = r.RoomCode AND res.Checkout < CURRENT_DATE
+    ),
+    CURRENT_DATE
+FROM lab7_rooms r
+{where}
+ON DUPLICATE KEY UPDATE
+    popularity_score = VALUES(popularity_score),
+    next_available_checkin = VALUES(next_available_checkin),
+    last_stay_length = VALUES(last_stay_length),
+    last_checkout_date = VALUES(last_checkout_date),
+    AsOf = VALUES(AsOf)
+"""
+
+ROOM_LISTING = """
+SELECT
+    r.*,
+    IFNULL(s.popularity_score, 0) AS popularity_score,
+    s.next_available_checkin,
+    IFNULL(s.last_stay_length, 0) AS last_stay_length,
+    s.last_checkout_date,
+    s.AsOf
+FROM lab7_rooms r
+LEFT JOIN lab7_room_stats s ON r.RoomCode = s.Room
+ORDER BY popularity_score DESC, r.RoomCode
+"""
+
+
+def placeholders(count):
+    return ", ".join(["%s"] * count)
+
+
+# Locks a block of rooms in key order, so two overlapping batches can't deadlock
+def lock_rooms(count):
+    return f"SELECT RoomCode, maxOcc FROM lab7_rooms WHERE RoomCode IN ({placeholders(count)}) ORDER BY RoomCode FOR UPDATE"
+
+
+# Multi-row INSERT of count reservations, for bulk loads (see importer.py)
+def insert_reservations(count):
+    return INSERT_RESERVATION.replace(f"VALUES ({placeholders(9)})", "VALUES " + ", ".join([f"({placeholders(9)})"] * count))
+
+
+# Every existing stay in the given rooms that overlaps [min check-in, max check-out)
+def batch_conflicts(room_count):
+    return f"""
+    SELECT CODE, Room, CheckIn, Checkout FROM lab7_reservations
+    WHERE Room IN ({placeholders(room_count)})
+    AND CheckIn < %s AND Checkout > %s
+    """
+
+
+# Stats refresh for every room (room_count None) or for room_count specific rooms
+def room_stats_refresh(room_count=None):
+    # Always a WHERE: SQLite can't parse INSERT ... SELECT ... FROM t ON CONFLICT without one
+    where = "WHERE 1 = 1" if room_count is None else f"WHERE r.RoomCode IN ({placeholders(room_count)})"
+    return ROOM_STATS_REFRESH.format(where=where)
+
+
+# FR4: WHERE conditions for only the search filters actually supplied.
+# match_names=False leaves name matching to the caller (the in-memory name index)
+def search_conditions(reservation_code="", first_name="", last_name="", start_date=None, end_date=None, room_code="",
+                      match_names=True):
+    conditions = []
+    params = []
+    if reservation_code:
+        conditions.append("res.CODE = %s")
+        params.append(reservation_code)
+    if room_code:
+        conditions.append("res.Room LIKE %s")
+        params.append(f"%{room_code}%")
+    if start_date and end_date:
+        conditions.append("res.CheckIn < %s AND res.Checkout > %s")  # Overlap logic
+        params.extend([end_date, start_date])
+    if match_names and first_name:
+        conditions.append("res.FirstName LIKE %s")
+        params.append(f"%{first_name}%")
+    if match_names and last_name:
+        conditions.append("res.LastName LIKE %s")
+        params.append(f"%{last_name}%")
+    return conditions, params
+
+
+# FR4: one keyset page of search results, optionally restricted to a list of codes
+def search_page(conditions, params, limit, after_code=None, codes=None):
+    conditions = list(conditions)
+    params = list(params)
+    if after_code is not None:
+        conditions.append("res.CODE > %s")
+        params.append(after_code)
+    if codes is not None:
+        conditions.append(f"res.CODE IN ({placeholders(len(codes))})")
+        params.extend(codes)
+    where = "WHERE " + " AND ".join(conditions) if conditions else ""
+
+    query = f"""
+    SELECT r.RoomName, res.*
+    FROM lab7_reservations res
+    JOIN lab7_rooms r ON res.Room = r.RoomCode
+    {where}
+    ORDER BY res.CODE
+    LIMIT %s
+    """
+    return query, params + [limit]
+
+
+STATEMENTS = {
+    "room_details": ROOM_DETAILS,
+    "room_price": ROOM_PRICE,
+    "catalog_rooms": CATALOG_ROOMS,
+    "catalog_version": CATALOG_VERSION,
+    "check_availability": CHECK_AVAILABILITY,
+    "room_conflicts": ROOM_CONFLICTS,
+    "available_rooms": AVAILABLE_ROOMS,
+    "rooms_for_occupancy": ROOMS_FOR_OCCUPANCY,
+    "next_available_rooms": NEXT_AVAILABLE_ROOMS,
+    "lock_room": LOCK_ROOM,
+    "insert_reservation": INSERT_RESERVATION,
+    "lock_reservation": LOCK_RESERVATION,
+    "delete_reservation": DELETE_RESERVATION,
+    "count_reservation": COUNT_RESERVATION,
+    "revenue_upsert": REVENUE_UPSERT,
+    "monthly_revenue": MONTHLY_REVENUE,
+    "room_stats_refresh": room_stats_refresh(),
+    "room_listing": ROOM_LISTING,
+}
+
+
+# Statements built per call, recognised by their shape with every IN list collapsed to one placeholder
+_BUILT_STATEMENTS = {
+    "lock_rooms": lock_rooms(1),
+    "batch_conflicts": batch_conflicts(1),
+    "room_stats_refresh_rooms": room_stats_refresh(1),
+}
+_SEARCH_PAGE_PREFIX = "SELECT r.RoomName, res.* FROM lab7_reservations res"
+_INSERT_RESERVATIONS_PREFIX = "INSERT INTO lab7_reservations (CODE, Room, CheckIn, Checkout, Rate, LastName, FirstName, Adults, Kids) VALUES"
+
+
+def _normalize(query):
+    query = re.sub(r"IN \((%s, )*%s\)", "IN (%s)", query)
+    return " ".join(query.split())
+
+
+_NAMES = {_normalize(query): name for name, query in list(STATEMENTS.items()) + list(_BUILT_STATEMENTS.items())}
+
+
+# The STATEMENTS name for a query's text, for metrics and logs; ad-hoc SQL is named by its first words
+@functools.lru_cache(maxsize=1024)
+def statement_name(query):
+    normalized = _normalize(query)
+    name = _NAMES.get(normalized)
+    if name:
+        return name
+    if normalized.startswith(_SEARCH_PAGE_PREFIX):
+        return "search_page"
+    if normalized.startswith(_INSERT_RESERVATIONS_PREFIX):
+        return "insert_reservations"
+    return normalized[:60]
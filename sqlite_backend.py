@@ -0,0 +1,202 @@
+import datetime
+import decimal
+import functools
+import re
+import sqlite3
+import zlib
+
+from dates import to_date
+
+
+# Embedded storage: an sqlite3 connection dressed up as a mysql.connector one, so queries.py and sql.py run
+# unchanged. Statements are written in MySQL's dialect and translated here once per distinct text.
+
+# Result columns MySQL hands back as datetime.date / Decimal(x.xx); SQLite stores them as text / REAL
+DATE_COLUMNS = {"CheckIn", "Checkout", "CheckOut", "NextAvailableFrom", "next_available_checkin", "last_checkout_date", "AsOf"}
+DECIMAL_COLUMNS = {"basePrice", "Rate", "popularity_score", "Revenue", "MonthRevenue"}
+CENTS = decimal.Decimal("0.01")
+
+BUSY_TIMEOUT = 10  # seconds a writer waits for another connection's write transaction
+
+_WRITE_PREFIXES = ("INSERT", "UPDATE", "DELETE", "REPLACE", "CREATE", "DROP", "ALTER")
+
+sqlite3.register_adapter(datetime.date, datetime.date.isoformat)
+sqlite3.register_adapter(decimal.Decimal, float)
+
+
+def _datediff(end, start):
+    if end is None or start is None:
+        return None
+    return (to_date(end) - to_date(start)).days
+
+
+def _greatest(*values):
+    return None if any(value is None for value in values) else max(values)
+
+
+def _concat_ws(separator, *values):
+    return separator.join(str(value) for value in values if value is not None)
+
+
+def _crc32(value):
+    return None if value is None else zlib.crc32(str(value).encode())
+
+
+def _on_duplicate_key(match):
+    assignments = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", match.group(1))
+    return "ON CONFLICT DO UPDATE SET" + assignments
+
+
+# MySQL statement text -> SQLite statement text
+@functools.lru_cache(maxsize=512)
+def translate(query):
+    query = re.sub(r"ON DUPLICATE KEY UPDATE(.*)$", _on_duplicate_key, query, flags=re.S)
+    query = re.sub(r"CURRENT_DATE(\(\))? - INTERVAL (\d+) DAY", r"date('now', 'localtime', '-\2 day')", query)
+    query = re.sub(r"CURRENT_DATE(\(\))?", "date('now', 'localtime')", query)
+    query = re.sub(r"AS UNSIGNED\)", "AS INTEGER)", query)
+    query = query.replace("INSERT IGNORE", "INSERT OR IGNORE")
+    # Row locks have no SQLite equivalent; locking reads take the database write lock instead (see _begin)
+    query = re.sub(r"\s*FOR UPDATE", "", query)
+    return query.replace("%s", "?")
+
+
+# True for statements that must run inside a write transaction
+@functools.lru_cache(maxsize=512)
+def _is_write(query):
+    return query.lstrip().upper().startswith(_WRITE_PREFIXES) or "FOR UPDATE" in query
+
+
+class SQLiteCursor:
+    """The slice of mysql.connector's cursor API the repo uses, tuple or dictionary rows."""
+
+    def __init__(self, conn, dictionary=False):
+        self._conn = conn
+        self._cursor = conn.raw.cursor()
+        self._dictionary = dictionary
+        self._columns = None
+        self._converters = None
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    @property
+    def column_names(self):
+        return tuple(self._columns or ())
+
+    def execute(self, query, params=()):
+        self._conn._begin(query)
+        self._cursor.execute(translate(query), tuple(params or ()))
+        self._describe()
+        return self
+
+    def executemany(self, query, seq_params):
+        self._conn._begin(query)
+        self._cursor.executemany(translate(query), [tuple(params) for params in seq_params])
+        self._describe()
+        return self
+
+    def _describe(self):
+        description = self._cursor.description
+        if description is None:
+            self._columns = self._converters = None
+            return
+        self._columns = [column[0] for column in description]
+        self._converters = [(i, _to_date if name in DATE_COLUMNS else _to_decimal)
+                            for i, name in enumerate(self._columns)
+                            if name in DATE_COLUMNS or name in DECIMAL_COLUMNS]
+
+    def _row(self, row):
+        if row is None:
+            return None
+        if self._converters:
+            row = list(row)
+            for i, convert in self._converters:
+                row[i] = convert(row[i])
+        if self._dictionary:
+            return dict(zip(self._columns, row))
+        return tuple(row)
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def __iter__(self):
+        for row in self._cursor:
+            yield self._row(row)
+
+    def close(self):
+        self._cursor.close()
+
+
+def _to_date(value):
+    return datetime.date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _to_decimal(value):
+    return decimal.Decimal(str(value)).quantize(CENTS) if isinstance(value, (int, float)) else value
+
+
+class SQLiteConnection:
+    """An sqlite3 connection with mysql.connector's transaction behaviour: nothing is written until commit()."""
+
+    def __init__(self, path):
+        # Transactions are managed here rather than by the sqlite3 module, so it runs in autocommit mode
+        self.raw = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False)
+        self.raw.create_function("DATEDIFF", 2, _datediff, deterministic=True)
+        self.raw.create_function("GREATEST", -1, _greatest, deterministic=True)
+        self.raw.create_function("CONCAT_WS", -1, _concat_ws, deterministic=True)
+        self.raw.create_function("CRC32", 1, _crc32, deterministic=True)
+        if path != ":memory:":
+            self.raw.execute("PRAGMA journal_mode = WAL")  # readers don't block the writer
+        self._closed = False
+        if self.raw.execute("SELECT 1 FROM sqlite_master WHERE name = 'lab7_reservations'").fetchone() is None:
+            import migrations  # imported here: migrations imports db, which imports this module
+            migrations.upgrade(self, dialect="sqlite")
+
+    # Writes and locking reads open an IMMEDIATE transaction, taking the write lock up front. That stands in
+    # for MySQL's row locks (so check-then-insert can't interleave) and avoids upgrade deadlocks; plain reads
+    # outside a transaction autocommit, which matches the fresh snapshot MySQL gives after every commit
+    def _begin(self, query):
+        if not self.raw.in_transaction and _is_write(query):
+            self.raw.execute("BEGIN IMMEDIATE")
+
+    def cursor(self, dictionary=False, buffered=True, **kwargs):
+        return SQLiteCursor(self, dictionary=dictionary)
+
+    def start_transaction(self, isolation_level=None, **kwargs):
+        if not self.raw.in_transaction:
+            self.raw.execute("BEGIN IMMEDIATE")
+
+    @property
+    def in_transaction(self):
+        return self.raw.in_transaction
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def is_connected(self):
+        return not self._closed
+
+    def reconnect(self, attempts=1, delay=0):
+        raise sqlite3.InterfaceError("SQLite connections can't be reconnected")
+
+    def close(self):
+        self._closed = True
+        self.raw.close()
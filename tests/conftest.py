@@ -0,0 +1,38 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root rather than in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+HOTEL_ROOMS = [
+    ("AAA", "Sunrise Suite", 1, "King", 2, 150, "modern"),
+    ("BBB", "Harbour Twin", 2, "Double", 4, 120, "traditional"),
+    ("CCC", "Garden Queen", 1, "Queen", 2, 100, "rustic"),
+]
+
+
+# A single-property hotel in a fresh in-memory SQLite database holding HOTEL_ROOMS and no reservations.
+# Yields the property name, which is unique per test since per-property caches (see db.PropertyState)
+# outlive the test
+@pytest.fixture
+def hotel(request, monkeypatch):
+    key = f"test-{request.node.name}"
+    monkeypatch.setattr(db, "DB_BACKEND", "sqlite")
+    monkeypatch.setattr(db, "DB_PATH", ":memory:")
+    monkeypatch.setattr(db, "_backend", None)
+    monkeypatch.setattr(db, "SHARD_MAP", "")
+    monkeypatch.setattr(db, "_shards", ({key: {}}, key))
+    monkeypatch.setattr(db, "_routers", {})
+
+    conn = db.connect_db()
+    try:
+        conn.cursor().executemany(f"INSERT INTO lab7_rooms VALUES ({', '.join(['%s'] * 7)})", HOTEL_ROOMS)
+        conn.commit()
+    finally:
+        conn.close()
+    yield key
+    db.close_all()
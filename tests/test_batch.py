@@ -0,0 +1,49 @@
+import queries
+
+
+def _item(room_code, check_in, check_out, adults=1, kids=0):
+    return {"room_code": room_code, "check_in": check_in, "check_out": check_out, "first_name": "Grace",
+            "last_name": "Group", "adults": adults, "kids": kids, "rate": 100}
+
+
+def _statuses(results):
+    return [result["status"] for result in results]
+
+
+def test_books_every_item_of_a_clean_block(hotel):
+    results = queries.make_reservations_batch([_item("AAA", "2030-01-01", "2030-01-03"),
+                                               _item("BBB", "2030-01-01", "2030-01-03")])
+    assert _statuses(results) == ["booked", "booked"]
+    assert len({result["code"] for result in results}) == 2
+    assert len(queries.search_reservations(last_name="Group")) == 2
+
+
+def test_items_in_the_same_block_cannot_overlap(hotel):
+    results = queries.make_reservations_batch([
+        _item("AAA", "2030-02-01", "2030-02-05"),
+        _item("AAA", "2030-02-04", "2030-02-06"),  # overlaps the first item
+        _item("AAA", "2030-02-05", "2030-02-07"),  # starts the day the first one checks out
+    ])
+    assert _statuses(results) == ["booked", "conflict", "booked"]
+    assert results[1]["conflicts"][0]["CODE"] == results[0]["code"]
+
+
+def test_rejects_bad_items(hotel):
+    results = queries.make_reservations_batch([
+        _item("AAA", "2030-03-05", "2030-03-01"),
+        _item("ZZZ", "2030-03-01", "2030-03-02"),
+        _item("AAA", "2030-03-01", "2030-03-02", adults=2, kids=1),  # sleeps 2
+        _item("BBB", "2030-03-01", "2030-03-02", adults=2, kids=2),  # sleeps 4
+    ])
+    assert _statuses(results) == ["invalid", "unknown_room", "over_capacity", "booked"]
+
+
+def test_all_or_nothing_aborts_the_block_when_one_item_fails(hotel):
+    queries.book_reservation("AAA", "2030-04-01", "2030-04-03", "Ada", "Solo", 1, 0, 150)
+    for failing, status in ((_item("AAA", "2030-04-02", "2030-04-04"), "conflict"),
+                            (_item("CCC", "2030-04-01", "2030-04-02", adults=9), "over_capacity")):
+        results = queries.make_reservations_batch([_item("BBB", "2030-04-01", "2030-04-03"), failing],
+                                                  all_or_nothing=True)
+        assert _statuses(results) == ["aborted", status]
+        assert results[0]["code"] is None
+    assert queries.search_reservations(last_name="Group") == []
@@ -0,0 +1,54 @@
+import threading
+
+import queries
+
+
+def _book(room_code, check_in, check_out, adults=1, kids=0):
+    return queries.book_reservation(room_code, check_in, check_out, "Ada", "Byron", adults, kids, 150)
+
+
+def test_books_and_reports_conflicts(hotel):
+    booked = _book("AAA", "2030-01-10", "2030-01-15")
+    assert booked["status"] == "booked"
+    assert queries.check_reservation_exists(booked["code"])
+
+    clash = _book("AAA", "2030-01-14", "2030-01-16")
+    assert clash["status"] == "conflict" and clash["code"] is None
+    assert [row["CODE"] for row in clash["conflicts"]] == [booked["code"]]
+    assert _book("BBB", "2030-01-14", "2030-01-16")["status"] == "booked"  # other rooms aren't affected
+
+
+def test_stays_are_half_open(hotel):
+    _book("AAA", "2030-02-10", "2030-02-15")
+    assert _book("AAA", "2030-02-15", "2030-02-17")["status"] == "booked"  # checks in the day the other checks out
+    assert _book("AAA", "2030-02-08", "2030-02-10")["status"] == "booked"  # checks out the day the other checks in
+    assert _book("AAA", "2030-02-09", "2030-02-11")["status"] == "conflict"
+    assert not queries.check_room_availability("AAA", "2030-02-12", "2030-02-13")
+    assert queries.check_room_availability("AAA", "2030-02-17", "2030-02-18")
+
+
+def test_rejects_bad_requests(hotel):
+    assert _book("AAA", "2030-03-05", "2030-03-01")["status"] == "invalid"
+    assert _book("AAA", "2030-03-05", "2030-03-05")["status"] == "invalid"
+    assert _book("AAA", "not a date", "2030-03-05")["status"] == "invalid"
+    assert _book("ZZZ", "2030-03-01", "2030-03-02")["status"] == "unknown_room"
+    assert _book("AAA", "2030-03-01", "2030-03-02", adults=2, kids=1)["status"] == "over_capacity"  # sleeps 2
+    assert _book("AAA", "2030-03-01", "2030-03-02", adults=1, kids=1)["status"] == "booked"
+
+
+def test_cancelled_nights_can_be_booked_again(hotel):
+    code = _book("CCC", "2030-04-01", "2030-04-03")["code"]
+    assert queries.cancel_reservation(code)
+    assert not queries.cancel_reservation(code)
+    assert _book("CCC", "2030-04-01", "2030-04-03")["status"] == "booked"
+
+
+def test_concurrent_clerks_cannot_double_book(hotel):
+    results = []
+    clerks = [threading.Thread(target=lambda: results.append(_book("BBB", "2030-05-01", "2030-05-04")["status"]))
+              for _ in range(8)]
+    for clerk in clerks:
+        clerk.start()
+    for clerk in clerks:
+        clerk.join()
+    assert sorted(results) == ["booked"] + ["conflict"] * 7
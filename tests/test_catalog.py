@@ -0,0 +1,33 @@
+import catalog
+import db
+import rates
+
+
+def _edit(*statements):
+    conn = db.connect_db()
+    try:
+        cursor = conn.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_version_changes_for_edits_that_column_sums_miss(hotel):
+    versions = [catalog.load_catalog().version]
+    for statement in (
+        "UPDATE lab7_rooms SET basePrice = CASE RoomCode WHEN 'AAA' THEN 120 ELSE 150 END WHERE RoomCode IN ('AAA', 'BBB')",
+        "UPDATE lab7_rooms SET basePrice = basePrice + CASE RoomCode WHEN 'AAA' THEN 10 ELSE -10 END WHERE RoomCode IN ('AAA', 'CCC')",
+        "UPDATE lab7_rooms SET decor = 'Modern' WHERE RoomCode = 'AAA'",
+    ):
+        _edit(statement)
+        versions.append(catalog.load_catalog().version)
+    assert len(set(versions)) == len(versions)
+
+
+def test_swapped_prices_reach_the_rate_calendar(hotel, monkeypatch):
+    monkeypatch.setattr(catalog, "CATALOG_CHECK_INTERVAL", 0)
+    assert rates.quote_rooms(["AAA", "BBB"], "2030-01-07", "2030-01-08") == [150, 120]  # a Monday night
+    _edit("UPDATE lab7_rooms SET basePrice = CASE RoomCode WHEN 'AAA' THEN 120 ELSE 150 END WHERE RoomCode IN ('AAA', 'BBB')")
+    assert rates.quote_rooms(["AAA", "BBB"], "2030-01-07", "2030-01-08") == [120, 150]
@@ -0,0 +1,50 @@
+import threading
+
+import codes
+import db
+import sql
+
+
+def _allocate_concurrently(allocators, threads=8, each=50):
+    allocated = []
+    lock = threading.Lock()
+
+    def clerk(allocator):
+        mine = [allocator.next_code() for _ in range(each)]
+        with lock:
+            allocated.extend(mine)
+
+    workers = [threading.Thread(target=clerk, args=(allocators[i % len(allocators)],)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return allocated
+
+
+def test_hilo_codes_are_unique_across_threads(hotel):
+    allocated = _allocate_concurrently([codes.HiLoAllocator(block_size=7)])
+    assert len(set(allocated)) == len(allocated) == 400
+
+
+def test_allocators_sharing_a_sequence_never_hand_out_the_same_code(hotel):
+    # Two hi/lo allocators stand in for two processes; a plain sequence allocator takes codes one at a time
+    allocators = [codes.HiLoAllocator(block_size=5), codes.HiLoAllocator(block_size=11), codes.SequenceAllocator()]
+    allocated = _allocate_concurrently(allocators, threads=9, each=30)
+    assert len(set(allocated)) == len(allocated) == 270
+
+
+def test_sequence_starts_past_existing_codes_and_can_be_advanced(hotel):
+    conn = db.connect_db()
+    try:
+        conn.cursor().execute(sql.INSERT_RESERVATION, (5000, "AAA", "2030-01-01", "2030-01-02", 150, "Old", "Guest", 1, 0))
+        conn.commit()
+    finally:
+        conn.close()
+
+    allocator = codes.SequenceAllocator()
+    assert allocator.next_codes(3) == [5001, 5002, 5003]
+    assert codes.advance_sequence(9000)
+    assert allocator.next_code() == 9001
+    assert codes.advance_sequence(10)  # never moves backwards
+    assert allocator.next_code() == 9002
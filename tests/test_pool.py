@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pytest
+
+import db
+import queries
+
+
+class FakeError(Exception):
+    pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.alive = True
+        self.in_transaction = False
+        self.rollbacks = 0
+        self.pings = 0
+        self.can_reconnect = True
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.in_transaction = False
+
+    def is_connected(self):
+        self.pings += 1
+        return self.alive
+
+    def reconnect(self, attempts=1, delay=0):
+        if not self.can_reconnect:
+            raise FakeError("server gone")
+        self.alive = True
+
+    def close(self):
+        self.alive = False
+
+
+class FakeBackend:
+    name = "fake"
+    max_connections = None
+    explain_prefix = "EXPLAIN "
+    errors = (FakeError,)
+
+    def __init__(self):
+        self.opened = []
+        self.fail = False
+
+    def connect(self):
+        if self.fail:
+            raise FakeError("connection refused")
+        self.opened.append(FakeConnection())
+        return self.opened[-1]
+
+
+def _pool(**kwargs):
+    kwargs.setdefault("min_size", 0)
+    kwargs.setdefault("max_size", 2)
+    return db.ConnectionPool(backend=FakeBackend(), **kwargs)
+
+
+def test_never_opens_more_than_max_size():
+    pool = _pool(max_size=2)
+    held = [pool.acquire(), pool.acquire()]
+    with pytest.raises(db.PoolError):
+        pool.acquire(timeout=0.05)
+    stats = pool.stats()
+    assert (stats["size"], stats["in_use"], stats["timeouts"]) == (2, 2, 1)
+    for conn in held:
+        conn.close()
+    assert pool.stats()["idle"] == 2
+
+
+def test_a_waiter_gets_the_next_connection_returned():
+    pool = _pool(max_size=1)
+    first = pool.acquire()
+    raw = first._raw
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire(timeout=5)))
+    waiter.start()
+    while pool.stats()["waiters"] == 0:
+        time.sleep(0.01)
+    first.close()
+    waiter.join()
+    assert got[0]._raw is raw
+    assert pool.stats()["waits"] == 1
+
+
+def test_release_rolls_back_only_open_transactions():
+    pool = _pool()
+    conn = pool.acquire()
+    raw = conn._raw
+    conn.close()
+    assert raw.rollbacks == 0
+    conn = pool.acquire()
+    raw.in_transaction = True
+    conn.close()
+    assert raw.rollbacks == 1
+
+
+def test_only_long_idle_connections_are_pinged():
+    pool = _pool(ping_after=60)
+    conn = pool.acquire()
+    raw = conn._raw
+    conn.close()
+    pool.acquire().close()
+    assert raw.pings == 0
+
+    pool.ping_after = 0
+    pool.acquire().close()
+    assert raw.pings == 1
+
+
+def test_dead_connections_are_reconnected_or_replaced():
+    pool = _pool(ping_after=0)
+    conn = pool.acquire()
+    raw = conn._raw
+    conn.close()
+
+    raw.alive = False
+    conn = pool.acquire()
+    assert conn._raw is raw and raw.alive
+    conn.close()
+    assert pool.stats()["reconnects"] == 1
+
+    raw.alive, raw.can_reconnect = False, False
+    conn = pool.acquire()
+    assert conn._raw is not raw
+    assert pool.stats()["created"] == 2
+
+
+def test_a_failed_connect_gives_its_slot_back():
+    backend = FakeBackend()
+    pool = db.ConnectionPool(min_size=0, max_size=1, backend=backend)
+    backend.fail = True
+    with pytest.raises(FakeError):
+        pool.acquire()
+    backend.fail = False
+    pool.acquire(timeout=0.05).close()
+    assert pool.stats()["size"] == 1
+
+
+def test_a_failing_query_returns_its_connection(hotel):
+    for _ in range(3):
+        with pytest.raises(Exception):
+            queries.make_reservation("AAA", "2030-01-01", None, "Ada", "Null", 1, 0, 150)
+    assert db.pool_stats()["in_use"] == 0
+    assert queries.make_reservation("AAA", "2030-01-01", "2030-01-02", "Ada", "Ok", 1, 0, 150)
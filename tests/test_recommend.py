@@ -0,0 +1,29 @@
+import datetime
+
+import availability
+import db
+import recommend
+import sql
+
+
+def _stays(options):
+    return [(option["RoomCode"], option["CheckIn"], option["Checkout"]) for option in options]
+
+
+def test_skips_stays_booked_by_another_process(hotel):
+    first = recommend.recommend("2030-06-10", "2030-06-12", 2, "King", "AAA")
+    assert ("AAA", datetime.date(2030, 6, 10), datetime.date(2030, 6, 12)) in _stays(first)
+
+    # Booked behind the shared index's back, as another process would
+    conn = db.connect_db()
+    try:
+        conn.cursor().execute(sql.INSERT_RESERVATION, (9001, "AAA", "2030-06-09", "2030-06-13", 150, "Other", "Clerk", 1, 0))
+        conn.commit()
+    finally:
+        conn.close()
+
+    second = recommend.recommend("2030-06-10", "2030-06-12", 2, "King", "AAA")
+    assert second
+    for room, check_in, check_out in _stays(second):
+        assert room != "AAA" or check_out <= datetime.date(2030, 6, 9) or check_in >= datetime.date(2030, 6, 13)
+    assert not availability.shared_index().is_free("AAA", "2030-06-10", "2030-06-12")
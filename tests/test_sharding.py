@@ -0,0 +1,113 @@
+import json
+import sqlite3
+import types
+
+import pytest
+
+import chain
+import db
+import queries
+
+
+ROOMS = [
+    ("AAA", "Sunrise Suite", 1, "King", 2, 150, "modern"),
+    ("BBB", "Harbour Twin", 2, "Double", 4, 120, "traditional"),
+]
+
+
+def _add_rooms(path):
+    conn = db.make_backend(path).connect()
+    cursor = conn.cursor()
+    cursor.executemany(f"INSERT INTO lab7_rooms VALUES ({', '.join(['%s'] * 7)})", ROOMS)
+    conn.commit()
+    conn.close()
+
+
+def _codes(path):
+    with sqlite3.connect(path) as conn:
+        return [row[0] for row in conn.execute("SELECT CODE FROM lab7_reservations ORDER BY CODE")]
+
+
+# Two properties on their own SQLite files. With replica=True "east" also gets a replica file that never
+# receives its writes, which makes it easy to tell which database a read went to
+@pytest.fixture
+def make_hotels(tmp_path, monkeypatch):
+    def make(replica=False):
+        # Property names are unique per test, since per-property caches (see db.PropertyState) outlive the test
+        east, west = f"east-{tmp_path.name}", f"west-{tmp_path.name}"
+        paths = {key: str(tmp_path / f"{name}.db") for key, name in ((east, "east"), (west, "west"))}
+        replicas = [str(tmp_path / "east-replica.db")] if replica else []
+        shard_map = tmp_path / "shards.json"
+        shard_map.write_text(json.dumps({"default": east, "properties": {
+            east: {"endpoint": paths[east], "replicas": replicas, "location": [40.71, -74.01]},
+            west: {"endpoint": paths[west], "location": [40.64, -73.78]},
+        }}))
+
+        monkeypatch.setattr(db, "DB_BACKEND", "sqlite")
+        monkeypatch.setattr(db, "_backend", None)
+        monkeypatch.setattr(db, "SHARD_MAP", str(shard_map))
+        monkeypatch.setattr(db, "_shards", None)
+        monkeypatch.setattr(db, "_routers", {})
+        for path in (*paths.values(), *replicas):
+            _add_rooms(path)
+        return types.SimpleNamespace(east=east, west=west, paths=paths)
+
+    yield make
+    db.close_all()
+
+
+@pytest.fixture
+def hotels(make_hotels):
+    return make_hotels()
+
+
+def _book(room_code, check_in, check_out, last_name):
+    return queries.book_reservation(room_code, check_in, check_out, "Ada", last_name, 1, 0, 150)
+
+
+def test_each_property_books_into_its_own_database(hotels):
+    with db.use_property(hotels.east):
+        east_code = _book("AAA", "2030-03-01", "2030-03-04", "Eastwood")["code"]
+    with db.use_property(hotels.west):
+        west_code = _book("AAA", "2030-03-01", "2030-03-04", "Westley")["code"]
+
+    # Same room and dates at both hotels, no conflict; each sequence starts from its own table
+    assert east_code == west_code
+    assert _codes(hotels.paths[hotels.east]) == [east_code]
+    assert _codes(hotels.paths[hotels.west]) == [west_code]
+
+
+def test_chain_queries_fan_out_to_every_property(hotels):
+    with db.use_property(hotels.east):
+        _book("AAA", "2030-05-01", "2030-05-03", "Lovelace")
+    with db.use_property(hotels.west):
+        _book("BBB", "2030-05-02", "2030-05-05", "Lovelace")
+
+    results, errors = chain.fan_out(db.current_property)
+    assert results == {hotels.east: hotels.east, hotels.west: hotels.west}
+    assert errors == {}
+
+    guests = chain.search_guests(last_name="Lovelace")
+    assert [(row["Property"], row["Room"]) for row in guests["reservations"]] == [(hotels.east, "AAA"), (hotels.west, "BBB")]
+
+    free = chain.search_availability("2030-05-01", "2030-05-03", 2)
+    assert {(room["Property"], room["RoomCode"]) for room in free["rooms"]} == {(hotels.east, "BBB"), (hotels.west, "AAA")}
+    assert free["unavailable"] == {}
+
+
+def test_reads_follow_the_session_back_to_the_primary_after_a_write(make_hotels):
+    hotels = make_hotels(replica=True)
+    with db.use_property(hotels.east):
+        assert db.has_replicas()
+        db.get_router().read_your_writes = 60
+        with db.session("clerk"):
+            code = _book("AAA", "2030-07-01", "2030-07-02", "Hopper")["code"]
+            assert queries.check_reservation_exists(code)  # primary: this session just wrote
+        with db.session("auditor"):
+            assert not queries.check_reservation_exists(code)  # replica, which never got the booking
+        stats = db.routing_stats()
+    assert stats["read_your_writes"] == 1
+    assert stats["replica"] >= 1
+
+    with db.use_property(hotels.west):
+        assert not db.has_replicas()